@@ -36,6 +36,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "modules.solar.middleware.GuestDatabaseMiddleware",
+    "modules.solar.middleware.GuestActivityMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -62,15 +64,55 @@ WSGI_APPLICATION = "main.wsgi.application"
 ASGI_APPLICATION = "main.asgi.application"
 
 # Database.
+# pragmas run on every new SQLite connection, override them with SQLITE_<NAME> environment variables.
+# journal_mode is stored in the database file itself, WAL is opt-in (SQLITE_JOURNAL_MODE=WAL) so plain
+# manage.py runs do not rewrite the header of the tracked development database.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "DELETE").upper()
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,  # WAL: readers never block the writer
+    # NORMAL is only safe with WAL, where it fsyncs at checkpoints
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL" if SQLITE_JOURNAL_MODE == "WAL" else "FULL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # ms to wait for the write lock
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative values are KiB, 64 MiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),  # 256 MiB
+}
+# transactions stay deferred, write paths that read first take the lock up front with transactions.immediate()
+SQLITE_OPTIONS = {
+    "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "osomcodex.db",
+        "OPTIONS": SQLITE_OPTIONS,
     }
 }
 
+# optional separate SQLite file for guest users, their projects and their sessions
+if os.getenv("SOLAR_GUEST_DB"):
+    DATABASES["guests"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SOLAR_GUEST_DB"),
+        "OPTIONS": SQLITE_OPTIONS,
+    }
+    DATABASE_ROUTERS = ["modules.solar.routers.GuestRouter"]
+    # guest sessions go to the guest store, registered ones stay in the primary database
+    SESSION_ENGINE = "modules.solar.guest_sessions"
+
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
+# Cache shared by every process on this host (server workers and management commands), the catalog stamp,
+# response cache hit/miss counters and guest activity throttling must be visible to all of them.
+# SOLAR_CACHE_DIR points it elsewhere, a per-process LocMemCache would hide them from response_cache_stats.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("SOLAR_CACHE_DIR", str(BASE_DIR / "cache" / "django")),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
 # Login flow.
 LOGIN_URL = "parea:index"
 LOGIN_REDIRECT_URL = "rarea:index"
@@ -141,10 +183,28 @@ LOGGING = {
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+# Solar module.
+SOLAR_CHANGE_LOG_VERSIONS = 200  # project versions of polygon changes kept for delta sync
+SOLAR_RESPONSE_CACHE_TIMEOUT = 300  # seconds project detail and polygon list responses stay cached
+SOLAR_CATALOG_MAX_AGE = 60  # seconds browsers and proxies may reuse the public panel catalog
+SOLAR_SUN_TABLE_DIR = BASE_DIR / "cache" / "sun_tables"  # precomputed sun position tables
+SOLAR_SUN_TABLE_MAX_MB = 256  # least recently used tables are deleted above this size
+SOLAR_SUN_TABLE_STEP_MINUTES = 10  # time resolution of the tables, lookups interpolate in between
+SOLAR_WEATHER_DIR = BASE_DIR / "cache" / "weather"  # typical year weather imported by import_weather
+SOLAR_WEATHER_MAX_KM = 100  # yield falls back to clear sky when the nearest weather station is further away
+SOLAR_TRANSPOSITION_DIR = BASE_DIR / "cache" / "transposition"  # insolation per roof tilt and azimuth of each site
+SOLAR_TRANSPOSITION_MAX_MB = 128  # least recently used tables are deleted above this size, about 130 kB each
+SOLAR_GUEST_ACTIVITY_INTERVAL = 300  # seconds between last_activity writes of a guest
+SOLAR_GUEST_DATABASE = "guests" if "guests" in DATABASES else None  # alias of the guest store
+
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": (
         "rest_framework.renderers.JSONRenderer",  # Only return JSON, no HTML
-    )
+    ),
+    # per client rates of endpoints open to anonymous clients that may burn seconds of CPU per request
+    "DEFAULT_THROTTLE_RATES": {
+        "roof-scores": os.getenv("SOLAR_ROOF_SCORE_RATE", "30/minute"),
+    },
 }
 
 SECURE_SSL_REDIRECT = False
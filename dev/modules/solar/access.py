@@ -0,0 +1,55 @@
+from .guest_user import get_guest_user, get_or_create_guest_user
+from .models import SolarProject
+
+_UNRESOLVED = object()
+
+
+def project_owner(request, create=False):
+    """Logged in user or session guest whose projects the request may use, resolved once per request.
+
+    Anonymous sessions without a guest get None unless create=True.
+    """
+    # DRF wraps the Django request, cache on the underlying one so every wrapper sees the same owner
+    http_request = getattr(request, "_request", request)
+
+    owner = getattr(http_request, "solar_project_owner", _UNRESOLVED)
+    if owner is _UNRESOLVED or (owner is None and create):
+        if request.user.is_authenticated:
+            owner = request.user
+        elif create:
+            owner = get_or_create_guest_user(request)
+        else:
+            owner = get_guest_user(request)
+        http_request.solar_project_owner = owner
+
+    return owner
+
+
+def owned_projects(request):
+    owner = project_owner(request)
+    if owner is None:
+        return SolarProject.objects.none()
+    return SolarProject.objects.filter(user_id=owner.id)
+
+
+def get_project(request, project_id, fields=None):
+    """Project of the request's owner in a single query, raises SolarProject.DoesNotExist otherwise.
+
+    `fields` limits the loaded columns, deferred ones are fetched on first access.
+    """
+    if project_owner(request) is None:
+        raise SolarProject.DoesNotExist
+
+    projects = owned_projects(request)
+    if fields:
+        projects = projects.only(*fields)
+    return projects.get(id=project_id)
+
+
+class ProjectAccessMixin:
+    """Project lookup for views, project_fields tunes the columns loaded by default"""
+
+    project_fields = None
+
+    def get_project(self, project_id, fields=None):
+        return get_project(self.request, project_id, fields or self.project_fields)
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SolarConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "modules.solar"
+
+    def ready(self):
+        from .routers import offset_guest_ids
+
+        post_migrate.connect(offset_guest_ids, sender=self)
@@ -4,10 +4,12 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 
-from .guest_user import convert_guest_to_registered
+from . import routers
+from .guest_user import convert_guest_to_registered, find_guest_user
 
 
 @require_POST
+@routers.primary_database()
 def ajax_login(request):
     """Handle AJAX login requests"""
     username = request.POST.get("username", "")
@@ -23,6 +25,7 @@ def ajax_login(request):
 
 
 @require_POST
+@routers.primary_database()
 def ajax_register(request):
     """Handle AJAX registration requests"""
     username = request.POST.get("username", "")
@@ -47,16 +50,13 @@ def ajax_register(request):
     try:
         # check if theres a guest user in this session to turn into registered
         guest_user_id = request.session.get("guest_user_id")
-        if guest_user_id:
-            try:
-                guest_user = User.objects.get(id=guest_user_id, profile__is_guest=True)
-                # Convert guest to registered user
-                convert_guest_to_registered(guest_user, username, email, password1)
-                # Log them in
-                login(request, guest_user)
-                return JsonResponse({"success": True, "username": guest_user.username, "converted": True})
-            except User.DoesNotExist:
-                pass 
+        guest_user = find_guest_user(guest_user_id) if guest_user_id else None
+        if guest_user:
+            # Convert guest to registered user, guests from the guest store are moved to the primary database
+            user = convert_guest_to_registered(guest_user, username, email, password1)
+            # Log them in
+            login(request, user)
+            return JsonResponse({"success": True, "username": user.username, "converted": True})
 
         #new user if no guest
         user = User.objects.create_user(username, email, password1)
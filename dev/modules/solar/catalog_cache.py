@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import response_cache
+
+# the stamp changes on every panel or manufacturer write, cached bodies and ETags are keyed by it
+STAMP_KEY = "solar:catalog:stamp"
+PANELS = "panels"
+MANUFACTURERS = "manufacturers"
+KINDS = (PANELS, MANUFACTURERS)
+HITS_KEY, MISSES_KEY = response_cache.counter_keys(response_cache.CATALOG)
+
+
+def max_age():
+    return getattr(settings, "SOLAR_CATALOG_MAX_AGE", 60)
+
+
+def stamp():
+    """Microsecond timestamp of the last catalog change, shared by every process using the same cache"""
+    value = cache.get(STAMP_KEY)
+    if value is None:
+        # unknown after a restart or eviction, start a new one so nothing stale can match
+        cache.add(STAMP_KEY, time.time_ns() // 1000, None)
+        value = cache.get(STAMP_KEY)
+    return value
+
+
+def cache_key(kind, catalog_stamp):
+    return f"solar:catalog:{catalog_stamp}:{kind}"
+
+
+def get_or_build(kind, catalog_stamp, build):
+    """Cached public catalog list, build() is only called on a miss"""
+    key = cache_key(kind, catalog_stamp)
+    body = cache.get(key)
+    if body is not None:
+        response_cache.count(HITS_KEY)
+        return body
+
+    response_cache.count(MISSES_KEY)
+    body = build()
+    cache.set(key, body, response_cache.timeout())
+    return body
+
+
+def invalidate():
+    """Start a new catalog stamp and drop the bodies cached under the old one"""
+    old = cache.get(STAMP_KEY)
+    cache.set(STAMP_KEY, max(time.time_ns() // 1000, (old or 0) + 1), None)
+    if old is not None:
+        cache.delete_many([cache_key(kind, old) for kind in KINDS])
+
+
+def catalog_etag(catalog_stamp, user_id=None):
+    # users also see their private panels, their lists get their own tag
+    return f'"catalog-{catalog_stamp}-{user_id or 0}"'
+
+
+def not_modified(request, catalog_stamp, user_id=None):
+    """Return a 304 response if the client already has the current catalog, None otherwise"""
+    response = get_conditional_response(
+        request, etag=catalog_etag(catalog_stamp, user_id), last_modified=catalog_stamp // 1_000_000
+    )
+    if response is not None:
+        set_headers(response, catalog_stamp, user_id)
+    return response
+
+
+def set_headers(response, catalog_stamp, user_id=None):
+    """ETag, Last-Modified and Cache-Control for a catalog response, shared caches only get the public one"""
+    response["ETag"] = catalog_etag(catalog_stamp, user_id)
+    response["Last-Modified"] = http_date(catalog_stamp // 1_000_000)
+    if user_id:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age())
+    patch_vary_headers(response, ["Cookie"])
+    return response
@@ -0,0 +1,73 @@
+from django.conf import settings
+
+from .models import PolygonChange, RoofPolygon
+
+
+def log_window():
+    """How many project versions of polygon changes are kept"""
+    return getattr(settings, "SOLAR_CHANGE_LOG_VERSIONS", 200)
+
+
+def record_changes(project_id, version, added=(), modified=(), removed=()):
+    """Store the polygon ids touched by the write that produced `version` and prune old entries"""
+    if added:
+        PolygonChange.objects.bulk_create(
+            [
+                PolygonChange(project_id=project_id, polygon_id=pid, version=version, created_version=version)
+                for pid in added
+            ],
+            update_conflicts=True,
+            unique_fields=["project", "polygon_id"],
+            update_fields=["version", "created_version", "deleted"],
+        )
+
+    changed = [(pid, False) for pid in modified] + [(pid, True) for pid in removed]
+    if changed:
+        PolygonChange.objects.bulk_create(
+            [
+                PolygonChange(project_id=project_id, polygon_id=pid, version=version, deleted=deleted)
+                for pid, deleted in changed
+            ],
+            update_conflicts=True,
+            unique_fields=["project", "polygon_id"],
+            update_fields=["version", "deleted"],
+        )
+
+    PolygonChange.objects.filter(project_id=project_id, version__lte=version - log_window()).delete()
+
+
+def changes_since(project, since):
+    """Polygons added, modified and removed after version `since`.
+
+    If the log no longer reaches back to `since` the whole polygon list is returned as added with reset=True.
+    """
+    if since < max(1, project.version - log_window()):
+        polygons = RoofPolygon.objects.filter(project=project)
+        return {
+            "version": project.version,
+            "reset": True,
+            "added": [polygon.to_dict() for polygon in polygons],
+            "modified": [],
+            "removed": [],
+        }
+
+    added_ids, modified_ids, removed = set(), set(), []
+    for polygon_id, created_version, deleted in PolygonChange.objects.filter(
+        project=project, version__gt=since
+    ).values_list("polygon_id", "created_version", "deleted"):
+        created_after = created_version > since
+        if deleted:
+            # polygons both added and removed after `since` were never seen by the client
+            if not created_after:
+                removed.append(polygon_id)
+        elif created_after:
+            added_ids.add(polygon_id)
+        else:
+            modified_ids.add(polygon_id)
+
+    added, modified = [], []
+    if added_ids or modified_ids:
+        for polygon in RoofPolygon.objects.filter(project=project, polygon_id__in=added_ids | modified_ids):
+            (added if polygon.polygon_id in added_ids else modified).append(polygon.to_dict())
+
+    return {"version": project.version, "reset": False, "added": added, "modified": modified, "removed": removed}
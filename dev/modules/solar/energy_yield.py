@@ -0,0 +1,162 @@
+from collections import namedtuple
+
+import numpy as np
+
+from . import sun_table
+from .geometry import roof_azimuth
+from .sun_position import hourly_times
+from .sun_table import angle_vectors
+from .weather_store import tmy_hours
+
+SOLAR_CONSTANT = 1361.0  # W/m² at one astronomical unit
+STC_IRRADIANCE = 1000.0  # W/m² at which the panel wattage is rated
+ALBEDO = 0.2  # ground reflectance of grass and roofs
+# wiring, inverter and soiling losses between the panel output and the delivered energy
+SYSTEM_EFFICIENCY = 0.86
+# power change per °C of cell temperature above 25 °C, cells heat (NOCT - 20) °C per 800 W/m²
+TEMPERATURE_COEFFICIENT = -0.004
+NOCT = 45.0
+# air temperature of the clear sky model, weather files bring their own
+CLEAR_SKY_TEMPERATURE = 15.0
+# share of the beam falling on a clear sky day that arrives as sky diffuse light (Meinel)
+DIFFUSE_FRACTION = 0.1
+# ASHRAE incidence angle modifier of the glass cover
+IAM_B0 = 0.05
+# share of a roof that panels cover when only the roof area is known
+PACKING_FACTOR = 0.7
+DEFAULT_PANEL_SIZE = (1.134, 1.722)  # meters, a common 108 cell module
+
+PanelSpec = namedtuple("PanelSpec", ["wattage", "width", "height"])
+# tilt and azimuth in degrees, azimuth clockwise from north; panel_count None fills the roof area
+Roof = namedtuple("Roof", ["tilt", "azimuth", "area", "panel_count"])
+# daylight hours of a year: UTC times, (T, 3) sun vectors, W/m² components and air temperature in °C
+Irradiance = namedtuple("Irradiance", ["times", "sun", "dni", "dhi", "ghi", "temperature"])
+# monthly is (roofs, 12) kWh, annual (roofs,) kWh
+YieldResult = namedtuple("YieldResult", ["monthly", "annual", "panel_count", "installed_kwp"])
+
+
+def roof_normals(tilt, azimuth):
+    """(R, 3) unit normals (east, north, up) of roofs with tilt and azimuth arrays in degrees"""
+    return angle_vectors(np.asarray(tilt, dtype=float), np.asarray(azimuth, dtype=float))
+
+
+def air_mass(cos_zenith):
+    """Relative optical air mass (Kasten & Young 1989), nan while the sun is down"""
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    with np.errstate(invalid="ignore"):
+        mass = 1 / (cos_zenith + 0.50572 * (96.07995 - zenith) ** -1.6364)
+    return np.where(cos_zenith > 0, mass, np.nan)
+
+
+def clear_sky(times, cos_zenith):
+    """(dni, dhi, ghi) in W/m² of a cloudless sky, Meinel beam model with a fixed diffuse share"""
+    day_of_year = (times.astype("datetime64[D]") - times.astype("datetime64[Y]")).astype(float)
+    extraterrestrial = SOLAR_CONSTANT * (1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365))
+    dni = np.nan_to_num(extraterrestrial * 0.7 ** (air_mass(cos_zenith) ** 0.678))
+    dhi = DIFFUSE_FRACTION * dni
+    return dni, dhi, dni * np.maximum(cos_zenith, 0) + dhi
+
+
+def beam_factor(cos_incidence):
+    """cos(incidence) times the ASHRAE modifier 1 - b0 (1 / cos - 1), which reduces to (1 + b0) cos - b0"""
+    return np.maximum((1 + IAM_B0) * cos_incidence - IAM_B0, 0)
+
+
+def sky_factors(normals, albedo=ALBEDO):
+    """(R, 1) view factors of the isotropic sky and of the ground of planes with (R, 3) normals"""
+    cos_tilt = normals[:, 2:3]
+    return (1 + cos_tilt) / 2, albedo * (1 - cos_tilt) / 2
+
+
+def plane_of_array(normals, sun, dni, dhi, ghi, albedo=ALBEDO):
+    """(R, T) irradiance in W/m² on planes with (R, 3) normals for (T, 3) sun vectors.
+
+    Beam through the incidence angle modifier, isotropic sky diffuse and ground reflected light.
+    """
+    sky, ground = sky_factors(normals, albedo)
+    return dni * beam_factor(normals @ sun.T) + sky * dhi + ground * ghi
+
+
+def month_matrix(times):
+    """(T, 12) one-hot month of every time, hourly values @ month_matrix are monthly sums"""
+    months = times.astype("datetime64[M]").astype(int) % 12
+    return (months[:, None] == np.arange(12)).astype(float)
+
+
+def panel_counts(roofs, panel):
+    """Panels per roof, roofs without a count get as many as fit on PACKING_FACTOR of their area"""
+    panel_area = panel.width * panel.height
+    return np.array(
+        [
+            max(int(roof.panel_count), 0)
+            if roof.panel_count is not None
+            else int(max(roof.area, 0) * PACKING_FACTOR // panel_area)
+            for roof in roofs
+        ]
+    )
+
+
+def polygon_roof(polygon, latitude):
+    """Roof of a stored RoofPolygon, roofs without a known downslope direction face the equator"""
+    azimuth = roof_azimuth(polygon.coordinates or [], polygon.bottom_edge_index)
+    if azimuth is None:
+        azimuth = 180.0 if latitude >= 0 else 0.0
+    return Roof(polygon.tilt_angle or 0.0, azimuth, polygon.area, None)
+
+
+def split_panels(total, areas):
+    """Spread `total` panels over roofs in proportion to their area, largest remainders get the leftovers"""
+    areas = np.maximum(np.asarray(areas, dtype=float), 0)
+    if not areas.sum():
+        return [0] * len(areas)
+    shares = total * areas / areas.sum()
+    counts = np.floor(shares).astype(int)
+    counts[np.argsort(counts - shares)[: total - counts.sum()]] += 1
+    return counts.tolist()
+
+
+def daylight_irradiance(latitude, longitude, year, weather=None, tables=None):
+    """Irradiance of the hours with light, clear sky or from a weather_store.Weather typical year.
+
+    Sun vectors are read from a sun_table.SunTableCache, the process wide one by default, so nearby sites share
+    the tables instead of computing sun positions again.
+    """
+    times = hourly_times(year)
+    sun = (tables or sun_table.get_cache()).sun_vectors(times, latitude, longitude).astype(float)
+
+    if weather is None:
+        # night hours produce nothing, about half the year is skipped
+        daylight = sun[:, 2] > 0
+        times, sun = times[daylight], sun[daylight]
+        dni, dhi, ghi = clear_sky(times, sun[:, 2])
+        return Irradiance(times, sun, dni, dhi, ghi, np.full(len(times), CLEAR_SKY_TEMPERATURE))
+
+    # memory mapped columns, only the hours with light are read
+    hours = tmy_hours(times)
+    daylight = np.asarray(weather.ghi)[hours] > 0
+    times, sun, hours = times[daylight], sun[daylight], hours[daylight]
+    # measured beam around sunrise and sunset can fall on hours the computed sun is still down
+    dni = np.where(sun[:, 2] > 0, np.asarray(weather.dni)[hours], 0)
+    dhi, ghi = np.asarray(weather.dhi)[hours], np.asarray(weather.ghi)[hours]
+    return Irradiance(times, sun, dni, dhi, ghi, np.asarray(weather.temp_air)[hours])
+
+
+def annual_yield(roofs, panel, latitude, longitude, year, weather=None, tables=None):
+    """Hourly energy of every roof summed per month, clear sky or from a weather_store.Weather typical year.
+
+    Sun positions and irradiance are computed once for the year and shared by all roofs, the roofs only add
+    an (R, 3) x (3, T) product over the daylight hours.
+    """
+    light = daylight_irradiance(latitude, longitude, year, weather, tables)
+
+    normals = roof_normals([roof.tilt for roof in roofs], [roof.azimuth for roof in roofs]).reshape(-1, 3)
+    irradiance = plane_of_array(normals, light.sun, light.dni, light.dhi, light.ghi)
+    cell_temperature = light.temperature + (NOCT - 20) / 800 * irradiance
+    efficiency = SYSTEM_EFFICIENCY * (1 + TEMPERATURE_COEFFICIENT * (cell_temperature - 25))
+
+    counts = panel_counts(roofs, panel)
+    installed_kwp = counts * panel.wattage / 1000
+    # one hour steps, W/m² over the rated irradiance is the share of the rated power
+    hourly = installed_kwp[:, None] * irradiance / STC_IRRADIANCE * efficiency
+    monthly = hourly @ month_matrix(light.times)
+    return YieldResult(monthly=monthly, annual=monthly.sum(axis=1), panel_count=counts, installed_kwp=installed_kwp)
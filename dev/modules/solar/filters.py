@@ -0,0 +1,54 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import fold_name
+
+RANGE_FIELDS = ("wattage", "efficiency", "cost", "width", "height", "thickness")
+# sorts after every other character, "name < prefix + MAX_CHAR" is the end of a prefix range
+MAX_CHAR = chr(0x10FFFF)
+
+
+def parse_number(params, name):
+    try:
+        return float(params[name])
+    except ValueError:
+        raise ParseError({"error": f"{name} must be a number"}) from None
+
+
+class PanelFilter(BaseFilterBackend):
+    """Catalog filters, e.g. ?min_wattage=400&max_cost=200&manufacturer=1,2&name=tiger
+
+    Every range field takes min_<field> and max_<field>, name is a case insensitive prefix.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+
+        for field in RANGE_FIELDS:
+            if params.get(f"min_{field}"):
+                filters[f"{field}__gte"] = parse_number(params, f"min_{field}")
+            if params.get(f"max_{field}"):
+                filters[f"{field}__lte"] = parse_number(params, f"max_{field}")
+
+        if params.get("manufacturer"):
+            try:
+                filters["manufacturer_id__in"] = [int(value) for value in params["manufacturer"].split(",")]
+            except ValueError:
+                raise ParseError({"error": "manufacturer must be a comma separated list of ids"}) from None
+
+        # folded in Python on both sides, SQLite lower() would leave "Š" alone
+        prefix = fold_name(params.get("name", "").strip())
+        if prefix:
+            # a range instead of LIKE so SQLite can use the name_key index
+            filters["name_key__gte"] = prefix
+            filters["name_key__lt"] = prefix + MAX_CHAR
+
+        return queryset.filter(**filters)
+
+
+def is_filtered(request):
+    """True when the request uses any catalog filter"""
+    params = request.query_params
+    names = {"manufacturer", "name"} | {f"{bound}_{field}" for field in RANGE_FIELDS for bound in ("min", "max")}
+    return any(params.get(name) for name in names)
@@ -0,0 +1,67 @@
+import math
+
+EARTH_RADIUS = 6371008.8  # mean earth radius in meters
+
+
+def valid_coordinates(coordinates):
+    """True for a list of [lat, lng, ...] vertices whose lat and lng are finite numbers"""
+    return isinstance(coordinates, list) and all(
+        isinstance(vertex, list)
+        and len(vertex) >= 2
+        and all(isinstance(value, int | float) and not isinstance(value, bool) for value in vertex[:2])
+        and all(math.isfinite(value) for value in vertex[:2])
+        for vertex in coordinates
+    )
+
+
+def roof_area(coordinates, tilt_angle=0):
+    """Roof surface in m² of a [[lat, lng], ...] polygon, the footprint is enlarged by the roof tilt.
+
+    Vertices are projected onto a plane through the first vertex, which is accurate for building sized polygons.
+    Malformed coordinates stored before they were validated have no area.
+    """
+    if not valid_coordinates(coordinates) or len(coordinates) < 3:
+        return 0.0
+
+    lat0 = math.radians(coordinates[0][0])
+    lng0 = math.radians(coordinates[0][1])
+    scale = math.cos(lat0)
+
+    points = [
+        ((math.radians(lng) - lng0) * scale * EARTH_RADIUS, (math.radians(lat) - lat0) * EARTH_RADIUS)
+        for lat, lng, *_ in coordinates
+    ]
+
+    # shoelace formula
+    footprint = (
+        abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1], strict=True))) / 2
+    )
+
+    tilt = math.radians(tilt_angle or 0)
+    if math.cos(tilt) <= 0.01:
+        # vertical or broken tilt values, report the footprint only
+        return footprint
+    return footprint / math.cos(tilt)
+
+
+def roof_azimuth(coordinates, bottom_edge_index):
+    """Compass direction in degrees (clockwise from north) a roof slopes down to, None without a bottom edge.
+
+    The roof falls towards its bottom edge (eave), i.e. it faces away from the polygon across that edge.
+    """
+    if bottom_edge_index is None or not valid_coordinates(coordinates) or len(coordinates) < 3:
+        return None
+
+    scale = math.cos(math.radians(coordinates[0][0]))
+    points = [(lng * scale, lat) for lat, lng, *_ in coordinates]
+    start = points[bottom_edge_index % len(points)]
+    end = points[(bottom_edge_index + 1) % len(points)]
+    if start == end:
+        return None
+
+    # the outward side of an edge depends on the winding, the shoelace sign tells counterclockwise polygons
+    winding = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1], strict=True))
+    east, north = end[1] - start[1], start[0] - end[0]
+    if winding < 0:
+        east, north = -east, -north
+    return math.degrees(math.atan2(east, north)) % 360
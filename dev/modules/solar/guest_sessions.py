@@ -0,0 +1,92 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.core.exceptions import SuspiciousOperation
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from . import routers
+
+
+class SessionStore(DBSessionStore):
+    """Database sessions that live next to their guest: sessions of guest store guests in the guest store,
+    registered and anonymous sessions in the primary database so cleanup_guests never touches them"""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # database the session row was loaded from, None for new sessions
+        self.loaded_from = None
+
+    @staticmethod
+    def database(data):
+        """Alias a session with this data is saved in"""
+        alias = routers.guest_database_alias()
+        guest_user_id = data.get("guest_user_id")
+        if (
+            alias
+            and guest_user_id
+            and data.get(routers.GUEST_DATABASE_KEY) == alias
+            and str(data.get(SESSION_KEY, guest_user_id)) == str(guest_user_id)
+        ):
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def _get_session_from_db(self):
+        # sessions written before the guest store was configured are still in the primary database
+        try:
+            for alias in routers.guest_aliases():
+                session = (
+                    self.model.objects.using(alias)
+                    .filter(session_key=self.session_key, expire_date__gt=timezone.now())
+                    .first()
+                )
+                if session is not None:
+                    self.loaded_from = alias
+                    return session
+        except SuspiciousOperation:
+            pass
+        self._session_key = None
+        return None
+
+    def exists(self, session_key):
+        return any(
+            self.model.objects.using(alias).filter(session_key=session_key).exists()
+            for alias in routers.guest_aliases()
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        obj = self.create_model_instance(data)
+        using = self.database(data)
+        # a session that changes databases, e.g. a guest logging into a registered account, is inserted anew
+        moved = not must_create and self.loaded_from not in (None, using)
+        insert = must_create or moved
+        try:
+            with transaction.atomic(using=using):
+                obj.save(force_insert=insert, force_update=not insert, using=using)
+        except IntegrityError:
+            if must_create:
+                raise CreateError from None
+            raise
+        except DatabaseError:
+            if not must_create:
+                raise UpdateError from None
+            raise
+        if moved:
+            self.model.objects.using(self.loaded_from).filter(session_key=obj.session_key).delete()
+        self.loaded_from = using
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        for alias in routers.guest_aliases():
+            self.model.objects.using(alias).filter(session_key=session_key).delete()
+
+    @classmethod
+    def clear_expired(cls):
+        for alias in routers.guest_aliases():
+            cls.get_model_class().objects.using(alias).filter(expire_date__lt=timezone.now()).delete()
@@ -1,22 +1,43 @@
 import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
 from django.utils import timezone
 
+from . import routers
+from .models import PolygonChange, RoofPolygon, SolarProject, UserProfile
 
-def get_or_create_guest_user(request):
-    """Get existing guest user or create a new one"""
+
+def activity_interval():
+    """Seconds between two last_activity writes of the same guest"""
+    return getattr(settings, "SOLAR_GUEST_ACTIVITY_INTERVAL", 300)
+
+
+def touch_guest_activity(user_id):
+    """Bump last_activity, but write it at most once per activity_interval() for each guest"""
+    # add() only succeeds when no recent write is remembered, so concurrent requests write once
+    if cache.add(f"solar:guest-activity:{user_id}", True, activity_interval()):
+        UserProfile.objects.filter(user_id=user_id).update(last_activity=timezone.now())
+
+
+def get_guest_user(request):
+    """Guest user of this session, or None if the session never wrote anything"""
     guest_user_id = request.session.get("guest_user_id")
 
     if guest_user_id:
+        # a logged in guest is already loaded by the auth middleware
+        if request.user.is_authenticated and request.user.id == guest_user_id:
+            touch_guest_activity(guest_user_id)
+            return request.user
+
         try:
 
             user = User.objects.get(id=guest_user_id)
-
-            user.profile.last_activity = timezone.now()
-            user.profile.save()
+            touch_guest_activity(user.id)
 
             if not request.user.is_authenticated:
                 login(request, user)
@@ -25,10 +46,22 @@ def get_or_create_guest_user(request):
         except User.DoesNotExist:
             pass
 
-    #new guest user with a random username
-    username = f"guest_{uuid.uuid4().hex[:8]}"
-    random_password = uuid.uuid4().hex
-    guest_user = User.objects.create_user(username=username, email="", password=random_password)
+    return None
+
+
+def get_or_create_guest_user(request):
+    """Get existing guest user or create a new one, only call it when the request stores something"""
+    guest_user = get_guest_user(request)
+    if guest_user:
+        return guest_user
+
+    # the rest of the request works with the new guest, so it goes to the guest store too
+    routers.activate_guest_store()
+
+    # new guest user with a random username, guests never log in with a password so skip hashing one
+    guest_user = User(username=f"guest_{uuid.uuid4().hex[:8]}", email="")
+    guest_user.set_unusable_password()
+    guest_user.save()
 
     # guest flag and expiry
     profile = guest_user.profile
@@ -36,17 +69,46 @@ def get_or_create_guest_user(request):
     profile.expiry_date = timezone.now() + timedelta(days=7)
     profile.save()
 
-    # store in session and log in the user
+    # store in session and log in the user, the alias keeps routing the guest to where it was created
     request.session["guest_user_id"] = guest_user.id
+    request.session[routers.GUEST_DATABASE_KEY] = guest_user._state.db
     login(request, guest_user)
 
     return guest_user
 
 
+def find_guest_user(guest_user_id):
+    """Guest user with this id from the guest store or the primary database, None if there is none"""
+    for alias in routers.guest_aliases():
+        guest_user = User.objects.using(alias).filter(id=guest_user_id, profile__is_guest=True).first()
+        if guest_user:
+            return guest_user
+    return None
+
+
+def guest_database(session):
+    """Alias of the database the guest of this session lives in, None for sessions without a guest"""
+    guest_user_id = session.get("guest_user_id")
+    if not guest_user_id:
+        return None
+
+    alias = session.get(routers.GUEST_DATABASE_KEY)
+    if alias is None:
+        # guests from before the alias was stored, e.g. created before the guest store was configured
+        guest_user = find_guest_user(guest_user_id)
+        if guest_user is None:
+            return None
+        alias = session[routers.GUEST_DATABASE_KEY] = guest_user._state.db
+    return alias
+
+
 def convert_guest_to_registered(guest_user, username, email, password):
-    """Convert a guest user to a registered user"""
+    """Convert a guest user to a registered user, returns the registered user or None for non-guests"""
     if not guest_user.profile.is_guest:
-        return False
+        return None
+
+    if routers.in_guest_store(guest_user):
+        return move_guest_to_primary(guest_user, username, email, password)
 
     guest_user.username = username
     guest_user.email = email
@@ -58,4 +120,36 @@ def convert_guest_to_registered(guest_user, username, email, password):
     profile.expiry_date = None
     profile.save()
 
-    return True
+    return guest_user
+
+
+def move_guest_to_primary(guest_user, username, email, password):
+    """Recreate a guest from the guest store with all its projects in the primary database"""
+    source = guest_user._state.db
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        user = User(username=username, email=email, date_joined=guest_user.date_joined)
+        user.set_password(password)
+        user.save(using=DEFAULT_DB_ALIAS)
+
+        for project in SolarProject.objects.using(source).filter(user_id=guest_user.id):
+            polygons = list(RoofPolygon.objects.using(source).filter(project_id=project.id))
+            changes = list(PolygonChange.objects.using(source).filter(project_id=project.id))
+
+            created_at = project.created_at
+            project.pk = None
+            project.user_id = user.id
+            project._state.adding = True
+            project.save(using=DEFAULT_DB_ALIAS)
+            SolarProject.objects.using(DEFAULT_DB_ALIAS).filter(id=project.id).update(created_at=created_at)
+
+            for row in polygons + changes:
+                row.pk = None
+                row.project_id = project.id
+            RoofPolygon.objects.using(DEFAULT_DB_ALIAS).bulk_create(polygons)
+            PolygonChange.objects.using(DEFAULT_DB_ALIAS).bulk_create(changes)
+
+    # the copy is committed, the guest store rows are not needed anymore
+    guest_user.delete()
+
+    return user
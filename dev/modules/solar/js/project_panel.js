@@ -85,7 +85,7 @@ function loadProjects() {
             renderProjects(data);
 
             for (const project of projects) {
-                updateAddressForProject(project.id);
+                updateAddressForProject(project.id, project);
             }
         })
         .catch(error => {
@@ -185,7 +185,7 @@ function selectProject(project) {
 
 
 const addressLookupsInProgress = new Set();
-function updateAddressForProject(projectId) {
+function updateAddressForProject(projectId, summary) {
     if (addressLookupsInProgress.has(projectId)) {
         return;
     }
@@ -193,7 +193,14 @@ function updateAddressForProject(projectId) {
     addressLookupsInProgress.add(projectId);
     
     import('./project.js').then(module => {
-        module.calculateProjectCenter(projectId).then(center => {
+        // the project list already carries the polygon center, no need to load every polygon for it
+        const centerRequest = summary
+            ? Promise.resolve(summary.center_latitude === null
+                ? null
+                : { lat: summary.center_latitude, lng: summary.center_longitude })
+            : module.calculateProjectCenter(projectId);
+
+        centerRequest.then(center => {
             if (center) {
                 module.getAddressFromCoordinates(center.lat, center.lng).then(address => {
                     if (address) {
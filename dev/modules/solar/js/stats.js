@@ -19,14 +19,14 @@ export function setupTabSwitching(modal) {
 }
 
 
-export function createMonthlyChart() {
+export async function createMonthlyChart() {
     const ctx = document.getElementById('monthly-power-chart').getContext('2d');
     if (!ctx) {
         console.error('Could not find chart canvas element');
         return;
     }
     
-    const monthlyData = calculateMonthlyProduction();
+    const monthlyData = await fetchMonthlyProduction();
     const tabElement = document.getElementById('monthly-generation');
     
     if (typeof Chart === 'undefined') {
@@ -91,7 +91,7 @@ export function createMonthlyChart() {
         
         <!-- Note with 90% width and centered -->
         <div class="stats-note" style="width: 90%; margin: 15px auto 0 auto;">
-            <p><i class="fas fa-info-circle"></i> <strong>Note:</strong> These estimates are based on average sunshine hours and account for seasonal variations.</p>
+            <p><i class="fas fa-info-circle"></i> <strong>Note:</strong> ${monthlyData.note}</p>
         </div>
     `;
 
@@ -184,10 +184,103 @@ export function calculateMonthlyProduction() {
         values: monthlyValues,
         peakMonth: months[peakIndex],
         annualProduction: annualProduction,
-        avgMonthlyProduction: avgMonthlyProduction
+        avgMonthlyProduction: avgMonthlyProduction,
+        note: 'These estimates are based on average sunshine hours and account for seasonal variations.'
     };
 }
 
+// server side yield of the placed panels for the project location and roof orientations,
+// falls back to calculateMonthlyProduction when the project is not saved or the request fails
+export async function fetchMonthlyProduction() {
+    const { getCurrentProjectId } = await import('./project_panel.js');
+    const { getCSRFToken } = await import('./api.js');
+    const projectId = getCurrentProjectId();
+    const panels = threeState.solarPanel.panels;
+    if (!projectId || !panels.length) {
+        return calculateMonthlyProduction();
+    }
+
+    const counts = {};
+    for (const panel of panels) {
+        const roofIndex = panel.userData.roofIndex;
+        counts[roofIndex] = (counts[roofIndex] || 0) + 1;
+    }
+
+    const body = {
+        roofs: Object.entries(counts).map(([polygonId, count]) => ({ polygon_id: polygonId, panel_count: count })),
+    };
+    if (threeState.solarPanel.id) {
+        body.panel = threeState.solarPanel.id;
+    }
+
+    try {
+        const response = await fetch(`/solar/api/projects/${projectId}/yield/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCSRFToken(),
+            },
+            body: JSON.stringify(body),
+        });
+        if (!response.ok) {
+            throw new Error(`Server error: ${response.status}`);
+        }
+        const result = await response.json();
+
+        const values = result.monthly_kwh.map(value => Math.round(value));
+        const months = ['January', 'February', 'March', 'April', 'May', 'June',
+                       'July', 'August', 'September', 'October', 'November', 'December'];
+        const annualProduction = values.reduce((sum, val) => sum + val, 0);
+        return {
+            values: values,
+            peakMonth: months[values.indexOf(Math.max(...values))],
+            annualProduction: annualProduction,
+            avgMonthlyProduction: Math.round(annualProduction / 12),
+            note: result.station
+                ? `Estimates for the roof tilt and orientation with the typical weather year of ${result.station.name} (${result.station.distance_km} km away).`
+                : 'Clear sky estimates for the project location, roof tilt and orientation, cloudy days lower the output.'
+        };
+    } catch (error) {
+        console.error('Error loading yield, using the monthly averages:', error);
+        return calculateMonthlyProduction();
+    }
+}
+
+let panelSummaryTimer = null;
+
+// store the placement totals on the project so the server keeps kWp and annual kWh columns for listings
+export function savePanelSummary() {
+    clearTimeout(panelSummaryTimer);
+
+    panelSummaryTimer = setTimeout(async () => {
+        const { getCurrentProjectId } = await import('./project_panel.js');
+        const { getCSRFToken } = await import('./api.js');
+        const projectId = getCurrentProjectId();
+        if (!projectId) {
+            return;
+        }
+
+        // the server spreads the panels over the roofs with the yield model, orientation needs no efficiency here
+        const panels = threeState.solarPanel.panels;
+
+        fetch(`/solar/api/projects/${projectId}/`, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCSRFToken(),
+            },
+            body: JSON.stringify({
+                data: {
+                    panels: {
+                        count: panels.length,
+                        wattage: threeState.solarPanel.power?.wattage || 0,
+                    },
+                },
+            }),
+        }).catch(error => console.error('Error saving panel summary:', error));
+    }, 1000);
+}
+
 export function updateSummaryStats() {
     return;
 }
\ No newline at end of file
@@ -14,14 +14,8 @@ function debounce(func, wait) {
     };
 }
 
-function _saveAllRoofData() {
-    const projectId = getCurrentProjectId();
-    
-    if (!projectId) {
-        console.error("No project selected");
-        return;
-    }
-    
+// base and vertex heights of every roof, the payload of update-all-heights and roof-efficiency
+export function collectHeightData() {
     const allHeightData = {
         polygons: {}
     };
@@ -54,6 +48,19 @@ function _saveAllRoofData() {
         // Add to the complete data structure
         allHeightData.polygons[polygonId] = heightData;
     });
+
+    return allHeightData;
+}
+
+function _saveAllRoofData() {
+    const projectId = getCurrentProjectId();
+    
+    if (!projectId) {
+        console.error("No project selected");
+        return;
+    }
+    
+    const allHeightData = collectHeightData();
     
     fetch(`/solar/api/projects/${projectId}/update-all-heights/`, {
         method: "PATCH",
@@ -3,7 +3,9 @@ import { state } from '../state.js';
 import { isPointInPolygon, getParentRoofIndex, projectVerticesToPlane, calculateBounds } from './geometry_utils.js';
 import { createSolarPanelMesh, clearExistingPanels } from './panel_model.js';
 import { calculateRoofNormal, calculateAverageRoofNormal, calculateRoofCenter, calculateRoofAxes, isVerticalMesh } from './roof_analysis.js';
-import { calculateRoofSolarEfficiency } from './sun_efficiency.js';
+import { calculateRoofSolarEfficiency, getProjectCoordinates } from './sun_efficiency.js';
+import { getCSRFToken } from '../../api.js';
+import { savePanelSummary } from '../../stats.js';
 
 // Calculate grid of panels
 export function calculatePanelGrid(bounds, panelSpec) {
@@ -427,6 +429,7 @@ export function updatePanelsForAllSelectedRoofs() {
     
     // If no roofs are selected, just return
     if (state.solarPanel.selectedRoofIndices.length === 0) {
+        savePanelSummary();
         return 0;
     }
     
@@ -765,6 +768,8 @@ export function updatePanelsForAllSelectedRoofs() {
     state.solarPanel.totalMaxPanelsFit = totalMaxPanelsFit;
     state.solarPanel.totalPanelsFit = result.totalPanelsPlaced;
 
+    savePanelSummary();
+
     return result.totalPanelsPlaced;
 }
 
@@ -806,6 +811,8 @@ function getEfficiencyColor(efficiency) {
 
 //////////////////////////////////////////////////////////////////////////////////
 export function visualizeAllRoofEfficiencies() {
+    const scoredRoofs = [];
+
     // Process all roof meshes
     for (const roofMesh of state.currentMeshes) {
         if (!roofMesh || !roofMesh.userData || !roofMesh.userData.vertices3D) continue;
@@ -819,57 +826,132 @@ export function visualizeAllRoofEfficiencies() {
         
         // Get solar efficiency
         const efficiency = calculateRoofSolarEfficiency(normal);
-        
-        // Apply efficiency-based color
-        const efficiencyColor = getEfficiencyColor(efficiency.efficiency);
                 
         // Store efficiency in userData
         roofMesh.userData.solarEfficiency = efficiency.efficiency;
         roofMesh.userData.solarFacing = efficiency.facing;
-        
-        // Find only appropriate meshes to color (roof surfaces but not walls)
-        const meshesToColor = [];
-        
-        // Add the main roof mesh
-        if (roofMesh) {
-            meshesToColor.push(roofMesh);
-        }
-        
-        // Check children, but only include non-vertical surfaces
-        if (roofMesh.children && roofMesh.children.length > 0) {
-            for (const child of roofMesh.children) {
-                const isVertical = isVerticalMesh(child);
-                if (!isVertical) {
-                    meshesToColor.push(child);
-                }
+
+        colorRoofByEfficiency(roofMesh, efficiency.efficiency);
+        scoredRoofs.push({ roofMesh, tilt: efficiency.tiltAngle, azimuth: efficiency.azimuthAngle });
+    }
+    setupRoofHoverEfficiencyInfo();
+
+    // the estimate above shows right away, the server replaces it with annual insolation of the location
+    scoreRoofsOnServer(scoredRoofs);
+}
+
+let roofScoreRequest = 0;
+
+// saved projects analyze every roof in one roof-efficiency request with the current heights,
+// unsaved ones score the locally computed orientations against the site's insolation table
+async function scoreRoofsOnServer(scoredRoofs) {
+    if (!scoredRoofs.length) return;
+    const request = ++roofScoreRequest;
+
+    const { getCurrentProjectId } = await import('../../project_panel.js');
+    const projectId = getCurrentProjectId();
+    try {
+        const scores = projectId
+            ? await fetchProjectRoofScores(projectId)
+            : await fetchRoofScores(scoredRoofs);
+        // a newer visualization started while this request was running
+        if (request !== roofScoreRequest) return;
+
+        scoredRoofs.forEach(({ roofMesh }, i) => {
+            const score = projectId ? scores.get(String(roofMesh.userData.polygonIndex)) : scores[i];
+            if (!score) return;
+            roofMesh.userData.solarEfficiency = Math.max(1, score.efficiency);
+            roofMesh.userData.solarInsolation = score.insolation;
+            if (score.facing) {
+                roofMesh.userData.solarFacing = score.facing;
             }
-        }
-        
-        // Apply color to all relevant meshes
-        for (const mesh of meshesToColor) {
-            if (!mesh.material) continue;
-            
-            // Store original color if not already stored
-            if (!mesh.userData.originalColor) {
-                mesh.userData.originalColor = mesh.material.color ? 
-                    mesh.material.color.getHex() : 0xffffff;
+            // the colors may have been hidden in the meantime
+            if (state.showingEfficiencyColors) {
+                colorRoofByEfficiency(roofMesh, roofMesh.userData.solarEfficiency);
             }
-            
-            // Apply to ALL materials
-            if (Array.isArray(mesh.material)) {
-                mesh.material.forEach(mat => {
-                    if (mat.color) {
-                        mat.color.copy(efficiencyColor);
-                    }
-                    mat.needsUpdate = true;
-                });
-            } else if (mesh.material.color) {
-                mesh.material.color.copy(efficiencyColor);
-                mesh.material.needsUpdate = true;
+        });
+    } catch (error) {
+        console.error('Error scoring roofs, keeping the estimate:', error);
+    }
+}
+
+async function postJSON(url, body) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken(),
+        },
+        body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+        throw new Error(`Server error: ${response.status}`);
+    }
+    return response.json();
+}
+
+// Map of polygon id to the server side plane fit, facing and efficiency
+async function fetchProjectRoofScores(projectId) {
+    const { collectHeightData } = await import('../persistence.js');
+    const result = await postJSON(`/solar/api/projects/${projectId}/roof-efficiency/`, {
+        // heights may not be saved yet, the debounced save runs a second after an edit
+        heights: collectHeightData().polygons,
+    });
+    return new Map(result.roofs.map(roof => [roof.polygon_id, roof]));
+}
+
+// [{ efficiency, insolation }] in the order of scoredRoofs
+async function fetchRoofScores(scoredRoofs) {
+    const { latitude, longitude } = getProjectCoordinates();
+    const result = await postJSON('/solar/api/roof-scores/', {
+        lat: latitude,
+        lng: longitude,
+        tilt: scoredRoofs.map(roof => Math.min(Math.max(roof.tilt, 0), 90)),
+        azimuth: scoredRoofs.map(roof => roof.azimuth),
+    });
+    return result.efficiency.map((efficiency, i) => ({ efficiency, insolation: result.insolation[i] }));
+}
+
+function colorRoofByEfficiency(roofMesh, efficiency) {
+    // Apply efficiency-based color
+    const efficiencyColor = getEfficiencyColor(efficiency);
+
+    // Find only appropriate meshes to color (roof surfaces but not walls)
+    const meshesToColor = [roofMesh];
+
+    // Check children, but only include non-vertical surfaces
+    if (roofMesh.children && roofMesh.children.length > 0) {
+        for (const child of roofMesh.children) {
+            const isVertical = isVerticalMesh(child);
+            if (!isVertical) {
+                meshesToColor.push(child);
             }
         }
     }
-    setupRoofHoverEfficiencyInfo();
+
+    // Apply color to all relevant meshes
+    for (const mesh of meshesToColor) {
+        if (!mesh.material) continue;
+
+        // Store original color if not already stored
+        if (!mesh.userData.originalColor) {
+            mesh.userData.originalColor = mesh.material.color ?
+                mesh.material.color.getHex() : 0xffffff;
+        }
+
+        // Apply to ALL materials
+        if (Array.isArray(mesh.material)) {
+            mesh.material.forEach(mat => {
+                if (mat.color) {
+                    mat.color.copy(efficiencyColor);
+                }
+                mat.needsUpdate = true;
+            });
+        } else if (mesh.material.color) {
+            mesh.material.color.copy(efficiencyColor);
+            mesh.material.needsUpdate = true;
+        }
+    }
 }
 
 
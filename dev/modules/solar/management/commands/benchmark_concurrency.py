@@ -0,0 +1,128 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from modules.solar.models import SolarProject
+from modules.solar.views import update_all_heights
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# SQLite defaults of a bare sqlite3 connection, what the project ran with before settings.SQLITE_OPTIONS
+BASELINE_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+WAL_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks concurrent height PATCHes with the baseline, the configured and the WAL SQLite settings. "
+        "Needs a file database, the benchmark data is committed and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent clients")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+        parser.add_argument("--polygons", type=int, default=50, help="Polygons per project")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("benchmark_concurrency needs a file based SQLite database")
+
+        # the height PATCH takes the write lock up front with transactions.immediate() in every profile
+        profiles = [
+            ("baseline", BASELINE_PRAGMAS),
+            ("configured", settings.SQLITE_PRAGMAS),
+            ("wal", {**settings.SQLITE_PRAGMAS, **WAL_PRAGMAS}),
+        ]
+
+        user = User(username=f"bench_{uuid.uuid4().hex[:8]}")
+        user.set_unusable_password()
+        user.save()
+        try:
+            # one project per client, the clients only compete for the database write lock
+            projects = []
+            for i in range(options["threads"]):
+                project = SolarProject.objects.create(name=f"Concurrency {i}", user=user, data={})
+                project.replace_polygons(
+                    [
+                        {"id": f"p-{j}", "coordinates": [[54.68, 25.27], [54.69, 25.28], [54.70, 25.27]]}
+                        for j in range(options["polygons"])
+                    ]
+                )
+                projects.append(project)
+
+            for name, pragmas in profiles:
+                # journal_mode is stored in the database file, switch it before the clients connect
+                with connection.cursor() as cursor:
+                    cursor.execute(f"PRAGMA journal_mode={pragmas['journal_mode']}")
+
+                latencies, errors, elapsed = self.run_clients(user, projects, pragmas, options)
+                self.report(name, latencies, errors, elapsed)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_PRAGMAS['journal_mode']}")
+            SolarProject.objects.filter(user=user).delete()
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, the wal profile should wait less"))
+
+    def run_clients(self, user, projects, pragmas, options):
+        factory = APIRequestFactory()
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(len(projects))
+
+        def client(project):
+            # every thread gets its own connection, configure it like a fresh connection of this profile
+            connection.ensure_connection()
+            with connection.cursor() as cursor:
+                for pragma, value in pragmas.items():
+                    if pragma != "journal_mode":
+                        cursor.execute(f"PRAGMA {pragma}={value}")
+
+            payload = {
+                "polygons": {
+                    f"p-{j}": {"baseHeight": 3, "vertexHeights": {str(v): 5.0 + v for v in range(3)}}
+                    for j in range(options["polygons"])
+                }
+            }
+            url = f"/solar/api/projects/{project.id}/update-all-heights/"
+            try:
+                start_barrier.wait()
+                for _ in range(options["requests"]):
+                    request = factory.patch(url, payload, format="json")
+                    force_authenticate(request, user=user)
+
+                    start = time.perf_counter()
+                    response = update_all_heights(request, pk=project.id)
+                    elapsed = time.perf_counter() - start
+
+                    with lock:
+                        latencies.append(elapsed)
+                        if response.status_code != 200:
+                            errors.append(response.data.get("error", response.status_code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(project,)) for project in projects]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - started
+
+    def report(self, name, latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f"{name:>10}: {len(latencies) / elapsed:7.1f} req/s, "
+            f"median {statistics.median(latencies) * 1000:7.2f} ms, p95 {p95 * 1000:7.2f} ms, "
+            f"max {latencies[-1] * 1000:7.2f} ms, {len(errors)} failed"
+        )
+        if errors:
+            self.stdout.write(f"{'':>12}first error: {errors[0]}")
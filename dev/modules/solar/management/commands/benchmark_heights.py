@@ -0,0 +1,67 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from modules.solar.models import SolarProject
+from modules.solar.views import update_all_heights
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+class Command(BaseCommand):
+    help = "Benchmarks update_all_heights for projects of growing size (all data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Polygon counts to test")
+        parser.add_argument("--repeat", type=int, default=5, help="Requests per size, best run is reported")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            user = User(username=f"bench_{uuid.uuid4().hex[:8]}")
+            user.set_unusable_password()
+            user.save()
+
+            for size in options["sizes"]:
+                project = SolarProject.objects.create(name=f"Benchmark {size}", user=user, data={})
+                project.replace_polygons(
+                    [
+                        {"id": f"p-{i}", "coordinates": [[54.68, 25.27], [54.69, 25.28], [54.70, 25.27]]}
+                        for i in range(size)
+                    ]
+                )
+                payload = {
+                    "polygons": {
+                        f"p-{i}": {
+                            "baseHeight": 3,
+                            "vertexHeights": {str(v): 5.0 + v for v in range(3)},
+                            "stableVertexHeights": {f"p-{i}_{v}": 5.0 + v for v in range(3)},
+                        }
+                        for i in range(size)
+                    }
+                }
+
+                best = None
+                for _ in range(options["repeat"]):
+                    url = f"/solar/api/projects/{project.id}/update-all-heights/"
+                    request = factory.patch(url, payload, format="json")
+                    force_authenticate(request, user=user)
+
+                    start = time.perf_counter()
+                    response = update_all_heights(request, pk=project.id)
+                    elapsed = time.perf_counter() - start
+
+                    if response.status_code != 200:
+                        # raised inside atomic() so the benchmark data is rolled back too
+                        raise CommandError(f"Request failed for {size} polygons: {response.data}")
+                    best = elapsed if best is None else min(best, elapsed)
+
+                self.stdout.write(
+                    f"{size:>6} polygons: {best * 1000:8.2f} ms/request, {best / size * 1e6:7.1f} us/polygon"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, per-polygon time should stay flat"))
@@ -0,0 +1,114 @@
+import tempfile
+import time
+from datetime import UTC
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from modules.solar.sun_position import MODES, hourly_times, precise_sun_position, scalar_sun_position
+from modules.solar.sun_table import SunTableCache
+
+# NREL SPA reference example (Reda & Andreas 2008): observer, conditions and the published topocentric result
+SPA_EXAMPLE = {
+    "times": np.datetime64("2003-10-17T19:30:30"),
+    "latitude": 39.742476,
+    "longitude": -105.1786,
+    "height": 1830.14,
+    "pressure": 820,
+    "temperature": 11,
+    "delta_t": 67,
+}
+SPA_ZENITH, SPA_AZIMUTH = 50.11162, 194.34024
+
+
+def angular_distance(zenith_a, azimuth_a, zenith_b, azimuth_b):
+    """Angle in degrees between two sun directions"""
+    # chord between unit vectors, arccos of a dot product loses precision for nearly equal directions
+    a = direction(zenith_a, azimuth_a)
+    b = direction(zenith_b, azimuth_b)
+    chord = np.sqrt(sum((a_axis - b_axis) ** 2 for a_axis, b_axis in zip(a, b, strict=True)))
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+
+def direction(zenith, azimuth):
+    zenith, azimuth = np.radians(zenith), np.radians(azimuth)
+    return np.sin(zenith) * np.sin(azimuth), np.sin(zenith) * np.cos(azimuth), np.cos(zenith)
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the sun position modes: positions per second and angular error of each accuracy tier"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sites", type=int, default=50, help="Locations, each gets every hour of --year")
+        parser.add_argument("--year", type=int, default=2025)
+        parser.add_argument("--scalar-sample", type=int, default=20000, help="Positions computed by the scalar loop")
+        parser.add_argument("--table-sites", type=int, default=10, help="Sites looked up in a fresh sun table cache")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        latitude = rng.uniform(-60, 70, (options["sites"], 1))
+        longitude = rng.uniform(-180, 180, (options["sites"], 1))
+        times = hourly_times(options["year"])
+        count = latitude.size * times.size
+
+        positions = {}
+        for mode, calculate in MODES.items():
+            calculate(times[:24], latitude, longitude)  # warm up
+            start = time.perf_counter()
+            positions[mode] = calculate(times, latitude, longitude)
+            self.report(mode, count, time.perf_counter() - start)
+
+        # the scalar loop is slow, time a sample and compare its results with the vectorized ones
+        fast = positions["fast"]
+        sample = min(options["scalar_sample"], count)
+        sites, hours = np.unravel_index(np.arange(sample), fast.zenith.shape)
+        moments = [moment.replace(tzinfo=UTC) for moment in times.astype("datetime64[s]").astype(object)]
+        start = time.perf_counter()
+        reference = [
+            scalar_sun_position(moments[hour], latitude[site, 0], longitude[site, 0])
+            for site, hour in zip(sites, hours, strict=True)
+        ]
+        self.report("scalar", sample, time.perf_counter() - start)
+
+        scalar_error = angular_distance(
+            np.array([position.zenith for position in reference]),
+            np.array([position.azimuth for position in reference]),
+            fast.zenith[sites, hours],
+            fast.azimuth[sites, hours],
+        ).max()
+        self.stdout.write(f"fast vs scalar reference: max {scalar_error:.1e}°")
+
+        # precise is checked against the published SPA result, fast against precise while the sun is up
+        spa = precise_sun_position(**SPA_EXAMPLE)
+        spa_error = angular_distance(spa.zenith, spa.azimuth, SPA_ZENITH, SPA_AZIMUTH)
+        self.stdout.write(f"precise vs NREL SPA example: {spa_error:.4f}°")
+
+        precise = positions["precise"]
+        daylight = precise.elevation > 0
+        error = angular_distance(fast.zenith, fast.azimuth, precise.zenith, precise.azimuth)[daylight]
+        low_sun = precise.elevation[daylight] < 5
+        self.stdout.write(
+            f"fast vs precise, sun up: max {error.max():.3f}°, mean {error.mean():.3f}°, "
+            f"max below 5° elevation {error[low_sun].max():.3f}°"
+        )
+
+        # table lookups, a cold run generates the tables, a warm run only interpolates
+        table_sites = min(options["table_sites"], latitude.size)
+        with tempfile.TemporaryDirectory() as directory:
+            tables = SunTableCache(directory, max_bytes=1024**3)
+            for run in ("cold", "warm"):
+                start = time.perf_counter()
+                for site in range(table_sites):
+                    zenith, azimuth, _ = tables.sun_position(times, latitude[site, 0], longitude[site, 0], "precise")
+                self.report(f"table {run}", table_sites * times.size, time.perf_counter() - start)
+            error = angular_distance(zenith, azimuth, precise.zenith[table_sites - 1], precise.azimuth[table_sites - 1])
+            self.stdout.write(
+                f"table vs precise: max {error.max():.4f}°, {tables.generated} tables, "
+                f"{tables.disk_usage() / 1024**2:.1f} MB"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished"))
+
+    def report(self, mode, count, elapsed):
+        self.stdout.write(
+            f"{mode:>10}: {count:>9} positions in {elapsed * 1000:8.2f} ms, {count / elapsed:12,.0f} positions/s"
+        )
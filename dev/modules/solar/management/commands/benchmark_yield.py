@@ -0,0 +1,66 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from modules.solar import transposition
+from modules.solar.energy_yield import DEFAULT_PANEL_SIZE, PanelSpec, Roof, annual_yield
+
+# budget of one yield calculation of a --roofs project
+TARGET_MS = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the annual yield engine: one clear sky year for a project with many roofs, building an "
+        "insolation table and scoring roof orientations with it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--roofs", type=int, default=50)
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--year", type=int, default=2025)
+        parser.add_argument("--lat", type=float, default=54.68)
+        parser.add_argument("--lng", type=float, default=25.27)
+        parser.add_argument("--scores", type=int, default=100_000, help="Roof orientations scored in one lookup")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        roofs = [
+            Roof(tilt, azimuth, area, None)
+            for tilt, azimuth, area in zip(
+                rng.uniform(0, 60, options["roofs"]),
+                rng.uniform(0, 360, options["roofs"]),
+                rng.uniform(20, 200, options["roofs"]),
+                strict=True,
+            )
+        ]
+        panel = PanelSpec(400, *DEFAULT_PANEL_SIZE)
+        location = options["lat"], options["lng"], options["year"]
+
+        annual_yield(roofs, panel, *location)  # warm up
+        timings = []
+        for _ in range(options["runs"]):
+            start = time.perf_counter()
+            result = annual_yield(roofs, panel, *location)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"{options['roofs']} roofs, {int(result.panel_count.sum())} panels, "
+            f"{result.installed_kwp.sum():.1f} kWp: {result.annual.sum():,.0f} kWh/year"
+        )
+        self.stdout.write(f"median {median:.2f} ms, min {min(timings):.2f} ms, max {max(timings):.2f} ms")
+        style = self.style.SUCCESS if median < TARGET_MS else self.style.WARNING
+        self.stdout.write(style(f"target {TARGET_MS} ms: {'met' if median < TARGET_MS else 'missed'}"))
+
+        start = time.perf_counter()
+        table = transposition.insolation_table(options["lat"], options["lng"])
+        self.stdout.write(f"insolation table {table.shape}: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        tilt, azimuth = rng.uniform(0, 90, options["scores"]), rng.uniform(0, 360, options["scores"])
+        start = time.perf_counter()
+        transposition.interpolate(table, tilt, azimuth)
+        elapsed = time.perf_counter() - start
+        per_roof = elapsed / options["scores"] * 1e6
+        self.stdout.write(f"{options['scores']} roofs scored in {elapsed * 1000:.2f} ms, {per_roof:.3f} µs/roof")
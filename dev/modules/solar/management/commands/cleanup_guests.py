@@ -1,31 +1,87 @@
+import time
+
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
 from django.utils import timezone
-from modules.solar.models import UserProfile
+from modules.solar import routers
+from modules.solar.models import SolarProject
+
+INACTIVE_DAYS = 14
 
 
 class Command(BaseCommand):
     help = "Deletes expired guest users and their data"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Guests deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the guests that would be deleted")
+        parser.add_argument(
+            "--max-runtime", type=float, default=None, help="Stop starting new batches after this many seconds"
+        )
+        parser.add_argument("--vacuum", action="store_true", help="Compact the guest store database afterwards")
+
     def handle(self, *args, **options):
-        # Find expired guest accounts
-        expired_profiles = UserProfile.objects.filter(is_guest=True, expiry_date__lt=timezone.now())
+        now = timezone.now()
+        inactive_date = now - timezone.timedelta(days=INACTIVE_DAYS)
+        started = time.monotonic()
+        count = 0
+
+        # guests live in the guest store if there is one, older guests may still be in the primary database
+        for alias in routers.guest_aliases():
+            # expired guests and guests without activity for 14 days in one query
+            guests = (
+                User.objects.using(alias)
+                .filter(profile__is_guest=True)
+                .filter(Q(profile__expiry_date__lt=now) | Q(profile__last_activity__lt=inactive_date))
+            )
+
+            if options["dry_run"]:
+                projects = SolarProject.objects.using(alias).filter(user__in=guests).count()
+                self.stdout.write(f"Would delete {guests.count()} guest users with {projects} projects from {alias}")
+                continue
+
+            count += self.delete_guests(alias, guests, started, options)
 
+        if options["dry_run"]:
+            return
+
+        store = routers.guest_database_alias()
+        if options["vacuum"] and store and store != DEFAULT_DB_ALIAS:
+            vacuum_started = time.monotonic()
+            with connections[store].cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write(f"Vacuumed {store} in {time.monotonic() - vacuum_started:.2f}s")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully deleted {count} expired guest users in {time.monotonic() - started:.2f}s")
+        )
+
+    def delete_guests(self, alias, guests, started, options):
         count = 0
-        for profile in expired_profiles:
-            user = profile.user
-            self.stdout.write(f"Deleting guest user: {user.username}")
-            # This will cascade delete the profile and all user's projects
-            user.delete()
-            count += 1
-
-        # Also delete inactive guests (no activity for 14 days)
-        inactive_date = timezone.now() - timezone.timedelta(days=14)
-        inactive_profiles = UserProfile.objects.filter(is_guest=True, last_activity__lt=inactive_date)
-
-        for profile in inactive_profiles:
-            user = profile.user
-            self.stdout.write(f"Deleting inactive guest user: {user.username}")
-            user.delete()
-            count += 1
-
-        self.stdout.write(self.style.SUCCESS(f"Successfully deleted {count} expired guest users"))
+        batch = 0
+        while True:
+            if options["max_runtime"] is not None and time.monotonic() - started >= options["max_runtime"]:
+                self.stdout.write(self.style.WARNING("Stopping early, --max-runtime reached"))
+                break
+
+            ids = list(guests.values_list("id", flat=True)[: options["batch_size"]])
+            if not ids:
+                break
+
+            batch_started = time.monotonic()
+            # one short transaction per batch, every table is deleted with a few set based queries
+            with transaction.atomic(using=alias):
+                _, deleted = SolarProject.objects.using(alias).filter(user_id__in=ids).delete()
+                User.objects.using(alias).filter(id__in=ids).delete()
+
+            batch += 1
+            count += len(ids)
+            projects = deleted.get(SolarProject._meta.label, 0)
+            self.stdout.write(
+                f"Batch {batch}: deleted {len(ids)} guest users and {projects} projects "
+                f"in {time.monotonic() - batch_started:.2f}s"
+            )
+
+        return count
@@ -0,0 +1,158 @@
+import csv
+import json
+import math
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from modules.solar import catalog_cache
+from modules.solar.models import PanelManufacturer, SolarPanel, fold_name
+
+NUMBER_FIELDS = ["width", "height", "thickness", "wattage", "efficiency", "cost"]
+UPDATE_FIELDS = ["name", "name_key", "manufacturer", *NUMBER_FIELDS, "is_default", "is_public"]
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        yield from csv.DictReader(file)
+
+
+def read_json_lines(path):
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_json_array(path):
+    """Objects of a top level JSON array, decoded one at a time so only a single entry is held in memory"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as file:
+        buffer = file.read(CHUNK_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise CommandError("JSON catalogs must be an array of objects, use .jsonl for one object per line")
+        buffer = buffer[1:]
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # the entry continues in the next chunk
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    raise CommandError("Unexpected end of JSON catalog") from None
+                buffer += chunk
+                continue
+            yield entry
+            buffer = buffer[end:]
+
+
+READERS = {".csv": read_csv, ".json": read_json_array, ".jsonl": read_json_lines}
+
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def parse_number(value):
+    # float() also accepts "nan" and "inf", which no datasheet value can be
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+class Command(BaseCommand):
+    help = "Imports public panel datasheets from CSV, JSON or JSON Lines, existing catalog entries are updated"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file (.csv, .json or .jsonl)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Panels written per query")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(f"Unsupported catalog format: {path.suffix or path.name}")
+        if not path.exists():
+            raise CommandError(f"Catalog file not found: {path}")
+
+        # manufacturers are few, all of them stay in memory keyed by their normalized name
+        self.manufacturers = {
+            manufacturer.name.strip().casefold(): manufacturer for manufacturer in PanelManufacturer.objects.all()
+        }
+
+        started = time.monotonic()
+        rows = imported = skipped = 0
+        # keyed by catalog_id, a file listing a panel twice keeps its last entry
+        batch = {}
+        for rows, entry in enumerate(reader(path), start=1):
+            try:
+                panel = self.build_panel(entry)
+            except (KeyError, TypeError, ValueError) as e:
+                skipped += 1
+                if skipped <= 10:
+                    self.stderr.write(f"Row {rows} skipped: {e!r}")
+                continue
+
+            batch[panel.catalog_id] = panel
+            if len(batch) >= options["batch_size"]:
+                imported += self.write_batch(batch)
+                batch = {}
+
+        imported += self.write_batch(batch)
+        # bulk_create sends no signals, the stamp lives in the shared cache so running servers see the change
+        catalog_cache.invalidate()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} panels from {rows} rows ({skipped} skipped, "
+                f"{len(self.manufacturers)} manufacturers) in {elapsed:.2f}s, {rows / max(elapsed, 1e-9):.0f} rows/s"
+            )
+        )
+
+    def build_panel(self, entry):
+        name = str(entry["name"]).strip()
+        manufacturer_name = str(entry.get("manufacturer") or "").strip()
+        if not name:
+            raise ValueError("name is empty")
+
+        # bulk_create skips save(), which sets name_key
+        panel = SolarPanel(
+            name=name,
+            name_key=fold_name(name),
+            manufacturer=self.manufacturer(manufacturer_name),
+            is_default=parse_bool(entry.get("is_default", False)),
+            is_public=True,
+            catalog_id=str(entry.get("catalog_id") or f"{manufacturer_name}/{name}").strip().casefold()[:200],
+        )
+        for field in NUMBER_FIELDS:
+            setattr(panel, field, parse_number(entry[field]))
+        return panel
+
+    def manufacturer(self, name):
+        if not name:
+            return None
+
+        key = name.casefold()
+        if key not in self.manufacturers:
+            self.manufacturers[key] = PanelManufacturer.objects.create(name=name)
+        return self.manufacturers[key]
+
+    def write_batch(self, batch):
+        if not batch:
+            return 0
+
+        with transaction.atomic():
+            SolarPanel.objects.bulk_create(
+                batch.values(), update_conflicts=True, unique_fields=["catalog_id"], update_fields=UPDATE_FIELDS
+            )
+        return len(batch)
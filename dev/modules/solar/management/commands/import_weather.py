@@ -0,0 +1,56 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from modules.solar import weather_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports typical meteorological year files (EnergyPlus .epw or PVGIS TMY .csv) into the binary weather "
+        "store, stations already imported at the same location are replaced"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Weather files or directories searched for .epw and .csv files")
+        parser.add_argument("--directory", help="Weather store directory, settings.SOLAR_WEATHER_DIR by default")
+
+    def handle(self, *args, **options):
+        store = weather_store.WeatherStore(options["directory"]) if options["directory"] else weather_store.get_store()
+
+        files = []
+        for path in map(Path, options["paths"]):
+            if path.is_dir():
+                files += sorted(file for file in path.rglob("*") if file.suffix.lower() in weather_store.READERS)
+            elif path.exists():
+                files.append(path)
+            else:
+                raise CommandError(f"Weather file not found: {path}")
+
+        start = time.perf_counter()
+        imported = 0
+        for file in files:
+            reader = weather_store.READERS.get(file.suffix.lower())
+            if reader is None:
+                self.stderr.write(f"{file}: unsupported format {file.suffix or file.name}")
+                continue
+            try:
+                station, year = reader(file)
+            except (weather_store.WeatherFileError, ValueError, IndexError) as e:
+                # one broken file should not stop a directory import
+                self.stderr.write(f"{file}: {e}")
+                continue
+
+            store.add(station, year)
+            imported += 1
+            self.stdout.write(
+                f"{station.id} {station.name} ({station.latitude:.3f}, {station.longitude:.3f}): "
+                f"{year[0].sum() / 1000:,.0f} kWh/m² global horizontal"
+            )
+
+        if not imported:
+            raise CommandError("No weather files imported")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {imported} of {len(files)} files in {elapsed:.1f} s into {store.directory}")
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from modules.solar import routers, summary
+from modules.solar.models import SolarProject
+
+
+class Command(BaseCommand):
+    help = "Recomputes installed kWp and annual kWh of projects with placed panels, e.g. after the yield model changed"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = 0
+
+        # guest projects are refreshed in the guest store too
+        for alias in routers.guest_aliases():
+            ids = SolarProject.objects.using(alias).filter(installed_kwp__gt=0).values_list("id", flat=True)
+            # one short write per project, the yield is computed outside of any transaction
+            for project_id in list(ids):
+                summary.write_panel_summary(project_id, alias)
+                count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed the energy of {count} projects in {time.monotonic() - started:.2f}s")
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from modules.solar import response_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows hit/miss counters of the project response cache, or of another cache with --cache. "
+        "The counters are read from the shared CACHES backend the server writes them to"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache", choices=response_cache.STATS_KINDS, default=response_cache.RESPONSES)
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing them")
+
+    def handle(self, *args, **options):
+        stats = response_cache.stats(options["cache"])
+        self.stdout.write(
+            f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio'] * 100:.1f}%"
+        )
+
+        if options["reset"]:
+            response_cache.reset_stats(options["cache"])
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
@@ -0,0 +1,28 @@
+from . import routers
+from .guest_user import guest_database, touch_guest_activity
+
+
+class GuestActivityMiddleware:
+    """Keeps last_activity of logged in guests current so cleanup_guests does not remove active guests"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        guest_user_id = request.session.get("guest_user_id")
+        if guest_user_id and request.user.is_authenticated and request.user.id == guest_user_id:
+            touch_guest_activity(guest_user_id)
+
+        return self.get_response(request)
+
+
+class GuestDatabaseMiddleware:
+    """Routes requests of guest sessions to the database their guest lives in, must run before anything reads
+    request.user"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.guest_request(routers.is_guest_store(guest_database(request.session))):
+            return self.get_response(request)
@@ -0,0 +1,84 @@
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_polygons_to_table(apps, schema_editor):
+    SolarProject = apps.get_model('solar', 'SolarProject')
+    RoofPolygon = apps.get_model('solar', 'RoofPolygon')
+
+    for project in SolarProject.objects.all().iterator():
+        data = project.data or {}
+        polygons = data.pop('polygons', None)
+        if polygons is None:
+            continue
+
+        rows = {}
+        for polygon in polygons:
+            polygon_id = polygon.get('id') or f"p-{uuid.uuid4()}"
+            if polygon_id in rows:
+                # duplicated ids were unreachable before, keep the first one like the old lookups did
+                continue
+
+            rows[polygon_id] = RoofPolygon(
+                project=project,
+                polygon_id=polygon_id,
+                coordinates=polygon.get('coordinates') or [],
+                tilt_angle=polygon.get('tilt_angle') or 0,
+                bottom_edge_index=polygon.get('bottom_edge_index'),
+                height_data=polygon.get('height_data'),
+                edges=polygon.get('edges') or [],
+            )
+
+        RoofPolygon.objects.bulk_create(rows.values())
+        project.data = data
+        project.save(update_fields=['data'])
+
+
+def move_polygons_to_json(apps, schema_editor):
+    SolarProject = apps.get_model('solar', 'SolarProject')
+    RoofPolygon = apps.get_model('solar', 'RoofPolygon')
+
+    for project in SolarProject.objects.all().iterator():
+        project.data = project.data or {}
+        project.data['polygons'] = [
+            {
+                'id': polygon.polygon_id,
+                'coordinates': polygon.coordinates,
+                'tilt_angle': polygon.tilt_angle,
+                'bottom_edge_index': polygon.bottom_edge_index,
+                'height_data': polygon.height_data,
+                'edges': polygon.edges,
+            }
+            for polygon in RoofPolygon.objects.filter(project=project).order_by('id')
+        ]
+        project.save(update_fields=['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0012_panelmanufacturer_solarpanel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoofPolygon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polygon_id', models.CharField(max_length=64)),
+                ('coordinates', models.JSONField(default=list)),
+                ('tilt_angle', models.FloatField(default=0)),
+                ('bottom_edge_index', models.IntegerField(blank=True, null=True)),
+                ('height_data', models.JSONField(blank=True, null=True)),
+                ('edges', models.JSONField(default=list)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='polygons', to='solar.solarproject')),
+            ],
+            options={
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('project', 'polygon_id'), name='unique_polygon_per_project')],
+            },
+        ),
+        migrations.RunPython(move_polygons_to_table, move_polygons_to_json),
+    ]
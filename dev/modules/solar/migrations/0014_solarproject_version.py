@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0013_roofpolygon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solarproject',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Bumped on every change, used for ETags'),
+        ),
+    ]
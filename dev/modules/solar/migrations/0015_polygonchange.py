@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0014_solarproject_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolygonChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polygon_id', models.CharField(max_length=64)),
+                ('version', models.PositiveIntegerField(help_text='Project version of the last change')),
+                ('created_version', models.PositiveIntegerField(default=0, help_text='Project version the polygon was added in')),
+                ('deleted', models.BooleanField(default=False)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='polygon_changes', to='solar.solarproject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'version'], name='solar_polyg_project_f47052_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'polygon_id'), name='unique_change_per_polygon')],
+            },
+        ),
+    ]
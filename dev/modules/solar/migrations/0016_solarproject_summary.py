@@ -0,0 +1,64 @@
+import math
+
+from django.db import migrations, models
+
+
+def valid_point(coord):
+    # frozen copy of the vertex check of geometry.valid_coordinates, rows saved before validation may hold anything
+    return (
+        isinstance(coord, list)
+        and len(coord) >= 2
+        and all(isinstance(value, int | float) and not isinstance(value, bool) for value in coord[:2])
+        and all(math.isfinite(value) for value in coord[:2])
+    )
+
+
+def compute_summaries(apps, schema_editor):
+    SolarProject = apps.get_model('solar', 'SolarProject')
+    RoofPolygon = apps.get_model('solar', 'RoofPolygon')
+
+    for project in SolarProject.objects.all().iterator():
+        latitudes, longitudes = [], []
+        polygon_count = 0
+        for coordinates in RoofPolygon.objects.filter(project=project).values_list('coordinates', flat=True):
+            polygon_count += 1
+            if not isinstance(coordinates, list):
+                continue
+            for coord in filter(valid_point, coordinates):
+                latitudes.append(coord[0])
+                longitudes.append(coord[1])
+
+        project.polygon_count = polygon_count
+        project.center_latitude = sum(latitudes) / len(latitudes) if latitudes else None
+        project.center_longitude = sum(longitudes) / len(longitudes) if longitudes else None
+        project.save(update_fields=['polygon_count', 'center_latitude', 'center_longitude'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0015_polygonchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solarproject',
+            name='polygon_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='solarproject',
+            name='center_latitude',
+            field=models.FloatField(blank=True, help_text='Average latitude of all polygon vertices', null=True),
+        ),
+        migrations.AddField(
+            model_name='solarproject',
+            name='center_longitude',
+            field=models.FloatField(blank=True, help_text='Average longitude of all polygon vertices', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='solarproject',
+            index=models.Index(fields=['user', 'created_at'], name='solar_solar_user_id_344111_idx'),
+        ),
+        migrations.RunPython(compute_summaries, migrations.RunPython.noop),
+    ]
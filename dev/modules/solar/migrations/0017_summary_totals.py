@@ -0,0 +1,64 @@
+from django.db import migrations, models
+
+from modules.solar.geometry import roof_area
+
+
+def compute_areas(apps, schema_editor):
+    SolarProject = apps.get_model('solar', 'SolarProject')
+    RoofPolygon = apps.get_model('solar', 'RoofPolygon')
+
+    for project in SolarProject.objects.all().iterator():
+        polygons = list(RoofPolygon.objects.filter(project=project))
+        for polygon in polygons:
+            polygon.area = roof_area(polygon.coordinates or [], polygon.tilt_angle)
+        RoofPolygon.objects.bulk_update(polygons, ['area'])
+
+        project.roof_area = sum(polygon.area for polygon in polygons)
+        project.save(update_fields=['roof_area'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0016_solarproject_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roofpolygon',
+            name='area',
+            field=models.FloatField(default=0, help_text='Roof surface in m², derived from coordinates and tilt_angle'),
+        ),
+        migrations.AddField(
+            model_name='solarproject',
+            name='roof_area',
+            field=models.FloatField(default=0, help_text='Total roof surface in m²'),
+        ),
+        migrations.AddField(
+            model_name='solarproject',
+            name='installed_kwp',
+            field=models.FloatField(default=0, help_text='Peak power of the placed panels'),
+        ),
+        migrations.AddField(
+            model_name='solarproject',
+            name='annual_kwh',
+            field=models.FloatField(default=0, help_text='Estimated yearly production of the placed panels'),
+        ),
+        migrations.AddIndex(
+            model_name='solarproject',
+            index=models.Index(fields=['user', 'polygon_count'], name='solar_project_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarproject',
+            index=models.Index(fields=['user', 'roof_area'], name='solar_project_user_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarproject',
+            index=models.Index(fields=['user', 'installed_kwp'], name='solar_project_user_kwp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarproject',
+            index=models.Index(fields=['user', 'annual_kwh'], name='solar_project_user_kwh_idx'),
+        ),
+        migrations.RunPython(compute_areas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0017_summary_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solarpanel',
+            name='catalog_id',
+            field=models.CharField(
+                blank=True, help_text='Datasheet key of imported catalog panels', max_length=200, null=True,
+                unique=True
+            ),
+        ),
+    ]
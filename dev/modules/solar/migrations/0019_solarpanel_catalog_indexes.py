@@ -0,0 +1,44 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0018_solarpanel_catalog_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(
+                condition=models.Q(is_public=True), fields=['name', 'id'], name='solar_panel_public_name_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(
+                condition=models.Q(is_public=True), fields=['wattage', 'name'], name='solar_panel_public_watt_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(
+                condition=models.Q(is_public=True), fields=['efficiency', 'name'], name='solar_panel_public_eff_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(
+                condition=models.Q(is_public=True), fields=['cost', 'name'], name='solar_panel_public_cost_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(fields=['manufacturer', 'name'], name='solar_panel_maker_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='solar_panel_name_lower_idx'),
+        ),
+    ]
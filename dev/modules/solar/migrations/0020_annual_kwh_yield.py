@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the stored values keep the old estimate until `manage.py refresh_project_energy` recomputes them, the yield
+    # model is app code that a migration cannot freeze
+
+    dependencies = [
+        ('solar', '0019_solarpanel_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='solarproject',
+            name='annual_kwh',
+            field=models.FloatField(
+                default=0, help_text='Yearly production of the placed panels, same model as the project yield endpoint'
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fill_name_keys(apps, schema_editor):
+    SolarPanel = apps.get_model('solar', 'SolarPanel')
+
+    panels = list(SolarPanel.objects.only('id', 'name'))
+    for panel in panels:
+        # frozen copy of models.fold_name
+        panel.name_key = unicodedata.normalize('NFKC', panel.name).casefold()
+    SolarPanel.objects.bulk_update(panels, ['name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solar', '0020_annual_kwh_yield'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solarpanel',
+            name='name_key',
+            field=models.CharField(default='', editable=False, help_text='fold_name(name), set on save', max_length=300),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='solarpanel',
+            name='solar_panel_name_lower_idx',
+        ),
+        migrations.AddIndex(
+            model_name='solarpanel',
+            index=models.Index(fields=['name_key'], name='solar_panel_name_key_idx'),
+        ),
+    ]
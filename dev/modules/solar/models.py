@@ -1,22 +1,124 @@
+import unicodedata
+import uuid
+
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import catalog_cache, response_cache
+from .geometry import roof_area
+
 
 class SolarProject(models.Model):
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name="solar_projects")
     data = models.JSONField(default=dict)
+    version = models.PositiveIntegerField(default=1, help_text="Bumped on every change, used for ETags")
+
+    # summary of the polygons kept up to date on writes, so listings never load polygons or the data blob
+    polygon_count = models.PositiveIntegerField(default=0)
+    center_latitude = models.FloatField(null=True, blank=True, help_text="Average latitude of all polygon vertices")
+    center_longitude = models.FloatField(null=True, blank=True, help_text="Average longitude of all polygon vertices")
+    roof_area = models.FloatField(default=0, help_text="Total roof surface in m²")
+    installed_kwp = models.FloatField(default=0, help_text="Peak power of the placed panels")
+    annual_kwh = models.FloatField(
+        default=0, help_text="Yearly production of the placed panels, same model as the project yield endpoint"
+    )
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=["name", "user"], name="unique_name_per_user")]
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["user", "polygon_count"], name="solar_project_user_count_idx"),
+            models.Index(fields=["user", "roof_area"], name="solar_project_user_area_idx"),
+            models.Index(fields=["user", "installed_kwp"], name="solar_project_user_kwp_idx"),
+            models.Index(fields=["user", "annual_kwh"], name="solar_project_user_kwh_idx"),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else "Anonymous"
         return f"{self.name} ({username})"
 
+    def replace_polygons(self, polygons):
+        """Replace all polygon rows of this project with the given API representations, returns the new ids"""
+        rows = {}
+        for polygon_data in polygons:
+            row = RoofPolygon.from_dict(self, polygon_data)
+            rows.setdefault(row.polygon_id, row)
+
+        with transaction.atomic(using=self._state.db):
+            self.polygons.all().delete()
+            RoofPolygon.objects.using(self._state.db).bulk_create(rows.values())
+
+        return list(rows)
+
+
+class RoofPolygon(models.Model):
+    """Single roof polygon of a project, stored as its own row so edits touch only that polygon"""
+
+    project = models.ForeignKey(SolarProject, on_delete=models.CASCADE, related_name="polygons")
+    polygon_id = models.CharField(max_length=64)
+    coordinates = models.JSONField(default=list)
+    tilt_angle = models.FloatField(default=0)
+    bottom_edge_index = models.IntegerField(null=True, blank=True)
+    height_data = models.JSONField(null=True, blank=True)
+    edges = models.JSONField(default=list)
+    area = models.FloatField(default=0, help_text="Roof surface in m², derived from coordinates and tilt_angle")
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [models.UniqueConstraint(fields=["project", "polygon_id"], name="unique_polygon_per_project")]
+
+    def __str__(self):
+        return f"{self.polygon_id} ({self.project_id})"
+
+    @classmethod
+    def from_dict(cls, project, data):
+        """Build an unsaved polygon row from the API/JSON representation"""
+        coordinates = data.get("coordinates") or []
+        tilt_angle = data.get("tilt_angle") or 0
+        return cls(
+            project=project,
+            polygon_id=data.get("id") or f"p-{uuid.uuid4()}",
+            coordinates=coordinates,
+            tilt_angle=tilt_angle,
+            area=roof_area(coordinates, tilt_angle),
+            bottom_edge_index=data.get("bottom_edge_index"),
+            height_data=data.get("height_data"),
+            edges=data.get("edges") or [],
+        )
+
+    def to_dict(self):
+        """API representation, same shape as the old entries of SolarProject.data["polygons"]"""
+        return {
+            "id": self.polygon_id,
+            "coordinates": self.coordinates,
+            "tilt_angle": self.tilt_angle,
+            "bottom_edge_index": self.bottom_edge_index,
+            "height_data": self.height_data,
+            "edges": self.edges,
+        }
+
+
+class PolygonChange(models.Model):
+    """Last change of a polygon, one row per polygon so the log stays compact"""
+
+    project = models.ForeignKey(SolarProject, on_delete=models.CASCADE, related_name="polygon_changes")
+    polygon_id = models.CharField(max_length=64)
+    version = models.PositiveIntegerField(help_text="Project version of the last change")
+    created_version = models.PositiveIntegerField(default=0, help_text="Project version the polygon was added in")
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["project", "polygon_id"], name="unique_change_per_polygon")]
+        indexes = [models.Index(fields=["project", "version"])]
+
+    def __str__(self):
+        return f"{self.polygon_id} @ {self.version}"
+
 
 # profile model to extend django default user
 class UserProfile(models.Model):
@@ -38,6 +140,11 @@ class PanelManufacturer(models.Model):
         return self.name
 
 
+def fold_name(name):
+    """Case insensitive form of a panel name for prefix searches, SQLite lower() only folds ASCII"""
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
 class SolarPanel(models.Model):
     name = models.CharField(max_length=100)
     manufacturer = models.ForeignKey(
@@ -57,20 +164,60 @@ class SolarPanel(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="solar_panels")
     is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    catalog_id = models.CharField(
+        max_length=200, null=True, blank=True, unique=True, help_text="Datasheet key of imported catalog panels"
+    )
+    # casefolding may lengthen a name, e.g. "ß" becomes "ss"
+    name_key = models.CharField(max_length=300, default="", editable=False, help_text="fold_name(name), set on save")
+
+    class Meta:
+        # catalog filters and cursor pagination, see filters.PanelFilter. SQLite filters booleans as
+        # "WHERE is_public" instead of "is_public = 1", the public catalog gets partial indexes, not (is_public, x)
+        indexes = [
+            models.Index(fields=["name", "id"], condition=Q(is_public=True), name="solar_panel_public_name_idx"),
+            models.Index(fields=["wattage", "name"], condition=Q(is_public=True), name="solar_panel_public_watt_idx"),
+            models.Index(fields=["efficiency", "name"], condition=Q(is_public=True), name="solar_panel_public_eff_idx"),
+            models.Index(fields=["cost", "name"], condition=Q(is_public=True), name="solar_panel_public_cost_idx"),
+            models.Index(fields=["manufacturer", "name"], name="solar_panel_maker_name_idx"),
+            models.Index(fields=["name_key"], name="solar_panel_name_key_idx"),
+        ]
 
     def __str__(self):
         if self.manufacturer:
             return f"{self.manufacturer.name} - {self.name} ({self.wattage}W)"
         return f"{self.name} ({self.wattage}W)"
 
+    def save(self, *args, **kwargs):
+        self.name_key = fold_name(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        super().save(*args, **kwargs)
+
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, using, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
+        # same database as the user, guests may live in a separate guest store
+        UserProfile.objects.using(using).create(user=instance)
 
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, "profile"):
         instance.profile.save()
+
+
+@receiver(post_save, sender=SolarProject)
+@receiver(post_delete, sender=SolarProject)
+def invalidate_project_responses(sender, instance, **kwargs):
+    # covers saves that do not bump the version, e.g. from the admin
+    response_cache.invalidate(instance.id, instance.version)
+
+
+@receiver(post_save, sender=SolarPanel)
+@receiver(post_delete, sender=SolarPanel)
+@receiver(post_save, sender=PanelManufacturer)
+@receiver(post_delete, sender=PanelManufacturer)
+def invalidate_catalog(sender, **kwargs):
+    catalog_cache.invalidate()
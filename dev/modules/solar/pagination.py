@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """Cursor pagination that only kicks in when the client sends page_size, plain lists keep working"""
+
+    page_size = None
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class ProjectCursorPagination(OptionalCursorPagination):
+    ordering = ("created_at", "id")
+
+
+class PanelCursorPagination(OptionalCursorPagination):
+    # the cursor seeks on name, unlike the plain list default panels do not come first
+    ordering = ("name", "id")
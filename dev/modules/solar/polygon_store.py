@@ -0,0 +1,86 @@
+import json
+
+from django.db import connections, router
+
+from .models import RoofPolygon
+
+# SQLite JSON1 builds the API representation straight from the columns, nothing is decoded in Python
+POLYGON_JSON_SQL = f"""
+    SELECT json_object(
+        'id', polygon_id,
+        'coordinates', json(coordinates),
+        'tilt_angle', tilt_angle,
+        'bottom_edge_index', bottom_edge_index,
+        'height_data', json(height_data),
+        'edges', json(edges)
+    )
+    FROM {RoofPolygon._meta.db_table}
+    WHERE project_id = %s AND polygon_id = %s
+"""
+
+SET_HEIGHT_DATA_SQL = f"""
+    UPDATE {RoofPolygon._meta.db_table}
+    SET height_data = json(%s)
+    WHERE project_id = %s AND polygon_id = %s
+"""
+
+# json_each walks every vertex of every polygon, the average is the same center project.js used to compute
+POLYGON_CENTER_SQL = f"""
+    SELECT avg(json_extract(vertex.value, '$[0]')), avg(json_extract(vertex.value, '$[1]'))
+    FROM {RoofPolygon._meta.db_table} AS polygon, json_each(polygon.coordinates) AS vertex
+    WHERE polygon.project_id = %s
+"""
+
+
+def polygon_connection(write=False):
+    """Connection of the database holding polygons for the current request"""
+    alias = router.db_for_write(RoofPolygon) if write else router.db_for_read(RoofPolygon)
+    return connections[alias]
+
+
+def uses_json1():
+    return polygon_connection().vendor == "sqlite"
+
+
+def get_polygon_json(project_id, polygon_id):
+    """Return one polygon as JSON text, or None if the project has no such polygon"""
+    if uses_json1():
+        with polygon_connection().cursor() as cursor:
+            cursor.execute(POLYGON_JSON_SQL, [project_id, polygon_id])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    polygon = RoofPolygon.objects.filter(project_id=project_id, polygon_id=polygon_id).first()
+    return json.dumps(polygon.to_dict()) if polygon else None
+
+
+def set_height_data(project_id, polygon_id, height_data):
+    """Replace height_data of one polygon in place, returns False if the polygon does not exist"""
+    if uses_json1():
+        with polygon_connection(write=True).cursor() as cursor:
+            cursor.execute(SET_HEIGHT_DATA_SQL, [json.dumps(height_data), project_id, polygon_id])
+            return cursor.rowcount > 0
+
+    updated = RoofPolygon.objects.filter(project_id=project_id, polygon_id=polygon_id).update(height_data=height_data)
+    return updated > 0
+
+
+def polygon_center(project_id):
+    """Average (latitude, longitude) of all polygon vertices of a project, (None, None) without polygons"""
+    if uses_json1():
+        with polygon_connection().cursor() as cursor:
+            cursor.execute(POLYGON_CENTER_SQL, [project_id])
+            return cursor.fetchone()
+
+    vertices = [
+        coord
+        for coordinates in RoofPolygon.objects.filter(project_id=project_id).values_list("coordinates", flat=True)
+        for coord in coordinates or []
+    ]
+    if not vertices:
+        return None, None
+
+    return (
+        sum(coord[0] for coord in vertices) / len(vertices),
+        sum(coord[1] for coord in vertices) / len(vertices),
+    )
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# keys contain the project version, a write moves readers to new keys and invalidate() drops the old ones
+DETAIL = "detail"
+POLYGONS = "polygons"
+KINDS = (DETAIL, POLYGONS)
+
+# every cache counts its own hits and misses, the project responses under RESPONSES
+RESPONSES = "response"
+CATALOG = "catalog"
+ROOF_EFFICIENCY = "roof-efficiency"
+STATS_KINDS = (RESPONSES, CATALOG, ROOF_EFFICIENCY)
+
+
+def counter_keys(kind=RESPONSES):
+    """(hits key, misses key) of the counters of one cache"""
+    return f"solar:{kind}-cache:hits", f"solar:{kind}-cache:misses"
+
+
+HITS_KEY, MISSES_KEY = counter_keys(RESPONSES)
+
+
+def timeout():
+    return getattr(settings, "SOLAR_RESPONSE_CACHE_TIMEOUT", 300)
+
+
+def cache_key(kind, project_id, version):
+    return f"solar:project:{project_id}:v{version}:{kind}"
+
+
+def get_or_build(kind, project_id, version, build):
+    """Cached response body for a project version, build() is only called on a miss"""
+    key = cache_key(kind, project_id, version)
+    body = cache.get(key)
+    if body is not None:
+        count(HITS_KEY)
+        return body
+
+    count(MISSES_KEY)
+    body = build()
+    cache.set(key, body, timeout())
+    return body
+
+
+def invalidate(project_id, *versions):
+    """Drop every cached response of the given project versions"""
+    cache.delete_many([cache_key(kind, project_id, version) for version in versions for kind in KINDS])
+
+
+def count(key):
+    # add() is a no-op when the counter exists, incr() is atomic on memcached/redis
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add and incr
+        cache.set(key, 1, None)
+
+
+def stats(kind=RESPONSES):
+    """Hit and miss counters of one cache, shared by every process using the same cache backend"""
+    hits_key, misses_key = counter_keys(kind)
+    counters = cache.get_many([hits_key, misses_key])
+    hits, misses = counters.get(hits_key, 0), counters.get(misses_key, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0}
+
+
+def reset_stats(kind=RESPONSES):
+    cache.delete_many(counter_keys(kind))
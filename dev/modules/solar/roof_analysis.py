@@ -0,0 +1,172 @@
+import hashlib
+import json
+
+import numpy as np
+from django.core.cache import cache
+
+from . import response_cache, transposition
+from .geometry import EARTH_RADIUS, roof_azimuth, valid_coordinates
+from .sun_table import angle_vectors, vector_angles
+
+# same names and 22.5° sectors as getFacingDirection in js/three/solar_panel/sun_efficiency.js
+FACINGS = [
+    "North", "North-Northeast", "Northeast", "East-Northeast",
+    "East", "East-Southeast", "Southeast", "South-Southeast",
+    "South", "South-Southwest", "Southwest", "West-Southwest",
+    "West", "West-Northwest", "Northwest", "North-Northwest",
+]  # fmt: skip
+FLAT_TILT = 5  # degrees, isFlat of calculateRoofSolarEfficiency
+# bump when the analysis changes, cached results of older versions are ignored
+VERSION = 1
+HITS_KEY, MISSES_KEY = response_cache.counter_keys(response_cache.ROOF_EFFICIENCY)
+
+
+def vertex_heights(polygon):
+    """Heights in meters of every vertex above the building base, from height_data["stableVertexHeights"]"""
+    # keys of createStableVertexKey in js/three/buildings.js
+    heights = (polygon.height_data or {}).get("stableVertexHeights") or {}
+    values = []
+    for index in range(len(polygon.coordinates or [])):
+        try:
+            values.append(float(heights.get(f"p{polygon.polygon_id}_v{index}") or 0))
+        except (TypeError, ValueError):
+            values.append(0.0)
+    return values
+
+
+def padded_vertices(polygons):
+    """(P, V + 1, 3) local (east, north, up) meters of every polygon and a (P, V + 1) mask of its vertices.
+
+    Each polygon is projected onto a plane through its first vertex, which also fills the padding so the padded
+    rows close every ring for the shoelace formula.
+    """
+    size = max(len(polygon.coordinates) for polygon in polygons) + 1
+    lat = np.empty((len(polygons), size))
+    lng = np.empty((len(polygons), size))
+    heights = np.zeros((len(polygons), size))
+    mask = np.zeros((len(polygons), size), dtype=bool)
+    for row, polygon in enumerate(polygons):
+        count = len(polygon.coordinates)
+        coordinates = np.array([vertex[:2] for vertex in polygon.coordinates], dtype=float)
+        lat[row], lng[row] = coordinates[0]
+        lat[row, :count], lng[row, :count] = coordinates.T
+        heights[row, :count] = vertex_heights(polygon)
+        heights[row, count:] = heights[row, 0]
+        mask[row, :count] = True
+
+    lat, lng = np.radians(lat), np.radians(lng)
+    east = (lng - lng[:, :1]) * np.cos(lat[:, :1]) * EARTH_RADIUS
+    north = (lat - lat[:, :1]) * EARTH_RADIUS
+    return np.stack([east, north, heights], axis=-1), mask
+
+
+def fit_normals(points, mask):
+    """(P, 3) upward unit normals of least-squares planes up = a * east + b * north + c, nan when degenerate"""
+    weights = mask[..., None].astype(float)
+    centroids = (points * weights).sum(axis=1, keepdims=True) / weights.sum(axis=1, keepdims=True)
+    centered = (points - centroids) * weights
+    x, y, z = centered[..., 0], centered[..., 1], centered[..., 2]
+    sxx, syy, sxy = (x * x).sum(axis=1), (y * y).sum(axis=1), (x * y).sum(axis=1)
+    sxz, syz = (x * z).sum(axis=1), (y * z).sum(axis=1)
+
+    # 2 x 2 normal equations solved in closed form for every polygon at once
+    determinant = sxx * syy - sxy**2
+    degenerate = determinant <= 1e-9 * (sxx + syy) ** 2
+    determinant = np.where(degenerate, 1, determinant)
+    a = (sxz * syy - syz * sxy) / determinant
+    b = (syz * sxx - sxz * sxy) / determinant
+
+    normals = np.stack([-a, -b, np.ones_like(a)], axis=-1)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    normals[degenerate] = np.nan
+    return normals
+
+
+def footprint_areas(points):
+    """Horizontal areas in m² of the closed padded rings (shoelace formula)"""
+    x, y = points[..., 0], points[..., 1]
+    return np.abs((x[:, :-1] * y[:, 1:] - x[:, 1:] * y[:, :-1]).sum(axis=1)) / 2
+
+
+def analyze_roofs(polygons, table):
+    """Normal, tilt, azimuth, facing, area and efficiency of every polygon with 3 or more valid vertices.
+
+    Normals are fitted to the vertex heights. Polygons without height differences use their stored tilt_angle
+    and the downslope direction of bottom_edge_index instead, facing the equator without one.
+    """
+    polygons = [
+        polygon for polygon in polygons if valid_coordinates(polygon.coordinates) and len(polygon.coordinates) >= 3
+    ]
+    if not polygons:
+        return []
+
+    points, mask = padded_vertices(polygons)
+    normals = fit_normals(points, mask)
+
+    heights = np.where(mask, points[..., 2], np.nan)
+    no_heights = np.nanmax(heights, axis=1) - np.nanmin(heights, axis=1) == 0
+    fallback = no_heights | np.isnan(normals).any(axis=1)
+    if fallback.any():
+        rows = np.flatnonzero(fallback)
+        equator = [180.0 if polygons[row].coordinates[0][0] >= 0 else 0.0 for row in rows]
+        azimuths = [roof_azimuth(polygons[row].coordinates, polygons[row].bottom_edge_index) for row in rows]
+        normals[rows] = angle_vectors(
+            np.array([polygons[row].tilt_angle or 0 for row in rows], dtype=float),
+            np.array([equator[i] if azimuth is None else azimuth for i, azimuth in enumerate(azimuths)]),
+        )
+
+    tilt, azimuth, _ = vector_angles(normals)
+    flat = tilt < FLAT_TILT
+    cos_tilt = np.cos(np.radians(tilt))
+    footprint = footprint_areas(points)
+    # vertical or broken fits report the footprint only, like geometry.roof_area
+    area = np.where(cos_tilt > 0.01, footprint / np.maximum(cos_tilt, 0.01), footprint)
+
+    insolation = transposition.interpolate(table, tilt, azimuth)
+    efficiency = np.maximum(insolation / table.max() * 100, 1)
+    facing = np.rint(azimuth / 22.5).astype(int) % 16
+
+    return [
+        {
+            "polygon_id": polygon.polygon_id,
+            "normal": np.round(normals[row], 6).tolist(),
+            "tilt": round(float(tilt[row]), 2),
+            "azimuth": round(float(azimuth[row]), 2),
+            "facing": FACINGS[facing[row]],
+            "is_flat": bool(flat[row]),
+            "from_heights": not bool(fallback[row]),
+            "area": round(float(area[row]), 2),
+            "insolation": round(float(insolation[row]), 1),
+            "efficiency": round(float(efficiency[row]), 2),
+        }
+        for row, polygon in enumerate(polygons)
+    ]
+
+
+def geometry_hash(polygons, source):
+    """Hash of everything analyze_roofs() reads, equal geometry in any project or version shares results"""
+    digest = hashlib.sha256(f"{VERSION}:{source}".encode())
+    for polygon in polygons:
+        geometry = [
+            polygon.polygon_id,
+            polygon.coordinates,
+            vertex_heights(polygon),
+            polygon.tilt_angle,
+            polygon.bottom_edge_index,
+        ]
+        digest.update(json.dumps(geometry, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+def get_or_analyze(polygons, table, source):
+    """Cached analyze_roofs() result keyed by the geometry hash"""
+    key = f"solar:roof-efficiency:{geometry_hash(polygons, source)}"
+    roofs = cache.get(key)
+    if roofs is not None:
+        response_cache.count(HITS_KEY)
+        return roofs
+
+    response_cache.count(MISSES_KEY)
+    roofs = analyze_roofs(polygons, table)
+    cache.set(key, roofs, response_cache.timeout())
+    return roofs
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# models whose rows belong to a guest, they follow the guest into the guest store
+GUEST_MODELS = {"auth.user", "solar.userprofile", "solar.solarproject", "solar.roofpolygon", "solar.polygonchange"}
+# session key holding the alias of the database the session's guest was created in
+GUEST_DATABASE_KEY = "guest_database"
+
+# guest store ids start here so they never collide with ids of the primary database
+GUEST_ID_OFFSET = 1_000_000_000
+
+# None outside of guest_request() blocks, e.g. in management commands
+_guest_request = ContextVar("solar_guest_request", default=None)
+
+
+def guest_database_alias():
+    """Alias of the guest store, None when guests live in the primary database"""
+    return getattr(settings, "SOLAR_GUEST_DATABASE", None)
+
+
+def guest_aliases():
+    """Every database that may contain guest users, the guest store first"""
+    alias = guest_database_alias()
+    return [alias, DEFAULT_DB_ALIAS] if alias and alias != DEFAULT_DB_ALIAS else [DEFAULT_DB_ALIAS]
+
+
+def is_guest_store(alias):
+    store = guest_database_alias()
+    return bool(store) and store != DEFAULT_DB_ALIAS and alias == store
+
+
+def in_guest_store(instance):
+    return is_guest_store(instance._state.db)
+
+
+@contextmanager
+def guest_request(active):
+    """Route guest models to the guest store while `active`, the previous routing is restored on exit"""
+    token = _guest_request.set(active)
+    try:
+        yield
+    finally:
+        _guest_request.reset(token)
+
+
+def activate_guest_store():
+    """Route the rest of the current guest_request() block to the guest store, used right after creating a guest"""
+    # outside a block the flag would never be reset again
+    if _guest_request.get() is not None:
+        _guest_request.set(True)
+
+
+@contextmanager
+def primary_database():
+    """Route guest models to the primary database, e.g. for registered user lookups in a guest session"""
+    with guest_request(False):
+        yield
+
+
+class GuestRouter:
+    """Sends the rows of guest requests to the guest store (settings.SOLAR_GUEST_DATABASE), sessions pick their
+    database in guest_sessions.SessionStore"""
+
+    def route(self, model, hints):
+        alias = guest_database_alias()
+        if not alias:
+            return None
+
+        if model._meta.label_lower not in GUEST_MODELS:
+            return DEFAULT_DB_ALIAS
+
+        # related objects stay in the database of the object they were reached from
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        return alias if _guest_request.get() else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the guest store gets every table but skips data migrations (RunPython/RunSQL), it holds nothing worth
+        # migrating and their code reads through the router instead of the database being migrated
+        if db == guest_database_alias() and db != DEFAULT_DB_ALIAS and model_name is None:
+            return False
+        return None
+
+
+def offset_guest_ids(using, apps=global_apps, **kwargs):
+    """post_migrate: start AUTOINCREMENT ids of the guest store at GUEST_ID_OFFSET"""
+    # flush sends post_migrate without apps
+    if using != guest_database_alias() or using == DEFAULT_DB_ALIAS or connections[using].vendor != "sqlite":
+        return
+
+    with connections[using].cursor() as cursor:
+        for label in GUEST_MODELS:
+            table = apps.get_model(label)._meta.db_table
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, GUEST_ID_OFFSET])
+            elif row[0] < GUEST_ID_OFFSET:
+                cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [GUEST_ID_OFFSET, table])
@@ -6,7 +6,37 @@ from .models import PanelManufacturer, SolarPanel, SolarProject
 class SolarProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = SolarProject
-        fields = ["id", "name", "created_at", "data"]
+        fields = ["id", "name", "created_at", "data", "version"]
+        read_only_fields = ["version"]
+
+    def to_representation(self, instance):
+        # polygons live in RoofPolygon rows, expose them inside data like before
+        representation = super().to_representation(instance)
+        representation["data"] = {
+            **(representation.get("data") or {}),
+            "polygons": [polygon.to_dict() for polygon in instance.polygons.all()],
+        }
+        return representation
+
+
+class SolarProjectListSerializer(serializers.ModelSerializer):
+    """Lightweight project listing, only summary columns, never the data blob or polygons"""
+
+    class Meta:
+        model = SolarProject
+        fields = [
+            "id",
+            "name",
+            "created_at",
+            "version",
+            "polygon_count",
+            "center_latitude",
+            "center_longitude",
+            "roof_area",
+            "installed_kwp",
+            "annual_kwh",
+        ]
+        read_only_fields = fields
 
 
 class PolygonSerializer(serializers.Serializer):
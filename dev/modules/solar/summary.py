@@ -0,0 +1,89 @@
+import math
+from functools import partial
+
+from django.db import router, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import polygon_store, weather_store
+from .energy_yield import DEFAULT_PANEL_SIZE, PanelSpec, annual_yield, polygon_roof, split_panels
+from .models import RoofPolygon, SolarProject
+
+
+def refresh_polygon_summary(project_id):
+    """Recompute the polygon count, roof area, center and energy columns, call it after polygons are added or removed"""
+    totals = RoofPolygon.objects.filter(project_id=project_id).aggregate(count=Count("id"), area=Sum("area"))
+    center_latitude, center_longitude = polygon_store.polygon_center(project_id)
+    SolarProject.objects.filter(id=project_id).update(
+        polygon_count=totals["count"],
+        roof_area=totals["area"] or 0,
+        center_latitude=center_latitude,
+        center_longitude=center_longitude,
+    )
+    refresh_panel_summary(project_id)
+
+
+def panel_totals(panels):
+    """(count, wattage) of the panel placement the frontend stores in data["panels"], (0, 0.0) when unusable"""
+    if not isinstance(panels, dict):
+        return 0, 0.0
+
+    try:
+        count, wattage = float(panels.get("count") or 0), float(panels.get("wattage") or 0)
+    except (TypeError, ValueError):
+        return 0, 0.0
+    if not (math.isfinite(count) and math.isfinite(wattage)) or count < 1 or wattage <= 0:
+        return 0, 0.0
+    return int(count), wattage
+
+
+def placement_energy(panels, polygons, latitude, longitude, year=None):
+    """(installed kWp, annual kWh) of the saved placement, the answer of ProjectYieldView to an empty request.
+
+    The saved panels are spread over the polygons by area with the saved wattage, under the typical year of the
+    nearest weather station or a clear sky. Without polygons to locate the project the energy is 0.
+    """
+    count, wattage = panel_totals(panels)
+    installed_kwp = count * wattage / 1000
+    if not count or latitude is None or longitude is None:
+        return installed_kwp, 0.0
+
+    roofs = [polygon_roof(polygon, latitude) for polygon in polygons]
+    counts = split_panels(count, [roof.area for roof in roofs])
+    roofs = [roof._replace(panel_count=panel_count) for roof, panel_count in zip(roofs, counts, strict=True)]
+
+    store = weather_store.get_store()
+    station, _ = store.nearest(latitude, longitude)
+    panel = PanelSpec(wattage, *DEFAULT_PANEL_SIZE)
+    result = annual_yield(
+        roofs, panel, latitude, longitude, year or timezone.now().year, store.weather(station) if station else None
+    )
+    return installed_kwp, float(result.annual.sum())
+
+
+def refresh_panel_summary(project_id):
+    """Recompute installed_kwp and annual_kwh, call it after data["panels"] or the polygons changed.
+
+    The yield takes tens of milliseconds, it runs once the current transaction committed instead of holding the
+    write lock, right away outside of transactions.
+    """
+    using = router.db_for_write(SolarProject)
+    transaction.on_commit(partial(write_panel_summary, project_id, using), using=using)
+
+
+def write_panel_summary(project_id, using):
+    """Compute and store installed_kwp and annual_kwh of a project in database `using`"""
+    projects = SolarProject.objects.using(using).filter(id=project_id)
+    row = projects.values_list("data", "center_latitude", "center_longitude").first()
+    if row is None:
+        # deleted before the transaction committed
+        return
+
+    data, latitude, longitude = row
+    polygons = (
+        RoofPolygon.objects.using(using)
+        .filter(project_id=project_id)
+        .only("coordinates", "tilt_angle", "bottom_edge_index", "area")
+    )
+    installed_kwp, annual_kwh = placement_energy((data or {}).get("panels"), polygons, latitude, longitude)
+    projects.update(installed_kwp=installed_kwp, annual_kwh=annual_kwh)
@@ -0,0 +1,223 @@
+import math
+from collections import namedtuple
+from datetime import UTC
+
+import numpy as np
+
+# angles in degrees, azimuth clockwise from north in [0, 360], equation_of_time in minutes
+SunPosition = namedtuple(
+    "SunPosition", ["declination", "equation_of_time", "hour_angle", "zenith", "azimuth", "elevation"]
+)
+
+MINUTE = np.timedelta64(1, "m")
+
+
+def hourly_times(year, offset_minutes=30):
+    """UTC timestamps of every hour of a year, offset into the hour (30 = middle of each hour)"""
+    start = np.datetime64(f"{year}-01-01T00:00", "m") + offset_minutes * MINUTE
+    end = np.datetime64(f"{year + 1}-01-01T00:00", "m") + offset_minutes * MINUTE
+    return np.arange(start, end, 60 * MINUTE)
+
+
+def sun_position(times, latitude, longitude):
+    """Sun position for arrays of UTC datetime64 times and locations in one NumPy pass.
+
+    Port of calculateSunPosition in js/three/sun_simulation.js (NOAA general solar position), leap years have 366
+    days and the azimuth is measured from north instead of south. Arguments broadcast against each other, e.g.
+    times of shape (T,) with latitude/longitude of shape (L, 1) give (L, T) arrays.
+    """
+    times = np.asarray(times, dtype="datetime64[s]")
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    longitude = np.asarray(longitude, dtype=float)
+
+    years = times.astype("datetime64[Y]")
+    days_in_year = ((years + 1).astype("datetime64[D]") - years.astype("datetime64[D]")).astype(float)
+    day_of_year = (times.astype("datetime64[D]") - years.astype("datetime64[D]")).astype(float)
+    hour = (times - times.astype("datetime64[D]")).astype(float) / 3600
+
+    # fractional year
+    gamma = 2 * np.pi / days_in_year * (day_of_year + (hour - 12) / 24)
+    equation_of_time = 229.18 * (
+        0.000075
+        + 0.001868 * np.cos(gamma)
+        - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma)
+        - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918
+        - 0.399912 * np.cos(gamma)
+        + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma)
+        + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma)
+        + 0.00148 * np.sin(3 * gamma)
+    )
+
+    # per time terms are computed once and broadcast, only the terms below run once per time and location
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_dec, cos_dec, tan_dec = np.sin(declination), np.cos(declination), np.tan(declination)
+
+    true_solar_time = np.mod(hour * 60 + equation_of_time + 4 * longitude, 1440)
+    hour_angle = true_solar_time * (np.pi / 720) - np.pi
+    sin_ha, cos_ha = np.sin(hour_angle), np.cos(hour_angle)
+
+    cos_zenith = sin_lat * sin_dec + cos_lat * cos_dec * cos_ha
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    # atan2 form has no special cases at the poles or with the sun overhead
+    azimuth = np.degrees(np.arctan2(sin_ha, cos_ha * sin_lat - tan_dec * cos_lat)) + 180
+
+    return SunPosition(
+        declination=np.degrees(declination),
+        equation_of_time=equation_of_time,
+        hour_angle=np.degrees(hour_angle),
+        zenith=zenith,
+        azimuth=azimuth,
+        elevation=90 - zenith,
+    )
+
+
+def precise_sun_position(
+    times, latitude, longitude, height=0.0, pressure=1010.0, temperature=10.0, delta_t=69.0, refract=True
+):
+    """Topocentric sun position with refraction, same arrays and broadcasting as sun_position().
+
+    Solar coordinates of Meeus (Astronomical Algorithms, ch. 25) with nutation, aberration, apparent sidereal time,
+    parallax for an observer `height` meters above sea level and the refraction correction of NREL SPA for
+    `pressure` (hPa) and `temperature` (°C), refract=False gives the airless position. delta_t is TT - UT in
+    seconds. Within about 0.01° of SPA, the fast mode is off by 0.4° on average and by up to a degree near the
+    horizon, where it misses refraction.
+    """
+    times = np.asarray(times, dtype="datetime64[s]")
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    longitude = np.asarray(longitude, dtype=float)
+
+    jd = times.astype("int64") / 86400 + 2440587.5
+    # Julian centuries of terrestrial time for the solar coordinates
+    t = (jd + delta_t / 86400 - 2451545) / 36525
+
+    mean_longitude = 280.46646 + 36000.76983 * t + 0.0003032 * t**2
+    anomaly = np.radians(357.52911 + 35999.05029 * t - 0.0001537 * t**2)
+    eccentricity = 0.016708634 - 0.000042037 * t - 0.0000001267 * t**2
+    center = (
+        (1.914602 - 0.004817 * t - 0.000014 * t**2) * np.sin(anomaly)
+        + (0.019993 - 0.000101 * t) * np.sin(2 * anomaly)
+        + 0.000289 * np.sin(3 * anomaly)
+    )
+    true_longitude = mean_longitude + center
+    distance = 1.000001018 * (1 - eccentricity**2) / (1 + eccentricity * np.cos(anomaly + np.radians(center)))
+
+    # nutation in longitude and obliquity, arcseconds
+    node = np.radians(125.04452 - 1934.136261 * t)
+    sun_mean = np.radians(2 * (280.4665 + 36000.7698 * t))
+    moon_mean = np.radians(2 * (218.3165 + 481267.8813 * t))
+    nutation_longitude = (
+        -17.20 * np.sin(node) - 1.32 * np.sin(sun_mean) - 0.23 * np.sin(moon_mean) + 0.21 * np.sin(2 * node)
+    )
+    nutation_obliquity = (
+        9.20 * np.cos(node) + 0.57 * np.cos(sun_mean) + 0.10 * np.cos(moon_mean) - 0.09 * np.cos(2 * node)
+    )
+    obliquity = np.radians(23.439291111 - 0.0130042 * t - 1.64e-7 * t**2 + 5.04e-7 * t**3 + nutation_obliquity / 3600)
+    apparent_longitude = np.radians(true_longitude + (nutation_longitude - 20.4898 / distance) / 3600)
+
+    right_ascension = np.arctan2(np.cos(obliquity) * np.sin(apparent_longitude), np.cos(apparent_longitude))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude))
+
+    # apparent sidereal time at Greenwich, degrees
+    nutation_ra = nutation_longitude / 3600 * np.cos(obliquity)
+    days = jd - 2451545
+    sidereal = 280.46061837 + 360.98564736629 * days + 0.000387933 * (days / 36525) ** 2 + nutation_ra
+    equation_of_time = 4 * (
+        np.mod(mean_longitude - 0.0057183 - np.degrees(right_ascension) + nutation_ra + 180, 360) - 180
+    )
+
+    # topocentric correction, the observer sits up to one Earth radius off the geocenter
+    reduced_lat = np.arctan(0.99664719 * np.tan(lat))
+    x = np.cos(reduced_lat) + height / 6378140 * np.cos(lat)
+    y = 0.99664719 * np.sin(reduced_lat) + height / 6378140 * np.sin(lat)
+    parallax = np.radians(8.794 / 3600 / distance)
+
+    hour_angle = np.radians(np.mod(sidereal + longitude, 360)) - right_ascension
+    parallax_ra = np.arctan2(
+        -x * np.sin(parallax) * np.sin(hour_angle), np.cos(declination) - x * np.sin(parallax) * np.cos(hour_angle)
+    )
+    topo_declination = np.arctan2(
+        (np.sin(declination) - y * np.sin(parallax)) * np.cos(parallax_ra),
+        np.cos(declination) - x * np.sin(parallax) * np.cos(hour_angle),
+    )
+    topo_hour_angle = hour_angle - parallax_ra
+
+    sin_ha, cos_ha = np.sin(topo_hour_angle), np.cos(topo_hour_angle)
+    true_elevation = np.degrees(
+        np.arcsin(
+            np.clip(np.sin(lat) * np.sin(topo_declination) + np.cos(lat) * np.cos(topo_declination) * cos_ha, -1, 1)
+        )
+    )
+    elevation = true_elevation + refraction(true_elevation, pressure, temperature) if refract else true_elevation
+    azimuth = np.degrees(np.arctan2(sin_ha, cos_ha * np.sin(lat) - np.tan(topo_declination) * np.cos(lat))) + 180
+
+    return SunPosition(
+        declination=np.degrees(topo_declination),
+        equation_of_time=equation_of_time,
+        hour_angle=np.mod(np.degrees(topo_hour_angle) + 180, 360) - 180,
+        zenith=90 - elevation,
+        azimuth=azimuth,
+        elevation=elevation,
+    )
+
+
+def refraction(true_elevation, pressure=1010.0, temperature=10.0):
+    """Atmospheric refraction in degrees (NREL SPA), it lifts the sun until its upper limb has set"""
+    atmosphere = pressure / 1010 * 283 / (273 + temperature)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = atmosphere * 1.02 / (60 * np.tan(np.radians(true_elevation + 10.3 / (true_elevation + 5.11))))
+    return np.where(true_elevation >= -(0.26667 + 0.5667), lift, 0)
+
+
+# accuracy tiers, see benchmark_sun_position for their speed and error
+MODES = {"fast": sun_position, "precise": precise_sun_position}
+
+
+def scalar_sun_position(time, latitude, longitude):
+    """Scalar reference of sun_position() for one aware datetime, used by tests and the benchmark"""
+    time = time.astimezone(UTC)
+    lat = math.radians(latitude)
+    days_in_year = 366 if time.year % 4 == 0 and (time.year % 100 != 0 or time.year % 400 == 0) else 365
+    day_of_year = time.timetuple().tm_yday - 1
+    hour = time.hour + time.minute / 60 + time.second / 3600
+
+    gamma = 2 * math.pi / days_in_year * (day_of_year + (hour - 12) / 24)
+    equation_of_time = 229.18 * (
+        0.000075
+        + 0.001868 * math.cos(gamma)
+        - 0.032077 * math.sin(gamma)
+        - 0.014615 * math.cos(2 * gamma)
+        - 0.040849 * math.sin(2 * gamma)
+    )
+    declination = (
+        0.006918
+        - 0.399912 * math.cos(gamma)
+        + 0.070257 * math.sin(gamma)
+        - 0.006758 * math.cos(2 * gamma)
+        + 0.000907 * math.sin(2 * gamma)
+        - 0.002697 * math.cos(3 * gamma)
+        + 0.00148 * math.sin(3 * gamma)
+    )
+
+    true_solar_time = (hour * 60 + equation_of_time + 4 * longitude) % 1440
+    hour_angle = math.radians(true_solar_time / 4 - 180)
+
+    cos_zenith = math.sin(lat) * math.sin(declination) + math.cos(lat) * math.cos(declination) * math.cos(hour_angle)
+    zenith = math.acos(max(-1, min(1, cos_zenith)))
+    azimuth = math.atan2(
+        math.sin(hour_angle), math.cos(hour_angle) * math.sin(lat) - math.tan(declination) * math.cos(lat)
+    )
+
+    return SunPosition(
+        declination=math.degrees(declination),
+        equation_of_time=equation_of_time,
+        hour_angle=math.degrees(hour_angle),
+        zenith=math.degrees(zenith),
+        azimuth=math.degrees(azimuth) + 180,
+        elevation=90 - math.degrees(zenith),
+    )
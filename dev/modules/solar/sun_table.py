@@ -0,0 +1,171 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .sun_position import MINUTE, MODES, refraction
+
+# modes with atmospheric refraction
+REFRACTED_MODES = {"precise"}
+
+# a table covers a year plus this margin on both sides, so longitude time shifts never leave it
+MARGIN = np.timedelta64(1, "D")
+
+
+def angle_vectors(zenith, azimuth):
+    """Unit vectors (east, north, up) of sun angles in degrees, interpolate these instead of angles that wrap"""
+    zenith, azimuth = np.radians(zenith), np.radians(azimuth)
+    return np.stack([np.sin(zenith) * np.sin(azimuth), np.sin(zenith) * np.cos(azimuth), np.cos(zenith)], axis=-1)
+
+
+def vector_angles(vectors):
+    """(zenith, azimuth, elevation) in degrees of (east, north, up) vectors"""
+    east, north, up = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    elevation = np.degrees(np.arctan2(up, np.hypot(east, north)))
+    azimuth = np.mod(np.degrees(np.arctan2(east, north)), 360)
+    return 90 - elevation, azimuth, elevation
+
+
+class SunTableCache:
+    """Sun vectors precomputed per (latitude band, longitude, year, step, mode) and stored as .npy files.
+
+    Lookups interpolate linearly in time and between the two nearest latitude bands, the distance to the table
+    longitude is a time shift of 4 minutes per degree. Open tables are memory mapped and kept in an LRU, files
+    are evicted least recently used first once the directory grows over max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes, lat_step=0.5, lng_step=1.0, step_minutes=10, max_open=64):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.lat_step = lat_step
+        self.lng_step = lng_step
+        self.step = step_minutes * MINUTE
+        self.max_open = max_open
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+        self.generated = 0
+
+    def path(self, lat_index, lng_index, year, mode):
+        step = int(self.step / MINUTE)
+        latitude, longitude = lat_index * self.lat_step, lng_index * self.lng_step
+        return self.directory / f"{mode}_{year}_{step}m_lat{latitude:+.3f}_lng{longitude:+.3f}.npy"
+
+    def start(self, year):
+        return np.datetime64(f"{year}-01-01T00:00", "m") - MARGIN
+
+    def table(self, lat_index, lng_index, year, mode="fast"):
+        """Memory mapped (steps, 3) float32 table, generated on first use"""
+        key = (lat_index, lng_index, year, mode)
+        with self.lock:
+            if key in self.tables:
+                self.tables.move_to_end(key)
+                return self.tables[key]
+
+        path = self.path(lat_index, lng_index, year, mode)
+        if path.exists():
+            # the modification time of a file is its LRU position on disk
+            os.utime(path)
+        else:
+            self.generate(path, lat_index, lng_index, year, mode)
+
+        # a plain array view of the mapping, indexing np.memmap objects is noticeably slower
+        table = np.asarray(np.load(path, mmap_mode="r"))
+        with self.lock:
+            self.tables[key] = table
+            while len(self.tables) > self.max_open:
+                self.tables.popitem(last=False)
+        return table
+
+    def generate(self, path, lat_index, lng_index, year, mode):
+        end = np.datetime64(f"{year + 1}-01-01T00:00", "m") + MARGIN
+        times = np.arange(self.start(year), end + self.step, self.step)
+        latitude = min(lat_index * self.lat_step, 90.0)
+        # refraction jumps at the horizon and would smear when interpolated, lookups add it afterwards
+        options = {"refract": False} if mode in REFRACTED_MODES else {}
+        position = MODES[mode](times, latitude, lng_index * self.lng_step, **options)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # written next to the final file and renamed, readers never see a partial table
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+            np.save(file, angle_vectors(position.zenith, position.azimuth).astype(np.float32))
+        os.replace(file.name, path)
+        self.generated += 1
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Delete least recently used tables until the directory fits in max_bytes"""
+        files = sorted(self.directory.glob("*.npy"), key=lambda file: file.stat().st_mtime)
+        total = sum(file.stat().st_size for file in files)
+        for file in files:
+            if total <= self.max_bytes:
+                break
+            if file == keep:
+                continue
+            total -= file.stat().st_size
+            file.unlink(missing_ok=True)
+            with self.lock:
+                for key in [key for key in self.tables if self.path(*key) == file]:
+                    del self.tables[key]
+
+    def disk_usage(self):
+        return sum(file.stat().st_size for file in self.directory.glob("*.npy"))
+
+    def sun_vectors(self, times, latitude, longitude, mode="fast"):
+        """(T, 3) unit sun vectors of one site for UTC datetime64 times"""
+        times = np.asarray(times, dtype="datetime64[s]")
+        latitude = min(max(latitude, -90.0), 90.0)
+        lat_low = int(np.floor(latitude / self.lat_step))
+        lat_weight = latitude / self.lat_step - lat_low
+        lng_index = int(round(longitude / self.lng_step))
+        # the sun passes a meridian d degrees east 4 * d minutes earlier, read the table that much later
+        shifted = times + np.timedelta64(int(round((longitude - lng_index * self.lng_step) * 240)), "s")
+        lng_index = (lng_index + int(180 / self.lng_step)) % int(360 / self.lng_step) - int(180 / self.lng_step)
+
+        vectors = np.empty(times.shape + (3,), dtype=np.float32)
+        years = shifted.astype("datetime64[Y]").astype(int) + 1970
+        for year in range(years.min(), years.max() + 1) if years.size else ():
+            # usually every time falls into one year, skip the mask then
+            selected = slice(None) if years[0] == years[-1] == year else years == year
+            position = ((shifted[selected] - self.start(year)) / self.step).astype(np.float32)
+            low = position.astype(int)
+            weight = (position - low)[:, None]
+
+            result = 0
+            for lat_index, lat_share in ((lat_low, 1 - lat_weight), (lat_low + 1, lat_weight)):
+                if lat_share == 0:
+                    continue
+                table = self.table(lat_index, lng_index, year, mode)
+                before, after = table[low], table[low + 1]
+                result = result + np.float32(lat_share) * (before + weight * (after - before))
+            vectors[selected] = result
+
+        vectors /= np.sqrt(np.einsum("ij,ij->i", vectors, vectors))[:, None]
+        if mode in REFRACTED_MODES:
+            zenith, azimuth, elevation = vector_angles(vectors)
+            vectors = angle_vectors(90 - elevation - refraction(elevation), azimuth)
+        return vectors
+
+    def sun_position(self, times, latitude, longitude, mode="fast"):
+        """(zenith, azimuth, elevation) in degrees of one site, interpolated from the tables"""
+        return vector_angles(self.sun_vectors(times, latitude, longitude, mode))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process wide table cache configured by the SOLAR_SUN_TABLE_* settings"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SunTableCache(
+                settings.SOLAR_SUN_TABLE_DIR,
+                settings.SOLAR_SUN_TABLE_MAX_MB * 1024 * 1024,
+                step_minutes=settings.SOLAR_SUN_TABLE_STEP_MINUTES,
+            )
+        return _cache
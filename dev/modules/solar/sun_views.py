@@ -0,0 +1,368 @@
+import math
+
+import numpy as np
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
+
+from . import roof_analysis, transposition, weather_store
+from .access import ProjectAccessMixin
+from .energy_yield import DEFAULT_PANEL_SIZE, PanelSpec, Roof, annual_yield, polygon_roof, split_panels
+from .models import RoofPolygon, SolarPanel, SolarProject
+from .sun_position import MODES, hourly_times
+from .views import apply_height_updates
+
+MIN_YEAR, MAX_YEAR = 1901, 2099
+MAX_SCORED_ROOFS = 100_000
+CACHE_SECONDS = 7 * 24 * 3600
+
+
+def location_params(params):
+    """(latitude, longitude) from lat/lng query parameters and an error message, one of them is None"""
+    try:
+        latitude, longitude = float(params["lat"]), float(params["lng"])
+    except KeyError:
+        return None, "lat and lng are required"
+    except ValueError:
+        return None, "lat and lng must be numbers"
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, "lat must be within [-90, 90] and lng within [-180, 180]"
+    return (latitude, longitude), None
+
+
+def year_param(params):
+    """Year from the year query parameter (default: current year) and an error message, one of them is None"""
+    try:
+        year = int(params.get("year") or timezone.now().year)
+    except (TypeError, ValueError):
+        return None, "year must be an integer"
+
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return None, f"year must be within [{MIN_YEAR}, {MAX_YEAR}]"
+    return year, None
+
+
+class SunPathView(APIView):
+    """Hourly sun path of a location for one year, GET ?lat=54.68&lng=25.27&year=2025&mode=precise
+
+    mode is one of sun_position.MODES, "fast" by default.
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        location, error = location_params(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+        year, error = year_param(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+
+        mode = request.query_params.get("mode", "fast")
+        if mode not in MODES:
+            return Response({"error": f"mode must be one of {', '.join(MODES)}"}, status=400)
+
+        times = hourly_times(year)
+        position = MODES[mode](times, *location)
+
+        # columns instead of one object per hour, a year is 8760 rows
+        response = Response(
+            {
+                "latitude": location[0],
+                "longitude": location[1],
+                "year": year,
+                "mode": mode,
+                "start": f"{times[0]}:00Z",
+                "step_minutes": 60,
+                "elevation": np.round(position.elevation, 3).tolist(),
+                "azimuth": np.round(position.azimuth, 3).tolist(),
+                "zenith": np.round(position.zenith, 3).tolist(),
+            }
+        )
+        # the same request always gives the same answer
+        patch_cache_control(response, public=True, max_age=CACHE_SECONDS)
+        return response
+
+
+def number(value, name):
+    """Finite float of a request value and an error message, one of them is None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None, f"{name} must be a number"
+    if not math.isfinite(value):
+        return None, f"{name} must be a finite number"
+    return value, None
+
+
+def angle_columns(data):
+    """(tilt, azimuth) arrays from "normals" [[east, north, up], ...] or "tilt" and "azimuth" lists and an error"""
+    try:
+        if data.get("normals") is not None:
+            normals = np.asarray(data["normals"], dtype=float)
+            if normals.ndim != 2 or normals.shape[1] != 3:
+                return None, "normals must be a list of [east, north, up] vectors"
+            if not np.all(np.isfinite(normals)) or not np.all(np.linalg.norm(normals, axis=1)):
+                return None, "normals must be finite non zero vectors"
+            angles = transposition.normal_angles(normals)
+        else:
+            angles = np.asarray(data.get("tilt"), dtype=float), np.asarray(data.get("azimuth"), dtype=float)
+            if angles[0].ndim != 1 or angles[0].shape != angles[1].shape:
+                return None, "normals or tilt and azimuth lists of the same length are required"
+            if not np.all(np.isfinite(angles)) or not np.all((angles[0] >= 0) & (angles[0] <= 90)):
+                return None, "tilt must be within [0, 90] and azimuth a number"
+    except (TypeError, ValueError):
+        return None, "normals, tilt and azimuth must contain numbers only"
+
+    if angles[0].size > MAX_SCORED_ROOFS:
+        return None, f"at most {MAX_SCORED_ROOFS} roofs can be scored at once"
+    return angles, None
+
+
+class RoofScoreView(APIView):
+    """Annual insolation of many roof orientations at a location, one bilinear lookup per roof.
+
+    POST {"lat": 54.68, "lng": 25.27, "normals": [[0, -0.5, 0.87], ...]} with (east, north, up) normals, or
+    "tilt" and "azimuth" lists in degrees with azimuth clockwise from north. Returns kWh/m² per year and the
+    efficiency in percent of the best orientation, see transposition.TranspositionCache for the tables.
+    """
+
+    permission_classes = [AllowAny]
+    # a site without a table costs about a second of CPU
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "roof-scores"
+
+    def post(self, request):
+        location, error = location_params(request.data)
+        if error:
+            return Response({"error": error}, status=400)
+        angles, error = angle_columns(request.data)
+        if error:
+            return Response({"error": error}, status=400)
+
+        table, station = transposition.get_cache().table(*location)
+        insolation = transposition.interpolate(table, *angles)
+        best_tilt, best_azimuth = np.unravel_index(int(np.argmax(table)), table.shape)
+        return Response(
+            {
+                "latitude": location[0],
+                "longitude": location[1],
+                "model": "tmy" if station else "clear_sky",
+                "station": {"id": station.id, "name": station.name} if station else None,
+                "optimal": {
+                    "tilt": int(best_tilt),
+                    "azimuth": int(best_azimuth) % 360,
+                    "insolation": round(float(table.max()), 1),
+                },
+                "tilt": np.round(angles[0], 2).tolist(),
+                "azimuth": np.round(angles[1], 2).tolist(),
+                "insolation": np.round(insolation, 1).tolist(),
+                "efficiency": np.round(insolation / table.max() * 100, 2).tolist(),
+            }
+        )
+
+
+class ProjectYieldView(ProjectAccessMixin, APIView):
+    """Energy per month of a project, POST {"panel": 3, "roofs": [{"polygon_id": "p1", "panel_count": 9}]}
+
+    Every field is optional. roofs defaults to every stored polygon and takes tilt, azimuth and area from the
+    polygon unless a roof sets them. When no roof has a panel_count the panel count saved in data["panels"] is
+    spread over the roofs by area, otherwise roofs without one are filled. panel is a catalog panel id, without
+    it the saved panel wattage is used with a common module size. year defaults to the current year.
+
+    The typical year of the nearest imported weather station (see import_weather) is used when one lies within
+    SOLAR_WEATHER_MAX_KM, a clear sky otherwise.
+    """
+
+    permission_classes = [AllowAny]
+    project_fields = ["id", "data", "center_latitude", "center_longitude"]
+
+    def post(self, request, project_id):
+        try:
+            project = self.get_project(project_id)
+        except SolarProject.DoesNotExist as e:
+            raise Http404 from e
+
+        if project.center_latitude is None or project.center_longitude is None:
+            return Response({"error": "the project has no roof polygons to locate it"}, status=400)
+        latitude, longitude = project.center_latitude, project.center_longitude
+
+        year, error = year_param(request.data)
+        if error:
+            return Response({"error": error}, status=400)
+
+        saved_panels = (project.data or {}).get("panels")
+        saved_panels = saved_panels if isinstance(saved_panels, dict) else {}
+        panel, error = self.panel_spec(request.data.get("panel"), saved_panels)
+        if error:
+            return Response({"error": error}, status=400)
+
+        roofs, ids, error = self.roofs(request.data.get("roofs"), project, latitude)
+        if error:
+            return Response({"error": error}, status=400)
+
+        if roofs and all(roof.panel_count is None for roof in roofs):
+            placed, _ = number(saved_panels.get("count"), "count")
+            # a broken or non positive saved count counts as no saved count
+            if placed is not None and placed >= 1:
+                counts = split_panels(int(placed), [roof.area for roof in roofs])
+                roofs = [roof._replace(panel_count=count) for roof, count in zip(roofs, counts, strict=True)]
+
+        store = weather_store.get_store()
+        station, distance = store.nearest(latitude, longitude)
+        weather = store.weather(station) if station else None
+
+        result = annual_yield(roofs, panel, latitude, longitude, year, weather)
+        monthly = result.monthly.sum(axis=0) if roofs else np.zeros(12)
+        return Response(
+            {
+                "latitude": latitude,
+                "longitude": longitude,
+                "year": year,
+                "model": "tmy" if station else "clear_sky",
+                "station": (
+                    {"id": station.id, "name": station.name, "distance_km": round(distance, 1)} if station else None
+                ),
+                "panel_wattage": panel.wattage,
+                "panel_count": int(result.panel_count.sum()),
+                "installed_kwp": round(float(result.installed_kwp.sum()), 3),
+                "annual_kwh": round(float(result.annual.sum()), 1),
+                "monthly_kwh": np.round(monthly, 1).tolist(),
+                "roofs": [
+                    {
+                        "polygon_id": polygon_id,
+                        "tilt": roof.tilt,
+                        "azimuth": roof.azimuth,
+                        "area": roof.area,
+                        "panel_count": int(count),
+                        "annual_kwh": round(float(annual), 1),
+                        "monthly_kwh": np.round(months, 1).tolist(),
+                    }
+                    for polygon_id, roof, count, annual, months in zip(
+                        ids, roofs, result.panel_count, result.annual, result.monthly, strict=True
+                    )
+                ],
+            }
+        )
+
+    def panel_spec(self, panel_id, saved_panels):
+        """(PanelSpec, error) of the requested catalog panel or of the saved panel wattage"""
+        if panel_id is None:
+            wattage, error = number(saved_panels.get("wattage"), "wattage")
+            if error or wattage <= 0:
+                return None, "panel is required when the project has no saved panel wattage"
+            return PanelSpec(wattage, *DEFAULT_PANEL_SIZE), None
+
+        user = self.request.user
+        visible = Q(is_public=True) | Q(user=user) if user.is_authenticated else Q(is_public=True)
+        try:
+            panel = SolarPanel.objects.only("wattage", "width", "height").get(visible, id=int(panel_id))
+        except (TypeError, ValueError):
+            return None, "panel must be a panel id"
+        except SolarPanel.DoesNotExist:
+            return None, "panel not found"
+        return PanelSpec(panel.wattage, panel.width, panel.height), None
+
+    def roofs(self, items, project, latitude):
+        """([Roof], [polygon_id], error) of the requested roofs, every stored polygon by default"""
+        polygons = {
+            polygon.polygon_id: polygon
+            for polygon in RoofPolygon.objects.filter(project_id=project.id).only(
+                "polygon_id", "coordinates", "tilt_angle", "bottom_edge_index", "area"
+            )
+        }
+        if items is None:
+            items = [{"polygon_id": polygon_id} for polygon_id in polygons]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return None, None, "roofs must be a list of objects"
+
+        # roofs without a known downslope direction face the equator
+        equator = 180.0 if latitude >= 0 else 0.0
+        roofs, ids = [], []
+        for item in items:
+            polygon_id = item.get("polygon_id")
+            roof = Roof(0.0, None, 0.0, None)
+            if polygon_id is not None:
+                polygon = polygons.get(str(polygon_id))
+                if polygon is None:
+                    return None, None, f"polygon {polygon_id} not found"
+                roof = polygon_roof(polygon, latitude)
+
+            values = {"tilt": roof.tilt, "azimuth": roof.azimuth, "area": roof.area}
+            for name in values:
+                if item.get(name) is not None:
+                    values[name], error = number(item[name], name)
+                    if error:
+                        return None, None, error
+            if not 0 <= values["tilt"] <= 90:
+                return None, None, "tilt must be within [0, 90]"
+
+            panel_count = item.get("panel_count")
+            if panel_count is not None and (
+                not isinstance(panel_count, int) or isinstance(panel_count, bool) or panel_count < 0
+            ):
+                return None, None, "panel_count must be a non negative integer"
+
+            azimuth = equator if values["azimuth"] is None else values["azimuth"] % 360
+            roofs.append(Roof(values["tilt"], azimuth, values["area"], panel_count))
+            ids.append(polygon_id)
+        return roofs, ids, None
+
+
+class RoofEfficiencyView(ProjectAccessMixin, APIView):
+    """Plane fit, tilt, azimuth, facing, area and efficiency of every roof polygon of a project in one pass.
+
+    POST {} analyzes every polygon, {"polygon_ids": ["p1", "p2"]} a subset. "heights" maps polygon ids to
+    height fields not saved yet, merged into the stored height_data for this request like update-all-heights.
+    Results are cached by a hash of the polygon geometry, see roof_analysis.
+    """
+
+    permission_classes = [AllowAny]
+    project_fields = ["id", "center_latitude", "center_longitude"]
+
+    def post(self, request, project_id):
+        try:
+            project = self.get_project(project_id)
+        except SolarProject.DoesNotExist as e:
+            raise Http404 from e
+
+        if project.center_latitude is None or project.center_longitude is None:
+            return Response({"error": "the project has no roof polygons to locate it"}, status=400)
+
+        polygons = RoofPolygon.objects.filter(project_id=project.id).only(
+            "polygon_id", "coordinates", "tilt_angle", "bottom_edge_index", "height_data"
+        )
+        polygon_ids = request.data.get("polygon_ids")
+        if polygon_ids is not None:
+            if not isinstance(polygon_ids, list):
+                return Response({"error": "polygon_ids must be a list"}, status=400)
+            polygons = polygons.filter(polygon_id__in=[str(polygon_id) for polygon_id in polygon_ids])
+
+        heights = request.data.get("heights") or {}
+        if not isinstance(heights, dict) or not all(isinstance(value, dict) for value in heights.values()):
+            return Response({"error": "heights must map polygon ids to height data"}, status=400)
+        polygons = list(polygons)
+        # unsaved edits are analyzed without writing them
+        apply_height_updates(polygons, heights)
+
+        cache = transposition.get_cache()
+        store = weather_store.get_store()
+        site = cache.site(project.center_latitude, project.center_longitude)
+        table, station = cache.table(*site, store)
+        # a station imported again is a new source, like the table file name
+        source = f"{site}:{transposition.table_source(station, store)}"
+        roofs = roof_analysis.get_or_analyze(polygons, table, source)
+        return Response(
+            {
+                "latitude": project.center_latitude,
+                "longitude": project.center_longitude,
+                "model": "tmy" if station else "clear_sky",
+                "roofs": roofs,
+            }
+        )
@@ -1,15 +1,55 @@
+import importlib
 import json
-from datetime import UTC
+import math
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import UTC, datetime, timedelta
 from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
+import numpy as np
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.management import call_command
-from django.test import Client, TestCase
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 
-from .models import PanelManufacturer, SolarPanel, SolarProject
+from . import (
+    access,
+    catalog_cache,
+    energy_yield,
+    geometry,
+    polygon_store,
+    response_cache,
+    roof_analysis,
+    routers,
+    summary,
+    sun_position,
+    sun_table,
+    transactions,
+    transposition,
+    weather_store,
+)
+from .models import PanelManufacturer, PolygonChange, RoofPolygon, SolarPanel, SolarProject, UserProfile
 
 
-class APIIntegrationTest(TestCase):
+class IntegrationTestCase(TestCase):
+    """Guest requests store their session in the guest store when SOLAR_GUEST_DB configures one, open every database"""
+
+    databases = "__all__"
+
+
+class APIIntegrationTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         
@@ -157,7 +197,7 @@ class APIIntegrationTest(TestCase):
         data = json.loads(response.content)
         self.assertTrue(data['success'])
 
-class SolarProjectIntegrationTest(TestCase):
+class SolarProjectIntegrationTest(IntegrationTestCase):
     def setUp(self):
         #test user
         self.client = Client()
@@ -207,7 +247,7 @@ class SolarProjectIntegrationTest(TestCase):
             SolarProject.objects.get(id=self.project.id)
 
 
-class PolygonIntegrationTest(TestCase):
+class PolygonIntegrationTest(IntegrationTestCase):
     def setUp(self):
         #test user
         self.client = Client()
@@ -261,8 +301,7 @@ class PolygonIntegrationTest(TestCase):
         self.assertEqual(response.status_code, 201)
         
         # verify polygon created
-        updated_project = SolarProject.objects.get(id=self.project.id)
-        self.assertEqual(len(updated_project.data['polygons']), 1)
+        self.assertEqual(RoofPolygon.objects.filter(project=self.project).count(), 1)
         
         # Get polygon id from response
         polygon_id = json.loads(response.content).get('id')
@@ -290,7 +329,7 @@ class PolygonIntegrationTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
-class AuthIntegrationTest(TestCase):
+class AuthIntegrationTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         
@@ -340,7 +379,7 @@ class AuthIntegrationTest(TestCase):
         self.assertFalse(data['is_authenticated'])
 
 
-class PanelConfigurationIntegrationTest(TestCase):
+class PanelConfigurationIntegrationTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -394,7 +433,7 @@ class PanelConfigurationIntegrationTest(TestCase):
         self.assertEqual(panel.wattage, 400)
         self.assertEqual(panel.manufacturer, self.manufacturer)
 
-class ViewsErrorHandlingTest(TestCase):
+class ViewsErrorHandlingTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -451,15 +490,21 @@ class ViewsErrorHandlingTest(TestCase):
         
         self.assertEqual(response.status_code, 400)
 
-class GuestUserTest(TestCase):
+# guests and their sessions in the primary database, the guest store is covered by GuestStoreTest
+@override_settings(SOLAR_GUEST_DATABASE=None)
+class GuestUserTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         
     def test_guest_user_creation(self):
-        """Test that guest user is created automatically"""
+        """Test that guest user is created on the first write"""
         # Make a request that should create a guest user
-        response = self.client.get('/solar/api/projects/')
-        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            '/solar/api/projects/',
+            data=json.dumps({'name': 'First Guest Project'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
         
         # Get the user from the session
         session = self.client.session
@@ -469,6 +514,37 @@ class GuestUserTest(TestCase):
         self.assertIsNotNone(user_id)
         user = User.objects.get(id=user_id)
         self.assertTrue(user.profile.is_guest)
+        self.assertFalse(user.has_usable_password())
+
+    @override_settings(SOLAR_GUEST_ACTIVITY_INTERVAL=300)
+    def test_guest_activity_writes_are_throttled(self):
+        """Test last_activity is written once per interval however many requests the guest makes"""
+        self.client.post(
+            '/solar/api/projects/',
+            data=json.dumps({'name': 'Guest Project'}),
+            content_type='application/json'
+        )
+        guest_id = self.client.session['guest_user_id']
+        old = timezone.now() - timedelta(days=20)
+
+        cache.clear()
+        UserProfile.objects.filter(user_id=guest_id).update(last_activity=old)
+        self.client.get('/solar/api/projects/')
+        self.assertGreater(UserProfile.objects.get(user_id=guest_id).last_activity, old)
+
+        UserProfile.objects.filter(user_id=guest_id).update(last_activity=old)
+        with self.assertNumQueries(3):  # session, user, project list, no UPDATE
+            self.client.get('/solar/api/projects/')
+        self.assertEqual(UserProfile.objects.get(user_id=guest_id).last_activity, old)
+
+    def test_anonymous_reads_do_not_create_users(self):
+        """Test read-only anonymous requests return empty results without creating a guest"""
+        self.assertEqual(json.loads(self.client.get('/solar/api/projects/').content), [])
+        self.assertEqual(json.loads(self.client.get('/solar/api/roof-polygons/?project_id=1').content), [])
+        self.assertEqual(self.client.get('/solar/api/projects/1/').status_code, 404)
+
+        self.assertFalse(User.objects.exists())
+        self.assertIsNone(self.client.session.get('guest_user_id'))
         
     def test_guest_user_project_creation(self):
         """Test that guest users can create projects"""
@@ -502,7 +578,7 @@ class GuestUserTest(TestCase):
         project = SolarProject.objects.get(name='Guest Project')
         self.assertEqual(project.user.id, user_id)
 
-class ProjectPermissionsTest(TestCase):
+class ProjectPermissionsTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         
@@ -562,7 +638,7 @@ class ProjectPermissionsTest(TestCase):
         self.project.refresh_from_db()
         self.assertEqual(self.project.name, "User1's Project")
 
-class CSRFProtectionTest(TestCase):
+class CSRFProtectionTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client(enforce_csrf_checks=True)
         self.user = User.objects.create_user(
@@ -599,7 +675,7 @@ class CSRFProtectionTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
 
-class PolygonHeightUpdateTest(TestCase):
+class PolygonHeightUpdateTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -616,20 +692,20 @@ class PolygonHeightUpdateTest(TestCase):
                 "latitude": 52.5200,
                 "longitude": 13.4050,
                 "zoom": 15,
-                "polygons": [
-                    {
-                        "id": "p-test-1",
-                        "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
-                        "tilt_angle": 30
-                    },
-                    {
-                        "id": "p-test-2",
-                        "coordinates": [[52.55, 13.405], [52.56, 13.41], [52.57, 13.40]],
-                        "tilt_angle": 30
-                    }
-                ]
             }
         )
+        self.project.replace_polygons([
+            {
+                "id": "p-test-1",
+                "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
+                "tilt_angle": 30
+            },
+            {
+                "id": "p-test-2",
+                "coordinates": [[52.55, 13.405], [52.56, 13.41], [52.57, 13.40]],
+                "tilt_angle": 30
+            }
+        ])
         
     def test_update_all_heights(self):
         """Test the update all heights endpoint"""
@@ -648,7 +724,42 @@ class PolygonHeightUpdateTest(TestCase):
         data = json.loads(response.content)
         self.assertEqual(data.get('status'), 'success')
 
-class ManufacturerAPITest(TestCase):
+    def test_update_all_heights_new_format(self):
+        """Test update all heights with the {"polygons": {...}} payload"""
+        update_data = {
+            "polygons": {
+                "p-test-1": {"baseHeight": 4, "vertexHeights": {"a": 6}},
+                "p-test-2": {"stableVertexHeights": {"p-test-2_0": 8}},
+                "p-missing": {"baseHeight": 1},
+            }
+        }
+
+        response = self.client.patch(
+            f'/solar/api/projects/{self.project.id}/update-all-heights/',
+            data=json.dumps(update_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        heights = dict(RoofPolygon.objects.filter(project=self.project).values_list("polygon_id", "height_data"))
+        self.assertEqual(heights["p-test-1"], {"baseHeight": 4, "vertexHeights": {"a": 6}})
+        self.assertEqual(heights["p-test-2"], {"stableVertexHeights": {"p-test-2_0": 8}})
+
+    def test_update_all_heights_legacy_format(self):
+        """Test update all heights with the old {"height_data": {...}} payload"""
+        update_data = {"height_data": {"p-test-2": {"baseHeight": 2.5}}}
+
+        response = self.client.patch(
+            f'/solar/api/projects/{self.project.id}/update-all-heights/',
+            data=json.dumps(update_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        polygon = RoofPolygon.objects.get(project=self.project, polygon_id="p-test-2")
+        self.assertEqual(polygon.height_data, {"baseHeight": 2.5})
+
+class ManufacturerAPITest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -680,21 +791,13 @@ class ManufacturerAPITest(TestCase):
         self.assertIn("Manufacturer 1", manufacturer_names)
         self.assertIn("Manufacturer 2", manufacturer_names)
 
-class GuestUserAdvancedTest(TestCase):
+class GuestUserAdvancedTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
     
     def test_guest_user_conversion(self):
         """Test converting a guest user to a registered user"""
-        # First make a request to create a guest user
-        self.client.get('/solar/api/projects/')
-        
-        # Get the guest user ID
-        session = self.client.session
-        guest_user_id = session.get('guest_user_id')
-        self.assertIsNotNone(guest_user_id)
-        
-        # Create a project as guest
+        # Create a project as guest, this creates the guest user
         project_data = {
             'name': 'Guest Project To Convert',
             'data': {
@@ -709,6 +812,7 @@ class GuestUserAdvancedTest(TestCase):
             data=json.dumps(project_data),
             content_type='application/json'
         )
+        self.assertIsNotNone(self.client.session.get('guest_user_id'))
         
         # Now register as a new user
         register_data = {
@@ -732,14 +836,15 @@ class GuestUserAdvancedTest(TestCase):
     def test_guest_session_expiry(self):
         """Test guest user session expiry handling"""
         # Create a guest session
-        self.client.get('/solar/api/projects/')
+        project_data = json.dumps({'name': 'Guest Project'})
+        self.client.post('/solar/api/projects/', data=project_data, content_type='application/json')
         
         # Simulate session expiry by creating a new client
         expired_client = Client()
         
         # Should create a new guest user automatically
-        response = expired_client.get('/solar/api/projects/')
-        self.assertEqual(response.status_code, 200)
+        response = expired_client.post('/solar/api/projects/', data=project_data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
         
         # Verify a new guest ID was created
         session1 = self.client.session
@@ -752,7 +857,7 @@ class GuestUserAdvancedTest(TestCase):
         self.assertIsNotNone(guest_id2)
         self.assertNotEqual(guest_id1, guest_id2)
 
-class AuthViewsAdvancedTest(TestCase):
+class AuthViewsAdvancedTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -802,7 +907,7 @@ class AuthViewsAdvancedTest(TestCase):
         data = json.loads(response.content)
         self.assertFalse(data.get('success', True))
 
-class AdvancedViewsTest(TestCase):
+class AdvancedViewsTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -819,15 +924,15 @@ class AdvancedViewsTest(TestCase):
                 "latitude": 52.5200,
                 "longitude": 13.4050,
                 "zoom": 15,
-                "polygons": [
-                    {
-                        "id": "p-test-1",
-                        "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
-                        "tilt_angle": 30
-                    }
-                ]
             }
         )
+        self.project.replace_polygons([
+            {
+                "id": "p-test-1",
+                "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
+                "tilt_angle": 30
+            }
+        ])
     
     def test_polygon_detail_not_found(self):
         """Test accessing a non-existent polygon"""
@@ -899,15 +1004,18 @@ class AdvancedViewsTest(TestCase):
         self.assertEqual(updated_panel.height, 1.7)
 
 
-class ManagementCommandsTest(TestCase):
+# guests and their sessions in the primary database, the guest store is covered by GuestStoreTest
+@override_settings(SOLAR_GUEST_DATABASE=None)
+class ManagementCommandsTest(IntegrationTestCase):
     def setUp(self):
         # Create some guest users with old timestamps
         self.client1 = Client()
         self.client2 = Client()
         
-        # Create guest sessions
-        self.client1.get('/solar/api/projects/')
-        self.client2.get('/solar/api/projects/')
+        # Create guest sessions, guests are created by their first write
+        project_data = json.dumps({'name': 'Guest Project'})
+        self.client1.post('/solar/api/projects/', data=project_data, content_type='application/json')
+        self.client2.post('/solar/api/projects/', data=project_data, content_type='application/json')
         
         # Get guest user IDs
         session1 = self.client1.session
@@ -943,7 +1051,100 @@ class ManagementCommandsTest(TestCase):
         # At least one of the users should exist
         self.assertTrue(user1_exists or user2_exists)
 
-class ProjectCreationEdgeCasesTest(TestCase):
+    def test_cleanup_guests_batches(self):
+        """Test expired and inactive guests are deleted in batches, dry-run deletes nothing"""
+        UserProfile.objects.filter(user_id=self.guest_id1).update(expiry_date=timezone.now() - timedelta(days=1))
+        UserProfile.objects.filter(user_id=self.guest_id2).update(last_activity=timezone.now() - timedelta(days=15))
+        registered = User.objects.create_user(username='registered', password='testpassword')
+
+        out = StringIO()
+        call_command('cleanup_guests', '--dry-run', stdout=out)
+        self.assertIn('Would delete 2 guest users with 2 projects from default', out.getvalue())
+        self.assertEqual(User.objects.count(), 3)
+
+        out = StringIO()
+        call_command('cleanup_guests', '--batch-size', '1', stdout=out)
+        self.assertIn('Batch 2: deleted 1 guest users and 1 projects', out.getvalue())
+        self.assertEqual(list(User.objects.all()), [registered])
+        self.assertFalse(SolarProject.objects.exists())
+
+
+    def test_failed_height_benchmark_rolls_back(self):
+        """Test benchmark_heights leaves nothing behind when a request fails"""
+        users = User.objects.count()
+        failed = Response({"error": "Project was modified by another request"}, status=412)
+        command = 'modules.solar.management.commands.benchmark_heights'
+        with mock.patch(f'{command}.update_all_heights', return_value=failed), \
+                self.assertRaisesMessage(CommandError, 'Request failed for 10 polygons'):
+            call_command('benchmark_heights', '--sizes', '10', stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), users)
+        self.assertFalse(SolarProject.objects.filter(name__startswith='Benchmark').exists())
+
+
+class PanelImportTest(IntegrationTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        PanelManufacturer.objects.create(name="SunMaker")
+
+    def import_file(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content)
+        out, err = StringIO(), StringIO()
+        call_command('import_panels', str(path), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_upserts(self):
+        """Test CSV rows are upserted in batches and manufacturers are matched by name"""
+        header = "manufacturer,name,width,height,thickness,wattage,efficiency,cost\n"
+        rows = "sunmaker,M1,1,1.7,0.04,400,21,150\nOther,M2,1,1.7,0.04,410,21.5,160\nOther,Broken,1,,0.04,1,1,1\n"
+        out, err = self.import_file('panels.csv', header + rows, '--batch-size', '1')
+
+        self.assertIn('Imported 2 panels from 3 rows (1 skipped, 2 manufacturers)', out)
+        self.assertIn('Row 3 skipped', err)
+        self.assertEqual(PanelManufacturer.objects.count(), 2)
+        self.assertEqual(SolarPanel.objects.get(name="M1").manufacturer.name, "SunMaker")
+        self.assertEqual(SolarPanel.objects.get(name="M1").name_key, "m1")
+
+        self.import_file('panels.csv', header + "SunMaker,M1,1,1.7,0.04,420,22,150\n")
+        panel = SolarPanel.objects.get(name="M1")
+        self.assertEqual((panel.wattage, panel.is_public), (420, True))
+        self.assertEqual(SolarPanel.objects.count(), 2)
+
+    def test_json_import(self):
+        """Test JSON arrays and JSON Lines are both read"""
+        entry = {"manufacturer": "SunMaker", "width": 1, "height": 1.7, "thickness": 0.04, "wattage": 400,
+                 "efficiency": 21, "cost": 150}
+        self.import_file('panels.json', json.dumps([{**entry, "name": f"J{i}"} for i in range(3)], indent=2))
+        self.import_file('panels.jsonl', "\n".join(json.dumps({**entry, "name": f"L{i}"}) for i in range(2)))
+
+        self.assertEqual(SolarPanel.objects.filter(is_public=True).count(), 5)
+
+    def test_non_finite_numbers_are_skipped(self):
+        """Test nan and inf datasheet values skip the row"""
+        header = "manufacturer,name,width,height,thickness,wattage,efficiency,cost\n"
+        rows = "SunMaker,Nan,1,1.7,0.04,nan,21,150\nSunMaker,Inf,1,1.7,0.04,400,21,inf\n"
+        rows += "SunMaker,Ok,1,1.7,0.04,400,21,150\n"
+        out, err = self.import_file('panels.csv', header + rows)
+
+        self.assertIn('Imported 1 panels from 3 rows (2 skipped', out)
+        self.assertIn('not a finite number', err)
+        self.assertEqual(list(SolarPanel.objects.values_list('name', flat=True)), ['Ok'])
+
+    def test_import_invalidates_other_processes(self):
+        """Test the new catalog stamp is written to the shared cache, not only to this process"""
+        stamp = catalog_cache.stamp()
+        self.import_file('panels.jsonl', json.dumps({
+            "manufacturer": "SunMaker", "name": "New", "width": 1, "height": 1.7, "thickness": 0.04, "wattage": 400,
+            "efficiency": 21, "cost": 150
+        }))
+        # a fresh cache client reads what another process would
+        self.assertGreater(caches.create_connection('default').get(catalog_cache.STAMP_KEY), stamp)
+
+
+class ProjectCreationEdgeCasesTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -1026,7 +1227,7 @@ class ProjectCreationEdgeCasesTest(TestCase):
         self.assertAlmostEqual(project1.data['latitude'], 48.8566, places=4)
         self.assertAlmostEqual(project2.data['latitude'], 35.6895, places=4)
 
-class ViewsEdgeCasesTest(TestCase):
+class ViewsEdgeCasesTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(
@@ -1098,7 +1299,7 @@ class ViewsEdgeCasesTest(TestCase):
         self.assertIn('longitude', created_project.data)
         self.assertIn('zoom', created_project.data)
 
-class PolygonDeleteTest(TestCase):
+class PolygonDeleteTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
@@ -1112,15 +1313,15 @@ class PolygonDeleteTest(TestCase):
                 "latitude": 52.5200,
                 "longitude": 13.4050,
                 "zoom": 15,
-                "polygons": [
-                    {
-                        "id": "p-test-1",
-                        "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
-                        "tilt_angle": 30
-                    }
-                ]
             }
         )
+        self.project.replace_polygons([
+            {
+                "id": "p-test-1",
+                "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
+                "tilt_angle": 30
+            }
+        ])
         
         self.polygon_id = "p-test-1"
     
@@ -1133,10 +1334,9 @@ class PolygonDeleteTest(TestCase):
         
         self.assertEqual(response.status_code, 204)
         
-        updated_project = SolarProject.objects.get(id=self.project.id)
-        self.assertEqual(len(updated_project.data['polygons']), 0)
+        self.assertFalse(RoofPolygon.objects.filter(project=self.project).exists())
 
-class PanelErrorHandlingTest(TestCase):
+class PanelErrorHandlingTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
@@ -1167,7 +1367,7 @@ class PanelErrorHandlingTest(TestCase):
         response = self.client.get('/solar/api/panels/9999/')
         self.assertEqual(response.status_code, 404)
 
-class CSRFTest(TestCase):
+class CSRFTest(IntegrationTestCase):
     def setUp(self):
         self.client = Client(enforce_csrf_checks=True)
         self.user = User.objects.create_user(username='testuser', password='testpassword')
@@ -1227,4 +1427,1460 @@ class CSRFTest(TestCase):
         response = self.client.get('/solar/api/csrf-refresh/')
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.content)
-        self.assertIn('csrf_token', data)
\ No newline at end of file
+        self.assertIn('csrf_token', data)
+
+class RoofPolygonStorageTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(
+            name="Test Project",
+            user=self.user,
+            data={"latitude": 52.5200, "longitude": 13.4050, "zoom": 15}
+        )
+        self.project.replace_polygons([
+            {
+                "id": "p-test-1",
+                "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]],
+                "tilt_angle": 30
+            }
+        ])
+        summary.refresh_polygon_summary(self.project.id)
+
+    def test_project_list_is_lightweight(self):
+        """Test project list returns summary columns instead of the data blob"""
+        response = self.client.get('/solar/api/projects/')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertNotIn('data', data[0])
+        self.assertEqual(data[0]['polygon_count'], 1)
+        self.assertAlmostEqual(data[0]['center_latitude'], 52.53)
+        self.assertAlmostEqual(data[0]['center_longitude'], (13.405 + 13.41 + 13.40) / 3)
+
+    def test_project_patch_replaces_polygons(self):
+        """Test PATCH with data.polygons replaces the polygon rows"""
+        update_data = {
+            "data": {
+                "zoom": 18,
+                "polygons": [{"id": "p-new", "coordinates": [[1, 1], [1, 2], [2, 2]], "tilt_angle": 10}]
+            }
+        }
+
+        response = self.client.patch(
+            f'/solar/api/projects/{self.project.id}/',
+            data=json.dumps(update_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.data["zoom"], 18)
+        self.assertNotIn("polygons", self.project.data)
+        self.assertEqual(list(self.project.polygons.values_list("polygon_id", flat=True)), ["p-new"])
+
+    def test_malformed_points_are_rejected(self):
+        """Test every write path answers 400 to points that are not [lat, lng] numbers"""
+        def post(url, body):
+            return self.client.post(url, data=json.dumps(body), content_type='application/json')
+
+        for coordinates in ([["a", "b"], [1, 2], [3, 4]], [[1], [2], [3]], [[1, 2], None, [3, 4]]):
+            polygons = [{"id": "bad", "coordinates": coordinates}]
+            responses = [
+                post('/solar/api/roof-polygons/', {"project_id": self.project.id, "coordinates": coordinates}),
+                post('/solar/api/roof-polygons/batch/',
+                     {"project_id": self.project.id, "create": [{"coordinates": coordinates}]}),
+                post('/solar/api/projects/', {"name": f"Bad {coordinates}", "data": {"polygons": polygons}}),
+                self.client.patch(f'/solar/api/projects/{self.project.id}/', content_type='application/json',
+                                  data=json.dumps({"data": {"polygons": polygons}})),
+            ]
+            self.assertEqual([response.status_code for response in responses], [400] * 4, coordinates)
+            self.assertTrue(all('error' in json.loads(response.content) for response in responses))
+
+        self.assertEqual(list(self.project.polygons.values_list("polygon_id", flat=True)), ["p-test-1"])
+        self.assertEqual(SolarProject.objects.filter(user=self.user).count(), 1)
+
+    def test_height_update_touches_single_row(self):
+        """Test height update only changes the targeted polygon row"""
+        response = self.client.patch(
+            f'/solar/api/roof-polygons/p-test-1/update-height/?project_id={self.project.id}',
+            data=json.dumps({"height_data": {"baseHeight": 7}}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        polygon = RoofPolygon.objects.get(project=self.project, polygon_id="p-test-1")
+        self.assertEqual(polygon.height_data, {"baseHeight": 7})
+
+    def test_polygon_json_matches_orm_fallback(self):
+        """Test the JSON1 polygon read returns the same document as the ORM fallback"""
+        RoofPolygon.objects.filter(polygon_id="p-test-1").update(height_data={"baseHeight": 3, "vertexHeights": {}})
+
+        native = json.loads(polygon_store.get_polygon_json(self.project.id, "p-test-1"))
+        with mock.patch.object(polygon_store, "uses_json1", return_value=False):
+            fallback = json.loads(polygon_store.get_polygon_json(self.project.id, "p-test-1"))
+
+        self.assertEqual(native, fallback)
+        self.assertEqual(native["height_data"], {"baseHeight": 3, "vertexHeights": {}})
+        self.assertIsNone(polygon_store.get_polygon_json(self.project.id, "p-missing"))
+
+    def test_polygon_detail_response(self):
+        """Test polygon detail returns the stored polygon"""
+        response = self.client.get(f'/solar/api/roof-polygons/p-test-1/?project_id={self.project.id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = json.loads(response.content)
+        self.assertEqual(data["id"], "p-test-1")
+        self.assertEqual(data["tilt_angle"], 30)
+        self.assertIsNone(data["height_data"])
+
+    def test_migration_moves_polygons_out_of_blob(self):
+        """Test the data migration turns data["polygons"] into rows"""
+        migration = importlib.import_module('modules.solar.migrations.0013_roofpolygon')
+        legacy = SolarProject.objects.create(
+            name="Legacy Project",
+            user=self.user,
+            data={
+                "latitude": 54.68,
+                "polygons": [
+                    {"id": "p-a", "coordinates": [[1, 1], [1, 2], [2, 2]], "tilt_angle": 5},
+                    {"id": "p-a", "coordinates": [[3, 3], [3, 4], [4, 4]]},
+                    {"coordinates": [[5, 5], [5, 6], [6, 6]]},
+                ]
+            }
+        )
+
+        migration.move_polygons_to_table(django_apps, None)
+
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.data, {"latitude": 54.68})
+        polygons = list(legacy.polygons.all())
+        self.assertEqual(len(polygons), 2)
+        self.assertEqual(polygons[0].polygon_id, "p-a")
+        self.assertEqual(polygons[0].tilt_angle, 5)
+        self.assertTrue(polygons[1].polygon_id.startswith("p-"))
+
+
+class ProjectVersioningTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(
+            name="Test Project",
+            user=self.user,
+            data={"latitude": 52.5200, "longitude": 13.4050, "zoom": 15}
+        )
+        self.project.replace_polygons([
+            {"id": "p-test-1", "coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40]]}
+        ])
+
+    def test_conditional_get_returns_304(self):
+        """Test GETs with a matching If-None-Match return 304"""
+        urls = [
+            f'/solar/api/projects/{self.project.id}/',
+            f'/solar/api/roof-polygons/?project_id={self.project.id}',
+            f'/solar/api/roof-polygons/p-test-1/?project_id={self.project.id}',
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_write_changes_etag(self):
+        """Test every write bumps the version so old ETags stop matching"""
+        url = f'/solar/api/roof-polygons/?project_id={self.project.id}'
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.post(
+            '/solar/api/roof-polygons/',
+            data=json.dumps({"project_id": self.project.id, "coordinates": [[1, 1], [1, 2], [2, 2]]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response["ETag"], etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_stale_if_match_is_rejected(self):
+        """Test PATCH/DELETE with an outdated If-Match return 412 and change nothing"""
+        etag = self.client.get(f'/solar/api/projects/{self.project.id}/')["ETag"]
+
+        response = self.client.patch(
+            f'/solar/api/roof-polygons/p-test-1/update-height/?project_id={self.project.id}',
+            data=json.dumps({"height_data": {"baseHeight": 1}}),
+            content_type='application/json',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # second tab still holds the old ETag
+        response = self.client.patch(
+            f'/solar/api/projects/{self.project.id}/update-all-heights/',
+            data=json.dumps({"polygons": {"p-test-1": {"baseHeight": 9}}}),
+            content_type='application/json',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+
+        response = self.client.delete(
+            f'/solar/api/roof-polygons/p-test-1/?project_id={self.project.id}',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+
+        polygon = RoofPolygon.objects.get(project=self.project, polygon_id="p-test-1")
+        self.assertEqual(polygon.height_data, {"baseHeight": 1})
+
+    def test_current_if_match_is_accepted(self):
+        """Test PATCH with the current If-Match succeeds and returns the next ETag"""
+        etag = self.client.get(f'/solar/api/projects/{self.project.id}/')["ETag"]
+
+        response = self.client.patch(
+            f'/solar/api/projects/{self.project.id}/',
+            data=json.dumps({"name": "Renamed"}),
+            content_type='application/json',
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["version"], 2)
+        self.assertEqual(response["ETag"], f'"{self.project.id}-2"')
+
+    def test_not_found_polygon_does_not_bump_version(self):
+        """Test a failed polygon delete leaves the version untouched"""
+        response = self.client.delete(f'/solar/api/roof-polygons/p-missing/?project_id={self.project.id}')
+
+        self.assertEqual(response.status_code, 404)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.version, 1)
+
+
+class ProjectChangesTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(
+            name="Test Project",
+            user=self.user,
+            data={"latitude": 52.5200, "longitude": 13.4050, "zoom": 15}
+        )
+        self.project.replace_polygons([
+            {"id": "p-keep", "coordinates": [[1, 1], [1, 2], [2, 2]]},
+            {"id": "p-edit", "coordinates": [[1, 1], [1, 2], [2, 2]]},
+            {"id": "p-drop", "coordinates": [[1, 1], [1, 2], [2, 2]]},
+        ])
+
+    def changes(self, since):
+        response = self.client.get(f'/solar/api/projects/{self.project.id}/changes/?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def create_polygon(self):
+        response = self.client.post(
+            '/solar/api/roof-polygons/',
+            data=json.dumps({"project_id": self.project.id, "coordinates": [[3, 3], [3, 4], [4, 4]]}),
+            content_type='application/json'
+        )
+        return json.loads(response.content)["id"]
+
+    def test_changes_since_version(self):
+        """Test added, modified and removed polygons are reported since a version"""
+        new_id = self.create_polygon()
+        self.client.patch(
+            f'/solar/api/roof-polygons/p-edit/update-height/?project_id={self.project.id}',
+            data=json.dumps({"height_data": {"baseHeight": 2}}),
+            content_type='application/json'
+        )
+        self.client.delete(f'/solar/api/roof-polygons/p-drop/?project_id={self.project.id}')
+
+        data = self.changes(1)
+        self.assertEqual(data["version"], 4)
+        self.assertFalse(data["reset"])
+        self.assertEqual([p["id"] for p in data["added"]], [new_id])
+        self.assertEqual([p["id"] for p in data["modified"]], ["p-edit"])
+        self.assertEqual(data["modified"][0]["height_data"], {"baseHeight": 2})
+        self.assertEqual(data["removed"], ["p-drop"])
+
+        # only the delete happened after version 3
+        data = self.changes(3)
+        self.assertEqual((data["added"], data["modified"], data["removed"]), ([], [], ["p-drop"]))
+
+    def test_added_then_removed_is_omitted(self):
+        """Test a polygon created and deleted after `since` is not reported"""
+        new_id = self.create_polygon()
+        self.client.delete(f'/solar/api/roof-polygons/{new_id}/?project_id={self.project.id}')
+
+        data = self.changes(1)
+        self.assertEqual((data["added"], data["modified"], data["removed"]), ([], [], []))
+
+    @override_settings(SOLAR_CHANGE_LOG_VERSIONS=2)
+    def test_pruned_log_returns_reset(self):
+        """Test asking for a version older than the log window returns the full list"""
+        for _ in range(3):
+            self.create_polygon()
+
+        self.assertEqual(PolygonChange.objects.filter(project=self.project).count(), 2)
+        data = self.changes(1)
+        self.assertTrue(data["reset"])
+        self.assertEqual(len(data["added"]), 6)
+
+    def test_invalid_since(self):
+        """Test missing or future since values are rejected"""
+        response = self.client.get(f'/solar/api/projects/{self.project.id}/changes/')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(f'/solar/api/projects/{self.project.id}/changes/?since=50')
+        self.assertEqual(response.status_code, 400)
+
+
+class PolygonBatchTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(
+            name="Test Project",
+            user=self.user,
+            data={"latitude": 52.5200, "longitude": 13.4050, "zoom": 15}
+        )
+        self.project.replace_polygons([
+            {"id": "p-old-1", "coordinates": [[1, 1], [1, 2], [2, 2]]},
+            {"id": "p-old-2", "coordinates": [[1, 1], [1, 2], [2, 2]]},
+        ])
+
+    def post_batch(self, payload):
+        return self.client.post(
+            '/solar/api/roof-polygons/batch/',
+            data=json.dumps({"project_id": self.project.id, **payload}),
+            content_type='application/json'
+        )
+
+    def test_batch_create_and_delete(self):
+        """Test polygons are created and deleted in one request and ids come back in order"""
+        create = [
+            {"coordinates": [[52.52, 13.405], [52.53, 13.41], [52.54, 13.40 + i / 100]], "tilt_angle": i}
+            for i in range(5)
+        ]
+
+        response = self.post_batch({"create": create, "delete": ["p-old-1"]})
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(len(data["ids"]), 5)
+        self.assertEqual(data["deleted"], ["p-old-1"])
+
+        stored = list(RoofPolygon.objects.filter(project=self.project).values_list("polygon_id", "tilt_angle"))
+        self.assertEqual(stored, [("p-old-2", 0)] + [(pid, i) for i, pid in enumerate(data["ids"])])
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.version, 2)
+
+    def test_batch_invalid_polygon_changes_nothing(self):
+        """Test one invalid polygon rejects the whole batch"""
+        create = [
+            {"coordinates": [[1, 1], [1, 2], [2, 2]]},
+            {"coordinates": [[1, 1], [1, 2]]},
+        ]
+
+        response = self.post_batch({"create": create, "delete": ["p-old-1"]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", json.loads(response.content)["errors"])
+        self.assertEqual(RoofPolygon.objects.filter(project=self.project).count(), 2)
+
+    def test_batch_unknown_delete_id_rolls_back(self):
+        """Test deleting an unknown polygon rolls back the creates too"""
+        response = self.post_batch({
+            "create": [{"coordinates": [[1, 1], [1, 2], [2, 2]]}],
+            "delete": ["p-old-1", "p-missing"],
+        })
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            sorted(RoofPolygon.objects.filter(project=self.project).values_list("polygon_id", flat=True)),
+            ["p-old-1", "p-old-2"]
+        )
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.version, 1)
+
+
+class ProjectListPaginationTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        for i in range(5):
+            SolarProject.objects.create(name=f"Project {i}", user=self.user, data={"latitude": i})
+
+    def test_cursor_pagination(self):
+        """Test page_size switches the list to cursor pages ordered by creation"""
+        response = self.client.get('/solar/api/projects/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.content)
+        names = [p['name'] for p in page['results']]
+
+        while page['next']:
+            page = json.loads(self.client.get(page['next']).content)
+            names += [p['name'] for p in page['results']]
+
+        self.assertEqual(names, [f"Project {i}" for i in range(5)])
+
+    def test_polygon_writes_update_summary(self):
+        """Test creating and deleting polygons keeps the summary columns current"""
+        project = SolarProject.objects.get(name="Project 0")
+        response = self.client.post(
+            '/solar/api/roof-polygons/',
+            data=json.dumps({"project_id": project.id, "coordinates": [[10, 20], [12, 22], [14, 24]]}),
+            content_type='application/json'
+        )
+        polygon_id = json.loads(response.content)['id']
+
+        project.refresh_from_db()
+        self.assertEqual((project.polygon_count, project.center_latitude, project.center_longitude), (1, 12, 22))
+
+        self.client.delete(f'/solar/api/roof-polygons/{polygon_id}/?project_id={project.id}')
+        project.refresh_from_db()
+        self.assertEqual((project.polygon_count, project.center_latitude, project.center_longitude), (0, None, None))
+
+    def test_project_patch_updates_panel_totals(self):
+        """Test the kWp and annual kWh columns follow the saved panels and agree with the yield endpoint"""
+        project = SolarProject.objects.get(name="Project 1")
+        # the energy is written once the request's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/solar/api/projects/{project.id}/',
+                data=json.dumps({"data": {"panels": {"count": 10, "wattage": 400}}}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        project.refresh_from_db()
+        self.assertAlmostEqual(project.installed_kwp, 4)
+        self.assertEqual(project.annual_kwh, 0)  # no polygons to locate the panels
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/solar/api/roof-polygons/',
+                data=json.dumps({
+                    "project_id": project.id, "tilt_angle": 30, "bottom_edge_index": 0,
+                    "coordinates": [[54.68, 25.27], [54.68, 25.2705], [54.6803, 25.2705], [54.6803, 25.27]]
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        project.refresh_from_db()
+        yield_response = self.client.post(f'/solar/api/projects/{project.id}/yield/', content_type='application/json')
+        self.assertGreater(project.annual_kwh, 0)
+        self.assertAlmostEqual(project.annual_kwh, json.loads(yield_response.content)['annual_kwh'], delta=0.1)
+        self.assertEqual(summary.panel_totals({"count": "nan", "wattage": 400}), (0, 0.0))
+
+    def test_energy_is_computed_after_commit(self):
+        """Test the yield runs outside of the write transaction and the command recomputes stale values"""
+        project = SolarProject.objects.get(name="Project 2")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(
+                f'/solar/api/projects/{project.id}/',
+                data=json.dumps({"data": {"panels": {"count": 5, "wattage": 400}}}),
+                content_type='application/json'
+            )
+        project.refresh_from_db()
+        self.assertEqual(project.installed_kwp, 0)
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        project.refresh_from_db()
+        self.assertAlmostEqual(project.installed_kwp, 2)
+
+        SolarProject.objects.filter(id=project.id).update(installed_kwp=1, annual_kwh=123)
+        out = StringIO()
+        call_command('refresh_project_energy', stdout=out)
+        self.assertIn('Refreshed the energy of 1 projects', out.getvalue())
+        project.refresh_from_db()
+        self.assertEqual((project.installed_kwp, project.annual_kwh), (2, 0))
+
+    def test_ordering_by_summary_column(self):
+        """Test the list can be ordered by materialized summary columns"""
+        for i, project in enumerate(SolarProject.objects.order_by('id')):
+            project.replace_polygons([{"coordinates": [[54.0, 25.0], [54.0, 25.0 + i * 0.001], [54.001, 25.0]]}])
+            summary.refresh_polygon_summary(project.id)
+
+        response = self.client.get('/solar/api/projects/?ordering=-roof_area')
+        names = [p['name'] for p in json.loads(response.content)]
+        self.assertEqual(names, [f"Project {i}" for i in reversed(range(5))])
+
+    def test_summary_migration_skips_malformed_points(self):
+        """Test the summary data migration ignores vertices stored before points were validated"""
+        migration = importlib.import_module('modules.solar.migrations.0016_solarproject_summary')
+        project = SolarProject.objects.get(name="Project 0")
+        RoofPolygon.objects.bulk_create([
+            RoofPolygon(project=project, polygon_id="p-1", coordinates=[[10, 20], ["a", 1], [1], None, [12, 22]]),
+            RoofPolygon(project=project, polygon_id="p-2", coordinates="broken"),
+        ])
+
+        migration.compute_summaries(django_apps, None)
+
+        project.refresh_from_db()
+        self.assertEqual((project.polygon_count, project.center_latitude, project.center_longitude), (2, 11, 21))
+
+
+class RoofAreaTest(IntegrationTestCase):
+    def test_roof_area(self):
+        """Test roof area of a 10 m square, flat and tilted"""
+        # at the equator one degree of latitude and longitude have the same length
+        side = math.degrees(10 / geometry.EARTH_RADIUS)
+        square = [[0, 0], [side, 0], [side, side], [0, side]]
+
+        self.assertAlmostEqual(geometry.roof_area(square), 100, places=3)
+        self.assertAlmostEqual(geometry.roof_area(square, 60), 200, places=3)
+        self.assertEqual(geometry.roof_area(square[:2]), 0)
+
+    def test_malformed_coordinates_have_no_area(self):
+        """Test rows stored before points were validated do not break area and azimuth"""
+        for coordinates in ([["a", "b"], [1, 2], [3, 4]], [[1], [2], [3]], [[1, 2], None, [3, 4]], "x", None):
+            self.assertEqual(geometry.roof_area(coordinates, 30), 0)
+            self.assertIsNone(geometry.roof_azimuth(coordinates, 0))
+
+
+# counts the queries of the primary database, where sessions live without a guest store
+@override_settings(SOLAR_GUEST_DATABASE=None)
+class ResponseCacheTest(IntegrationTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(name="Cached", user=self.user, data={"latitude": 1, "zoom": 15})
+        self.project.replace_polygons([{"id": "p-1", "coordinates": [[1, 1], [1, 2], [2, 1]]}])
+
+    def test_polygon_list_is_cached(self):
+        """Test a repeated polygon list request is served from the cache without loading polygons"""
+        url = f'/solar/api/roof-polygons/?project_id={self.project.id}'
+        first = self.client.get(url)
+
+        with self.assertNumQueries(3):  # session, user, project access check
+            second = self.client.get(url)
+
+        self.assertEqual(json.loads(first.content), json.loads(second.content))
+        self.assertEqual(response_cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_writes_invalidate_cache(self):
+        """Test polygon and project writes are visible right away"""
+        url = f'/solar/api/roof-polygons/?project_id={self.project.id}'
+        self.client.get(url)
+        self.client.get(f'/solar/api/projects/{self.project.id}/')
+
+        self.client.post(
+            '/solar/api/roof-polygons/',
+            data=json.dumps({"project_id": self.project.id, "coordinates": [[3, 3], [3, 4], [4, 3]]}),
+            content_type='application/json'
+        )
+        self.assertEqual(len(json.loads(self.client.get(url).content)), 2)
+
+        self.client.patch(
+            f'/solar/api/projects/{self.project.id}/',
+            data=json.dumps({"name": "Renamed"}),
+            content_type='application/json'
+        )
+        response = self.client.get(f'/solar/api/projects/{self.project.id}/')
+        self.assertEqual(json.loads(response.content)['name'], "Renamed")
+
+    def test_save_without_version_bump_invalidates(self):
+        """Test saves outside the API (admin, shell) drop the cached detail"""
+        self.client.get(f'/solar/api/projects/{self.project.id}/')
+
+        self.project.data["zoom"] = 18
+        self.project.save()
+
+        response = self.client.get(f'/solar/api/projects/{self.project.id}/')
+        self.assertEqual(json.loads(response.content)['zoom'], 18)
+
+    def test_stats_command_sees_server_counters(self):
+        """Test response_cache_stats run as its own process reads the counters of the server process"""
+        url = f'/solar/api/roof-polygons/?project_id={self.project.id}'
+        for _ in range(3):
+            self.client.get(url)
+
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'response_cache_stats'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertIn('hits: 2, misses: 1', result.stdout)
+
+
+# guests and their sessions in the primary database, the guest store is covered by GuestStoreTest
+@override_settings(SOLAR_GUEST_DATABASE=None)
+class ProjectAccessQueryCountTest(IntegrationTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        self.project = SolarProject.objects.create(name="Counted", user=self.user, data={"zoom": 15})
+        self.project.replace_polygons([{"id": "p-1", "coordinates": [[1, 1], [1, 2], [2, 1]]}])
+
+    def test_read_endpoints(self):
+        """Test reads cost session, user and one project query plus the endpoint's own queries"""
+        project_id = self.project.id
+        endpoints = [
+            (f'/solar/api/projects/{project_id}/', 4),  # + name/data on a cache miss
+            (f'/solar/api/roof-polygons/?project_id={project_id}', 4),  # + polygons on a cache miss
+            (f'/solar/api/roof-polygons/p-1/?project_id={project_id}', 4),  # + polygon json
+            (f'/solar/api/projects/{project_id}/changes/?since=1', 4),  # + change log
+            ('/solar/api/projects/', 3),
+        ]
+        for url, queries in endpoints:
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_update_all_heights(self):
+        """Test the bulk height update does not load the project more than once"""
+        # session, user, project, savepoint, version bump, version read, polygons,
+        # bulk update, change log upsert, savepoint release
+        with self.assertNumQueries(10):
+            response = self.client.patch(
+                f'/solar/api/projects/{self.project.id}/update-all-heights/',
+                data=json.dumps({"polygons": {"p-1": {"baseHeight": 3}}}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_owner_is_resolved_once_per_request(self):
+        """Test the owner is cached on the request"""
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        self.assertIs(access.project_owner(request), self.user)
+        request.user = None  # would fail if resolved again
+        self.assertIs(access.project_owner(request), self.user)
+
+
+class CatalogCacheTest(IntegrationTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.manufacturers = [PanelManufacturer.objects.create(name=f"Maker {i}") for i in range(3)]
+        self.add_panels(3)
+
+    def add_panels(self, count, **fields):
+        for i in range(count):
+            SolarPanel.objects.create(
+                name=f"Panel {SolarPanel.objects.count()}", manufacturer=self.manufacturers[i % 3], width=1,
+                height=1.7, thickness=0.04, wattage=400, efficiency=21, cost=150, is_public=True, **fields
+            )
+
+    # counts the queries of the primary database, where sessions live without a guest store
+    @override_settings(SOLAR_GUEST_DATABASE=None)
+    def test_constant_query_count(self):
+        """Test the panel list does not query manufacturers per panel"""
+        self.client.login(username='testuser', password='testpassword')
+        for _ in range(2):
+            with self.assertNumQueries(3):  # session, user, panels with manufacturers
+                response = self.client.get('/solar/api/panels/')
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            self.add_panels(10, user=self.user)
+
+        self.assertEqual(len(json.loads(response.content)), 13)
+
+    def test_public_catalog_is_cached(self):
+        """Test anonymous catalog requests are served from the cache until a panel changes"""
+        first = self.client.get('/solar/api/panels/')
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/solar/api/panels/')
+        self.assertEqual(json.loads(first.content), json.loads(second.content))
+
+        self.add_panels(1)
+        response = self.client.get('/solar/api/panels/')
+        self.assertEqual(len(json.loads(response.content)), 4)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        self.assertEqual(response_cache.stats(response_cache.CATALOG)['hits'], 1)
+        self.assertEqual(response_cache.stats(), {"hits": 0, "misses": 0, "hit_ratio": 0.0})
+
+    def test_conditional_requests(self):
+        """Test clients with the current ETag get 304 until the catalog changes"""
+        etag = self.client.get('/solar/api/manufacturers/')['ETag']
+        self.assertEqual(self.client.get('/solar/api/manufacturers/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.manufacturers[0].delete()
+        response = self.client.get('/solar/api/manufacturers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_invalidate_changes_stamp(self):
+        stamp = catalog_cache.stamp()
+        catalog_cache.invalidate()
+        self.assertGreater(catalog_cache.stamp(), stamp)
+
+
+class PanelFilterTest(IntegrationTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.makers = [PanelManufacturer.objects.create(name=name) for name in ("Tiger", "Jinko")]
+        panels = [("Tiger Neo", 420, 150), ("tiger pro", 380, 120), ("Eagle", 400, 90)]
+        for i, (name, wattage, cost) in enumerate(panels):
+            SolarPanel.objects.create(
+                name=name, manufacturer=self.makers[i % 2], width=1.1, height=1.7, thickness=0.035,
+                wattage=wattage, efficiency=20 + i, cost=cost, is_public=True
+            )
+
+    def names(self, query):
+        response = self.client.get(f'/solar/api/panels/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [panel['name'] for panel in json.loads(response.content)]
+
+    def test_filters(self):
+        """Test range, manufacturer and case insensitive name prefix filters"""
+        self.assertEqual(sorted(self.names('min_wattage=390&max_cost=140')), ['Eagle'])
+        self.assertEqual(sorted(self.names(f'manufacturer={self.makers[0].id}')), ['Eagle', 'Tiger Neo'])
+        self.assertEqual(sorted(self.names('name=TIG')), ['Tiger Neo', 'tiger pro'])
+        self.assertEqual(self.names('name=tig&min_efficiency=21'), ['tiger pro'])
+
+    def test_unicode_name_prefix(self):
+        """Test the name prefix folds non-ASCII letters the same way on both sides"""
+        for name in ("Šviesa 400", "Straße Pro"):
+            SolarPanel.objects.create(
+                name=name, width=1.1, height=1.7, thickness=0.035, wattage=400, efficiency=20, cost=100, is_public=True
+            )
+        self.assertEqual(self.names('name=Šv'), ['Šviesa 400'])
+        self.assertEqual(self.names('name=ŠVIES'), ['Šviesa 400'])
+        self.assertEqual(self.names('name=STRASS'), ['Straße Pro'])
+
+        panel = SolarPanel.objects.get(name="Straße Pro")
+        panel.name = "Ąžuolas"
+        panel.save(update_fields=["name"])
+        self.assertEqual(self.names('name=ąž'), ['Ąžuolas'])
+
+    def test_invalid_filter(self):
+        response = self.client.get('/solar/api/panels/?min_wattage=lots')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'error': 'min_wattage must be a number'})
+
+    def test_cursor_pagination(self):
+        """Test page_size switches to cursor pages ordered by name"""
+        first = json.loads(self.client.get('/solar/api/panels/?page_size=2').content)
+        self.assertEqual([panel['name'] for panel in first['results']], ['Eagle', 'Tiger Neo'])
+
+        second = json.loads(self.client.get(first['next']).content)
+        self.assertEqual([panel['name'] for panel in second['results']], ['tiger pro'])
+        self.assertIsNone(second['next'])
+
+
+class SQLiteConnectionTest(IntegrationTestCase):
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS["busy_timeout"])
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS["cache_size"])
+        self.assertIsNone(connection.transaction_mode)
+
+
+class ImmediateTransactionTest(TransactionTestCase):
+    def test_only_write_paths_begin_immediate(self):
+        """Test transactions.immediate() takes the write lock up front while other transactions stay deferred"""
+        with CaptureQueriesContext(connection) as queries:
+            with transactions.immediate():
+                SolarProject.objects.exists()
+            with transaction.atomic():
+                SolarProject.objects.exists()
+
+        begins = [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+        self.assertIsNone(connection.transaction_mode)
+
+
+@override_settings(SOLAR_GUEST_DATABASE='guests')
+class GuestRouterTest(SimpleTestCase):
+    def test_routing(self):
+        """Test guest requests send guest owned models to the guest store, everything else stays put"""
+        router = routers.GuestRouter()
+
+        self.assertEqual(router.db_for_read(SolarProject), 'default')
+        self.assertEqual(router.db_for_read(Session), 'default')
+        with routers.guest_request(True):
+            self.assertEqual(router.db_for_read(SolarProject), 'guests')
+            self.assertEqual(router.db_for_write(User), 'guests')
+            self.assertEqual(router.db_for_read(SolarPanel), 'default')
+
+            with routers.primary_database():
+                self.assertEqual(router.db_for_read(User), 'default')
+
+        # related lookups follow the instance they start from
+        project = SolarProject()
+        project._state.db = 'guests'
+        self.assertEqual(router.db_for_read(RoofPolygon, instance=project), 'guests')
+
+    @override_settings(SOLAR_GUEST_DATABASE=None)
+    def test_disabled_without_guest_store(self):
+        with routers.guest_request(True):
+            self.assertIsNone(routers.GuestRouter().db_for_read(SolarProject))
+
+
+@skipUnless('guests' in settings.DATABASES, 'set SOLAR_GUEST_DB to run the guest store tests')
+class GuestStoreTest(IntegrationTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def create_guest_project(self):
+        response = self.client.post(
+            '/solar/api/projects/',
+            data=json.dumps({'name': 'Guest Project'}),
+            content_type='application/json'
+        )
+        project_id = json.loads(response.content)['id']
+        self.client.post(
+            '/solar/api/roof-polygons/',
+            data=json.dumps({"project_id": project_id, "coordinates": [[1, 1], [1, 2], [2, 1]]}),
+            content_type='application/json'
+        )
+        return project_id
+
+    def test_guest_data_lives_in_guest_store(self):
+        """Test guests, their projects and sessions are written to the guest store only"""
+        project_id = self.create_guest_project()
+
+        self.assertGreater(project_id, routers.GUEST_ID_OFFSET)
+        self.assertFalse(User.objects.using('default').exists())
+        self.assertFalse(SolarProject.objects.using('default').exists())
+        self.assertEqual(RoofPolygon.objects.using('guests').filter(project_id=project_id).count(), 1)
+        self.assertTrue(Session.objects.using('guests').exists())
+        self.assertFalse(Session.objects.using('default').exists())
+
+        response = self.client.get(f'/solar/api/roof-polygons/?project_id={project_id}')
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    def test_conversion_moves_guest_to_primary(self):
+        """Test registering a guest copies the projects into the primary database"""
+        self.create_guest_project()
+
+        response = self.client.post('/solar/auth/register/', data={
+            'username': 'converted',
+            'email': 'converted@example.com',
+            'password1': 'complex-password123',
+            'password2': 'complex-password123',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        user = User.objects.using('default').get(username='converted')
+        project = SolarProject.objects.using('default').get(user=user)
+        self.assertEqual(project.polygons.count(), 1)
+        self.assertFalse(User.objects.using('guests').exists())
+
+        response = self.client.get('/solar/api/projects/')
+        self.assertEqual([p['name'] for p in json.loads(response.content)], ['Guest Project'])
+        self.assertFalse(Session.objects.using('guests').exists())
+
+    def test_guest_from_before_the_guest_store(self):
+        """Test guests created in the primary database keep their session and projects once the store exists"""
+        with self.settings(SOLAR_GUEST_DATABASE=None):
+            self.client.post(
+                '/solar/api/projects/', data=json.dumps({'name': 'Legacy'}), content_type='application/json'
+            )
+        # sessions of that time did not remember the database of their guest
+        session = self.client.session
+        del session[routers.GUEST_DATABASE_KEY]
+        session.save()
+        self.assertTrue(User.objects.using('default').filter(profile__is_guest=True).exists())
+
+        response = self.client.get('/solar/api/projects/')
+        self.assertEqual([p['name'] for p in json.loads(response.content)], ['Legacy'])
+        self.assertEqual(self.client.session[routers.GUEST_DATABASE_KEY], 'default')
+
+        self.client.post('/solar/api/projects/', data=json.dumps({'name': 'Later'}), content_type='application/json')
+        self.assertEqual(SolarProject.objects.using('default').count(), 2)
+        self.assertFalse(User.objects.using('guests').exists())
+        self.assertFalse(Session.objects.using('guests').exists())
+
+    def test_registered_sessions_stay_in_primary(self):
+        """Test registered users' sessions are kept out of the guest store"""
+        User.objects.create_user('registered', 'registered@example.com', 'complex-password123')
+        self.client.login(username='registered', password='complex-password123')
+        self.client.post('/solar/api/projects/', data=json.dumps({'name': 'Mine'}), content_type='application/json')
+
+        self.assertTrue(Session.objects.using('default').exists())
+        self.assertFalse(Session.objects.using('guests').exists())
+
+
+class SunPositionTest(IntegrationTestCase):
+    def test_matches_scalar_reference(self):
+        """Test the vectorized positions broadcast over sites and match the scalar reference"""
+        times = sun_position.hourly_times(2024)
+        position = sun_position.sun_position(times, [[54.68], [-33.9]], [[25.27], [18.4]])
+        self.assertEqual(position.zenith.shape, (2, 8784))
+
+        for site, (latitude, longitude) in enumerate([(54.68, 25.27), (-33.9, 18.4)]):
+            for hour in (0, 4000, 8783):
+                moment = times[hour].astype(datetime).replace(tzinfo=UTC)
+                reference = sun_position.scalar_sun_position(moment, latitude, longitude)
+                self.assertAlmostEqual(position.zenith[site, hour], reference.zenith, places=9)
+                self.assertAlmostEqual(position.azimuth[site, hour], reference.azimuth, places=9)
+
+    def test_solar_noon(self):
+        """Test the sun stands due south at solar noon of the summer solstice"""
+        noon = sun_position.sun_position(np.datetime64('2025-06-21T10:20'), 54.68, 25.27)
+        self.assertAlmostEqual(float(noon.elevation), 90 - 54.68 + 23.44, delta=0.2)
+        self.assertAlmostEqual(float(noon.azimuth), 180, delta=1)
+
+    def test_precise_mode_matches_spa(self):
+        """Test the precise mode against the NREL SPA reference example"""
+        position = sun_position.precise_sun_position(
+            np.datetime64('2003-10-17T19:30:30'), 39.742476, -105.1786, height=1830.14, pressure=820,
+            temperature=11, delta_t=67
+        )
+        self.assertAlmostEqual(float(position.zenith), 50.11162, delta=0.005)
+        self.assertAlmostEqual(float(position.azimuth), 194.34024, delta=0.01)
+        self.assertAlmostEqual(float(position.equation_of_time), 14.641503, delta=0.05)
+
+    def test_precise_mode_refraction(self):
+        """Test refraction keeps the sun visible a little longer at sunset"""
+        times = np.arange(np.datetime64('2025-06-21T17:00'), np.datetime64('2025-06-21T20:00'), np.timedelta64(1, 'm'))
+        fast = sun_position.sun_position(times, 54.68, 25.27)
+        precise = sun_position.precise_sun_position(times, 54.68, 25.27)
+        self.assertGreater((precise.elevation > 0).sum(), (fast.elevation > 0).sum())
+        self.assertEqual(precise.zenith.shape, fast.zenith.shape)
+
+    def test_sun_path_endpoint(self):
+        response = self.client.get('/solar/api/sun-path/?lat=54.68&lng=25.27&year=2025')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+        data = json.loads(response.content)
+        self.assertEqual((data['start'], data['step_minutes']), ('2025-01-01T00:30:00Z', 60))
+        self.assertEqual(len(data['elevation']), 8760)
+        self.assertAlmostEqual(max(data['elevation']), 58.7, delta=0.3)
+
+        response = self.client.get('/solar/api/sun-path/?lat=54.68&lng=25.27&year=2025&mode=precise')
+        self.assertEqual(json.loads(response.content)['mode'], 'precise')
+        self.assertEqual(self.client.get('/solar/api/sun-path/?lat=1&lng=1&mode=exact').status_code, 400)
+
+        response = self.client.get('/solar/api/sun-path/?lat=95&lng=25')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.content))
+
+
+class SunTableTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tables = sun_table.SunTableCache(directory.name, max_bytes=10 * 1024 * 1024)
+        # crosses new year, the lookup spans two yearly tables
+        self.times = np.arange(
+            np.datetime64('2024-12-31T12:00'), np.datetime64('2025-01-02T12:00'), np.timedelta64(7, 'm')
+        )
+
+    def test_interpolated_positions(self):
+        """Test table lookups stay within a hundredth of a degree of the direct calculation"""
+        for mode in sun_position.MODES:
+            zenith, azimuth, elevation = self.tables.sun_position(self.times, 54.68, 25.27, mode)
+            direct = sun_position.MODES[mode](self.times, 54.68, 25.27)
+
+            up = direct.elevation > 0
+            self.assertLess(np.abs(elevation - direct.elevation).max(), 0.01)
+            self.assertLess(np.abs(azimuth - direct.azimuth)[up].max(), 0.05)
+
+    def test_nearby_sites_reuse_tables(self):
+        """Test a second project a few kilometers away does not generate new tables"""
+        self.tables.sun_vectors(self.times, 54.68, 25.27)
+        generated = self.tables.generated
+        self.assertEqual(generated, 4)  # two latitude bands for two years
+
+        self.tables.sun_vectors(self.times, 54.71, 25.41)
+        self.assertEqual(self.tables.generated, generated)
+
+    def test_disk_usage_is_bounded(self):
+        """Test least recently used tables are deleted when the directory grows too large"""
+        self.tables.max_bytes = 2 * 1024 * 1024  # about three yearly tables
+        for latitude in (10, 20, 30, 40):
+            self.tables.sun_vectors(self.times[:10], latitude + 0.25, 0)
+
+        self.assertLessEqual(self.tables.disk_usage(), self.tables.max_bytes)
+        zenith, _, _ = self.tables.sun_position(self.times[:10], 10.25, 0)
+        self.assertEqual(zenith.shape, (10,))
+
+
+class EnergyYieldTest(IntegrationTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.panel = SolarPanel.objects.create(
+            name="Yield 400", width=1.0, height=1.7, thickness=0.04, wattage=400, efficiency=21, cost=150,
+            is_public=True
+        )
+
+        # a 10 x 20 m building in Vilnius with a south and a north slope, edge 0 is the southern eave
+        side = math.degrees(10 / geometry.EARTH_RADIUS)
+        lat, lng = 54.68, 25.27
+        width = side * 2 / math.cos(math.radians(lat))
+        self.project = SolarProject.objects.create(name="Yield", user=self.user, data={"panels": {"wattage": 400}})
+        self.project.replace_polygons([
+            {"id": "south", "coordinates": [[lat, lng], [lat, lng + width], [lat + side, lng + width],
+                                            [lat + side, lng]], "tilt_angle": 35, "bottom_edge_index": 0},
+            {"id": "north", "coordinates": [[lat + side, lng], [lat + side, lng + width], [lat + 2 * side, lng + width],
+                                            [lat + 2 * side, lng]], "tilt_angle": 35, "bottom_edge_index": 2},
+        ])
+        summary.refresh_polygon_summary(self.project.id)
+        self.url = f'/solar/api/projects/{self.project.id}/yield/'
+
+    def test_roof_azimuth(self):
+        """Test a roof faces away from its polygon across the bottom edge, whatever the winding"""
+        square = [[0, 0], [0, 0.001], [0.001, 0.001], [0.001, 0]]
+        self.assertEqual([geometry.roof_azimuth(square, index) for index in range(4)], [180, 90, 0, 270])
+        self.assertEqual(geometry.roof_azimuth(square[::-1], 0), 0)
+        self.assertIsNone(geometry.roof_azimuth(square, None))
+
+    def test_orientation_and_season(self):
+        """Test a south roof outproduces a north roof and summer outproduces winter"""
+        panel = energy_yield.PanelSpec(1000, 1, 1)
+        roofs = [energy_yield.Roof(35, 180, 0, 1), energy_yield.Roof(35, 0, 0, 1), energy_yield.Roof(0, 0, 0, 1)]
+        result = energy_yield.annual_yield(roofs, panel, 54.68, 25.27, 2025)
+
+        self.assertEqual(result.monthly.shape, (3, 12))
+        south, north, flat = result.annual
+        self.assertGreater(south, flat)
+        self.assertGreater(flat, north)
+        # clear sky kWh per kWp of a south roof at 55° N
+        self.assertTrue(1300 < south < 1800, south)
+        self.assertGreater(result.monthly[0, 5], 3 * result.monthly[0, 11])
+
+        # the polar night month produces nothing
+        arctic = energy_yield.annual_yield(roofs[:1], panel, 80, 25, 2025)
+        self.assertEqual(arctic.monthly[0, 11], 0)
+
+    def test_yield_endpoint(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"panel": self.panel.id, "year": 2025,
+                             "roofs": [{"polygon_id": "south", "panel_count": 10},
+                                       {"polygon_id": "north", "panel_count": 10}]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual((data['panel_count'], data['installed_kwp']), (20, 8.0))
+        self.assertEqual(len(data['monthly_kwh']), 12)
+        self.assertAlmostEqual(data['annual_kwh'], sum(data['monthly_kwh']), delta=1)
+
+        south, north = data['roofs']
+        self.assertAlmostEqual(south['azimuth'], 180, delta=0.01)
+        self.assertAlmostEqual(north['azimuth'], 0, delta=0.01)
+        self.assertGreater(south['annual_kwh'], 2 * north['annual_kwh'])
+
+    def test_saved_panels_are_spread_over_roofs(self):
+        """Test without roofs every polygon is used and the saved panel count is split by area"""
+        SolarProject.objects.filter(id=self.project.id).update(data={"panels": {"count": 7, "wattage": 400}})
+
+        data = json.loads(self.client.post(self.url, content_type='application/json').content)
+        self.assertEqual([roof['polygon_id'] for roof in data['roofs']], ['south', 'north'])
+        self.assertEqual(data['panel_count'], 7)
+        self.assertEqual(data['panel_wattage'], 400)
+
+    def test_nearby_projects_share_sun_tables(self):
+        """Test a second yield request a few kilometers away generates no sun position table"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        tables = sun_table.SunTableCache(directory.name, max_bytes=10 * 1024 * 1024)
+        nearby = SolarProject.objects.create(name="Nearby", user=self.user, data={"panels": {"wattage": 400}},
+                                             center_latitude=54.71, center_longitude=25.41)
+        body = json.dumps({"year": 2025, "roofs": [{"tilt": 35, "azimuth": 180, "panel_count": 10}]})
+
+        with mock.patch.object(sun_table, 'get_cache', return_value=tables):
+            first = self.client.post(self.url, data=body, content_type='application/json')
+            generated = tables.generated
+            second = self.client.post(f'/solar/api/projects/{nearby.id}/yield/', data=body,
+                                      content_type='application/json')
+
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(generated, 2)  # the two latitude bands around the site
+        self.assertEqual(tables.generated, generated)
+
+    def test_invalid_requests(self):
+        def post(body):
+            return self.client.post(self.url, data=json.dumps(body), content_type='application/json')
+
+        self.assertEqual(post({"roofs": [{"polygon_id": "missing"}]}).status_code, 400)
+        self.assertEqual(post({"roofs": [{"tilt": 120}]}).status_code, 400)
+        self.assertEqual(post({"roofs": [{"panel_count": -1}]}).status_code, 400)
+        self.assertEqual(post({"panel": 999999}).status_code, 400)
+        self.assertEqual(post({"year": "soon"}).status_code, 400)
+        self.assertEqual(post({"roofs": [{"tilt": 30, "azimuth": "nan"}]}).status_code, 400)
+        self.assertEqual(post({"roofs": [{"tilt": 30, "area": "inf"}]}).status_code, 400)
+
+        # client written panel data without a usable count or wattage, roofs are filled as without a count
+        SolarProject.objects.filter(id=self.project.id).update(data={"panels": {"wattage": 400}})
+        filled = [roof['panel_count'] for roof in json.loads(post({}).content)['roofs']]
+        for panels, status in (({"count": "nan", "wattage": 400}, 200), ({"count": "inf", "wattage": 400}, 200),
+                               ({"count": -3, "wattage": 400}, 200), ({"count": 5, "wattage": "nan"}, 400)):
+            SolarProject.objects.filter(id=self.project.id).update(data={"panels": panels})
+            response = post({})
+            self.assertEqual(response.status_code, status, panels)
+            if status == 200:
+                self.assertEqual([roof['panel_count'] for roof in json.loads(response.content)['roofs']], filled)
+
+        other = User.objects.create_user(username='other', password='testpassword')
+        project = SolarProject.objects.create(name="Other", user=other, data={})
+        response = self.client.post(f'/solar/api/projects/{project.id}/yield/', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class WeatherStoreTest(IntegrationTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.store = weather_store.WeatherStore(self.directory / "store", max_distance_km=100)
+
+    def write_epw(self, name, latitude, longitude, zone, values):
+        """EPW file whose hourly rows, in local standard time, carry `values` as global horizontal radiation"""
+        lines = [f"LOCATION,Vilnius,-,LTU,IWEC,266600,{latitude},{longitude},{zone},156.0"]
+        lines += ["HEADER"] * 7
+        moments = np.arange(np.datetime64('2005-01-01T00'), np.datetime64('2006-01-01T00'), np.timedelta64(1, 'h'))
+        for moment, value in zip(moments.astype(datetime), values, strict=True):
+            row = [2005, moment.month, moment.day, moment.hour + 1, 0, "?", 12.5] + [0] * 6 + [value, 0, 0] + [0] * 10
+            lines.append(",".join(map(str, row)))
+        path = self.directory / name
+        path.write_text("\n".join(lines))
+        return path
+
+    def test_epw_hours_are_stored_in_utc(self):
+        path = self.write_epw("vilnius.epw", 54.63, 25.28, 2.0, np.arange(8760))
+        station, year = weather_store.read_epw(path)
+
+        self.assertEqual((station.latitude, station.longitude, station.name), (54.63, 25.28, "Vilnius, LTU"))
+        self.assertEqual(year.shape, (len(weather_store.COLUMNS), 8760))
+        # local noon to 13:00 of January 1st is 10:00 to 11:00 UTC
+        self.assertEqual(year[0, 10], 12)
+        self.assertEqual(year[0, 8758], 0)  # local midnight of January 1st wraps to the end of the year
+        self.assertEqual(year[3, 0], 12.5)
+
+    def test_pvgis_csv(self):
+        moments = np.arange(np.datetime64('2005-01-01T00'), np.datetime64('2006-01-01T00'), np.timedelta64(1, 'h'))
+        rows = [f"{moment:%Y%m%d:%H}00,4.5,80,{index},1,2,300,3,180,101325"
+                for index, moment in enumerate(moments.astype(datetime))]
+        path = self.directory / "tmy_54.680_25.270.csv"
+        path.write_text(
+            "Latitude (decimal degrees): 54.680\nLongitude (decimal degrees): 25.270\nElevation (m): 112.0\n"
+            "month,year\n1,2007\ntime(UTC),T2m,RH,G(h),Gb(n),Gd(h),IR(h),WS10m,WD10m,SP\n"
+            + "\n".join(rows) + "\nT2m: 2-m air temperature (degree Celsius)\n"
+        )
+        station, year = weather_store.read_pvgis_csv(path)
+        self.assertEqual((station.latitude, station.longitude, station.elevation), (54.68, 25.27, 112.0))
+        self.assertEqual(year[0, 4000], 4000)
+        self.assertEqual(list(year[1:, 4000]), [1, 2, 4.5])
+
+    def test_import_command_and_nearest_station(self):
+        self.write_epw("vilnius.epw", 54.63, 25.28, 2.0, np.arange(8760))
+        self.write_epw("broken.epw", 54.63, 25.28, 2.0, np.arange(8760))
+        (self.directory / "broken.epw").write_text("LOCATION,short")
+        out, err = StringIO(), StringIO()
+        call_command('import_weather', str(self.directory), directory=str(self.store.directory), stdout=out,
+                     stderr=err)
+        self.assertIn("Imported 1 of 2 files", out.getvalue())
+        self.assertIn("broken.epw", err.getvalue())
+
+        station, distance = self.store.nearest(54.68, 25.27)
+        self.assertEqual(station.name, "Vilnius, LTU")
+        self.assertAlmostEqual(distance, 5.6, delta=0.1)
+        self.assertEqual(self.store.nearest(56.95, 24.1), (None, None))  # Riga is too far
+
+        weather = self.store.weather(station)
+        self.assertFalse(weather.ghi.flags.owndata)  # a view of the mapped file
+        self.assertEqual(float(weather.ghi[10]), 12)
+
+    def test_tmy_hours(self):
+        """Test leap years repeat February 28th and then line up with the typical year again"""
+        times = np.array(['2024-02-28T12:30', '2024-02-29T12:30', '2024-03-01T00:30', '2025-03-01T00:30'],
+                         dtype='datetime64[m]')
+        self.assertEqual(list(weather_store.tmy_hours(times)), [58 * 24 + 12, 58 * 24 + 12, 59 * 24, 59 * 24])
+
+    def test_yield_uses_nearest_station(self):
+        """Test a station with half the clear sky light halves the yield"""
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        project = SolarProject.objects.create(name="Weather", user=user, data={"panels": {"wattage": 400}},
+                                              center_latitude=54.68, center_longitude=25.27)
+        url = f'/solar/api/projects/{project.id}/yield/'
+        body = json.dumps({"year": 2025, "roofs": [{"tilt": 35, "azimuth": 180, "panel_count": 10}]})
+
+        def post():
+            with mock.patch.object(weather_store, 'get_store', return_value=self.store):
+                return json.loads(self.client.post(url, data=body, content_type='application/json').content)
+
+        clear = post()
+        self.assertEqual((clear['model'], clear['station']), ('clear_sky', None))
+
+        times = sun_position.hourly_times(2025)
+        cos_zenith = np.cos(np.radians(sun_position.sun_position(times, 54.63, 25.28).zenith))
+        dni, dhi, ghi = energy_yield.clear_sky(times, cos_zenith)
+        station = weather_store.Station("vilnius", "Vilnius", 54.63, 25.28, 156.0, "test")
+        self.store.add(station, np.array([ghi / 2, dni / 2, dhi / 2, np.full(8760, 15.0)]))
+
+        cloudy = post()
+        self.assertEqual((cloudy['model'], cloudy['station']['id']), ('tmy', 'vilnius'))
+        self.assertAlmostEqual(cloudy['annual_kwh'] / clear['annual_kwh'], 0.5, delta=0.05)
+
+
+class TranspositionTest(IntegrationTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.store = weather_store.WeatherStore(Path(cls.directory.name) / "weather")
+        cls.cache = transposition.TranspositionCache(Path(cls.directory.name) / "tables", 10 * 1024 * 1024)
+        cls.table, _ = cls.cache.table(54.68, 25.27, cls.store)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_table_matches_direct_calculation(self):
+        """Test a table cell is the annual sum of the hourly plane-of-array irradiance"""
+        self.assertEqual(self.table.shape, (91, 361))
+        np.testing.assert_array_equal(self.table[:, 360], self.table[:, 0])
+
+        light = energy_yield.daylight_irradiance(54.5, 25.0, transposition.REFERENCE_YEAR)
+        normals = energy_yield.roof_normals([35], [200])
+        direct = energy_yield.plane_of_array(normals, light.sun, light.dni, light.dhi, light.ghi).sum() / 1000
+        self.assertAlmostEqual(float(self.table[35, 200]), direct, delta=direct * 1e-4)
+
+        best_tilt, best_azimuth = np.unravel_index(np.argmax(self.table), self.table.shape)
+        self.assertTrue(35 <= best_tilt <= 55, best_tilt)
+        self.assertTrue(170 <= best_azimuth <= 190, best_azimuth)
+
+    def test_bilinear_lookup(self):
+        values = transposition.interpolate(self.table, [35, 35.5, 90, 10], [200, 200.5, 360, -10])
+        self.assertAlmostEqual(values[0], self.table[35, 200], places=3)
+        corners = self.table[35:37, 200:202]
+        self.assertAlmostEqual(values[1], corners.mean(), places=3)
+        self.assertAlmostEqual(values[2], self.table[90, 0], places=3)
+        self.assertAlmostEqual(values[3], self.table[10, 350], places=3)
+
+        tilt, azimuth = transposition.normal_angles([[0, -0.5, math.sqrt(0.75)], [1, 0, 0], [0, 0, -1]])
+        np.testing.assert_allclose(tilt, [30, 90, 0], atol=1e-9)
+        np.testing.assert_allclose(azimuth[:2], [180, 90], atol=1e-9)
+
+    def test_tables_are_cached_per_site(self):
+        generated = self.cache.generated
+        table, station = self.cache.table(54.71, 25.41, self.store)  # same grid point
+        self.assertIs(table, self.table)
+        self.assertIsNone(station)
+        self.assertEqual(self.cache.generated, generated)
+
+        self.cache.tables.clear()  # a new process loads the file instead of building it
+        table, _ = self.cache.table(54.68, 25.27, self.store)
+        np.testing.assert_array_equal(table, self.table)
+        self.assertEqual(self.cache.generated, generated)
+
+    def test_disk_usage_is_bounded(self):
+        """Test least recently used tables are deleted when the directory grows too large"""
+        directory = Path(self.directory.name) / "bounded"
+        directory.mkdir()
+        for age, latitude in enumerate((20, 10)):
+            path = directory / f"clear_lat{latitude:+.3f}_lng+0.000.npy"
+            np.save(path, self.table)
+            os.utime(path, (age, age))
+        # room for two and a half tables
+        tables = transposition.TranspositionCache(directory, 2.5 * path.stat().st_size)
+
+        tables.table(20, 0, self.store)  # used again, so lat 10 is now the least recently used table
+        tables.table(54.68, 25.27, self.store)
+
+        self.assertEqual(tables.generated, 1)
+        self.assertLessEqual(tables.disk_usage(), tables.max_bytes)
+        self.assertEqual(
+            sorted(file.name for file in directory.glob("*.npy")),
+            ["clear_lat+20.000_lng+0.000.npy", "clear_lat+54.500_lng+25.000.npy"]
+        )
+
+    def test_roof_scores_endpoint(self):
+        def post(body):
+            with mock.patch.object(transposition, 'get_cache', return_value=self.cache), \
+                    mock.patch.object(weather_store, 'get_store', return_value=self.store):
+                return self.client.post('/solar/api/roof-scores/', data=json.dumps(body),
+                                        content_type='application/json')
+
+        response = post({"lat": 54.68, "lng": 25.27, "normals": [[0, -0.6, 0.8], [0, 0.6, 0.8], [0, 0, 1]]})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['model'], 'clear_sky')
+        south, north, flat = data['insolation']
+        self.assertGreater(south, flat)
+        self.assertGreater(flat, north)
+        self.assertTrue(all(0 < value <= 100 for value in data['efficiency']))
+        self.assertEqual(data['optimal']['insolation'], round(float(self.table.max()), 1))
+
+        data = json.loads(post({"lat": 54.68, "lng": 25.27, "tilt": [36.87], "azimuth": [180]}).content)
+        self.assertAlmostEqual(data['insolation'][0], south, delta=0.5)
+
+        self.assertEqual(post({"lat": 54.68, "lng": 25.27}).status_code, 400)
+        self.assertEqual(post({"lat": 54.68, "lng": 25.27, "normals": [[0, 0]]}).status_code, 400)
+        self.assertEqual(post({"lat": 54.68, "lng": 25.27, "normals": [[0, 0, 0]]}).status_code, 400)
+        self.assertEqual(post({"lat": 54.68, "lng": 25.27, "tilt": [95], "azimuth": [0]}).status_code, 400)
+        self.assertEqual(post({"lat": 54.68, "lng": 25.27, "tilt": ["x"], "azimuth": [0]}).status_code, 400)
+        self.assertEqual(post({"lng": 25.27, "tilt": [30], "azimuth": [0]}).status_code, 400)
+
+    # throttle classes read their rates when they are defined
+    @mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'roof-scores': '2/minute'})
+    def test_roof_scores_are_throttled(self):
+        """Test anonymous clients cannot request roof scores without limit"""
+        cache.clear()
+        body = json.dumps({"lat": 54.68, "lng": 25.27, "tilt": [30], "azimuth": [180]})
+        with mock.patch.object(transposition, 'get_cache', return_value=self.cache), \
+                mock.patch.object(weather_store, 'get_store', return_value=self.store):
+            statuses = [
+                self.client.post('/solar/api/roof-scores/', data=body, content_type='application/json').status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class RoofEfficiencyTest(IntegrationTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.store = weather_store.WeatherStore(Path(cls.directory.name) / "weather")
+        cls.cache = transposition.TranspositionCache(Path(cls.directory.name) / "tables", 10 * 1024 * 1024)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+        # 20 m wide, 10 m deep, the northern ridge 10 * tan(30°) above the southern eave
+        depth = math.degrees(10 / geometry.EARTH_RADIUS)
+        lat, lng = 54.68, 25.27
+        width = math.degrees(20 / geometry.EARTH_RADIUS) / math.cos(math.radians(lat))
+        ridge = 10 * math.tan(math.radians(30))
+        self.project = SolarProject.objects.create(name="Roofs", user=self.user, data={})
+        self.project.replace_polygons([
+            {"id": "gable", "coordinates": [[lat, lng], [lat, lng + width], [lat + depth, lng + width],
+                                            [lat + depth, lng]],
+             "height_data": {"baseHeight": 3, "stableVertexHeights": {
+                 "pgable_v0": 0, "pgable_v1": 0, "pgable_v2": ridge, "pgable_v3": ridge}}},
+            # no vertex heights, tilt and bottom edge come from the roof drawing tool, edge 1 is the eastern one
+            {"id": "drawn", "coordinates": [[lat, lng], [lat, lng + width], [lat + depth, lng + width],
+                                            [lat + depth, lng]],
+             "tilt_angle": 20, "bottom_edge_index": 1},
+            {"id": "line", "coordinates": [[lat, lng], [lat, lng + width]]},
+            # stored before points were validated
+            {"id": "broken", "coordinates": [[lat, lng], None, [lat + depth, lng]]},
+        ])
+        summary.refresh_polygon_summary(self.project.id)
+        self.url = f'/solar/api/projects/{self.project.id}/roof-efficiency/'
+
+    def post(self, body=None):
+        with mock.patch.object(transposition, 'get_cache', return_value=self.cache), \
+                mock.patch.object(weather_store, 'get_store', return_value=self.store):
+            return self.client.post(self.url, data=json.dumps(body or {}), content_type='application/json')
+
+    def test_plane_fit_and_fallback(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        gable, drawn = json.loads(response.content)['roofs']  # two or malformed vertices are no roof
+
+        self.assertTrue(gable['from_heights'])
+        self.assertAlmostEqual(gable['tilt'], 30, places=1)
+        self.assertAlmostEqual(gable['azimuth'], 180, places=1)
+        self.assertEqual(gable['facing'], 'South')
+        self.assertAlmostEqual(gable['area'], 200 / math.cos(math.radians(30)), delta=0.5)
+        self.assertGreater(gable['efficiency'], 95)
+
+        self.assertFalse(drawn['from_heights'])
+        self.assertAlmostEqual(drawn['tilt'], 20, places=1)
+        self.assertAlmostEqual(drawn['azimuth'], 90, places=1)
+        self.assertEqual(drawn['facing'], 'East')
+        self.assertLess(drawn['insolation'], gable['insolation'])
+
+    def test_unsaved_heights_are_merged(self):
+        """Test "heights" overrides single height fields like update-all-heights and keeps the stored rest"""
+        response = self.post({"heights": {"gable": {"baseHeight": 5}}, "polygon_ids": ["gable"]})
+        (gable,) = json.loads(response.content)['roofs']
+        self.assertTrue(gable['from_heights'])
+        self.assertAlmostEqual(gable['tilt'], 30, places=1)
+
+    def test_reimported_station_is_a_new_source(self):
+        """Test importing a station again analyzes the roofs again instead of serving cached results"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = weather_store.WeatherStore(directory.name)
+        station = weather_store.Station("vilnius", "Vilnius", 54.68, 25.27, 156.0, "test")
+        self.store.add(station, np.full((4, 8760), 100, dtype=np.float32))
+
+        self.post()
+        self.post()
+        self.assertEqual(response_cache.stats(response_cache.ROOF_EFFICIENCY)['misses'], 1)
+
+        self.store.add(station, np.full((4, 8760), 50, dtype=np.float32))
+        path = self.store.path(station)
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+        self.assertEqual(json.loads(self.post().content)['model'], 'tmy')
+        self.assertEqual(response_cache.stats(response_cache.ROOF_EFFICIENCY)['misses'], 2)
+
+    def test_least_squares_normals(self):
+        """Test a noisy plane fitted over many vertices in one batch"""
+        rng = np.random.default_rng(0)
+        points = np.zeros((2, 9, 3))
+        points[:, :, :2] = rng.uniform(0, 10, (2, 9, 2))
+        points[0, :, 2] = 0.5 * points[0, :, 0] + rng.normal(0, 0.01, 9)  # rises towards the east
+        mask = np.ones((2, 9), dtype=bool)
+        mask[1, 3:] = False
+        points[1, :3, :2] = [[0, 0], [1, 1], [2, 2]]  # collinear
+        normals = roof_analysis.fit_normals(points, mask)
+
+        np.testing.assert_allclose(normals[0], [-0.5, 0, 1] / np.linalg.norm([-0.5, 0, 1]), atol=0.01)
+        self.assertTrue(np.isnan(normals[1]).all())
+
+    def test_results_are_cached_by_geometry(self):
+        self.post()
+        self.assertEqual(response_cache.stats(response_cache.ROOF_EFFICIENCY)['misses'], 1)
+        self.post()
+        self.assertEqual(response_cache.stats(response_cache.ROOF_EFFICIENCY)['hits'], 1)
+        # the project response cache counts its own lookups only
+        self.assertEqual(response_cache.stats()['hits'] + response_cache.stats()['misses'], 0)
+
+        # unsaved flat heights are a different geometry
+        response = self.post({"heights": {"gable": {"stableVertexHeights": {}}}, "polygon_ids": ["gable"]})
+        self.assertEqual(response_cache.stats(response_cache.ROOF_EFFICIENCY)['misses'], 2)
+        (gable,) = json.loads(response.content)['roofs']
+        self.assertEqual(gable['tilt'], 0)
+        self.assertTrue(gable['is_flat'])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post({"polygon_ids": "gable"}).status_code, 400)
+        self.assertEqual(self.post({"heights": {"gable": 3}}).status_code, 400)
+
+        other = User.objects.create_user(username='other', password='testpassword')
+        project = SolarProject.objects.create(name="Other", user=other, data={})
+        self.url = f'/solar/api/projects/{project.id}/roof-efficiency/'
+        self.assertEqual(self.post().status_code, 404)
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def immediate(using=None):
+    """transaction.atomic() that takes the SQLite write lock when it begins, for blocks that read before writing.
+
+    Two deferred transactions upgrading from reading to writing at the same time fail with "database is locked"
+    instead of waiting for busy_timeout. Reads elsewhere keep deferred transactions, nested blocks are savepoints.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        with transaction.atomic(using=connection.alias):
+            yield
+        return
+
+    # connecting resets transaction_mode from the settings, so connect first
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = "IMMEDIATE"
+    try:
+        with transaction.atomic(using=connection.alias):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -0,0 +1,148 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from . import weather_store
+from .energy_yield import beam_factor, daylight_irradiance, roof_normals, sky_factors
+from .sun_table import vector_angles
+
+# one row per tilt degree 0-90 and one column per azimuth degree 0-360, 360 repeats 0 so lookups never wrap
+TILTS = np.arange(91)
+AZIMUTHS = np.arange(361)
+# sun positions of a non leap year, typical years do not have one
+REFERENCE_YEAR = 2023
+
+
+def insolation_table(latitude, longitude, weather=None, tables=None):
+    """(91, 361) float32 annual plane-of-array insolation in kWh/m² per (tilt, azimuth) degree"""
+    light = daylight_irradiance(latitude, longitude, REFERENCE_YEAR, weather, tables)
+    sun, dni = light.sun.astype(np.float32), light.dni.astype(np.float32)
+
+    table = np.empty((TILTS.size, AZIMUTHS.size), dtype=np.float32)
+    # only the beam depends on the hour, the diffuse and ground terms are annual sums times a view factor.
+    # one tilt at a time keeps the (360, hours) block small
+    for tilt in TILTS:
+        normals = roof_normals(np.full(360, tilt), AZIMUTHS[:-1])
+        sky, ground = sky_factors(normals)
+        beam = beam_factor(normals.astype(np.float32) @ sun.T) @ dni
+        table[tilt, :-1] = (beam + sky[:, 0] * light.dhi.sum() + ground[:, 0] * light.ghi.sum()) / 1000
+    table[:, -1] = table[:, 0]
+    return table
+
+
+def interpolate(table, tilt, azimuth):
+    """Bilinear insolation of tilt and azimuth arrays in degrees, azimuth clockwise from north"""
+    tilt = np.clip(np.asarray(tilt, dtype=float), 0, TILTS[-1])
+    azimuth = np.mod(np.asarray(azimuth, dtype=float), 360)
+
+    row = np.minimum(tilt.astype(int), TILTS[-1] - 1)
+    column = np.minimum(azimuth.astype(int), 359)
+    tilt_weight, azimuth_weight = tilt - row, azimuth - column
+    top = table[row, column] + azimuth_weight * (table[row, column + 1] - table[row, column])
+    bottom = table[row + 1, column] + azimuth_weight * (table[row + 1, column + 1] - table[row + 1, column])
+    return top + tilt_weight * (bottom - top)
+
+
+def normal_angles(normals):
+    """(tilt, azimuth) in degrees of (N, 3) roof normals (east, north, up), downward normals are flipped"""
+    normals = np.asarray(normals, dtype=float).reshape(-1, 3)
+    normals = np.where(normals[:, 2:3] < 0, -normals, normals)
+    tilt, azimuth, _ = vector_angles(normals)
+    return tilt, azimuth
+
+
+def table_source(station, store):
+    """Weather a table is built from: the station and the time its data was imported, "clear" for a clear sky"""
+    return f"{station.id}-{store.path(station).stat().st_mtime_ns:x}" if station else "clear"
+
+
+class TranspositionCache:
+    """Insolation tables per site stored as .npy files, sites are snapped to a lat_step x lng_step grid.
+
+    A table uses the typical year of the nearest weather station (weather_store) when there is one and a clear
+    sky otherwise. The station and the time its data was imported are part of the file name, importing a
+    station again builds new tables. Files are evicted least recently used first once the directory grows over
+    max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes, lat_step=0.5, lng_step=1.0, max_open=64):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.lat_step = lat_step
+        self.lng_step = lng_step
+        self.max_open = max_open
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+        self.generated = 0
+
+    def site(self, latitude, longitude):
+        """Grid point of a location"""
+        latitude = round(latitude / self.lat_step) * self.lat_step
+        longitude = round(longitude / self.lng_step) * self.lng_step
+        return min(max(latitude, -90.0), 90.0), (longitude + 180) % 360 - 180
+
+    def table(self, latitude, longitude, store=None):
+        """(table, weather station or None) of a location, generated on first use"""
+        latitude, longitude = self.site(latitude, longitude)
+        store = store or weather_store.get_store()
+        station, _ = store.nearest(latitude, longitude)
+        path = self.directory / f"{table_source(station, store)}_lat{latitude:+.3f}_lng{longitude:+.3f}.npy"
+
+        with self.lock:
+            if path in self.tables:
+                self.tables.move_to_end(path)
+                return self.tables[path], station
+
+        if path.exists():
+            # the modification time of a file is its LRU position on disk
+            os.utime(path)
+        else:
+            table = insolation_table(latitude, longitude, store.weather(station) if station else None)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            weather_store.write_atomic(path, lambda file: np.save(file, table))
+            self.generated += 1
+            self.evict(keep=path)
+
+        # 130 kB per table, read whole instead of memory mapped
+        table = np.load(path)
+        with self.lock:
+            self.tables[path] = table
+            while len(self.tables) > self.max_open:
+                self.tables.popitem(last=False)
+        return table, station
+
+    def evict(self, keep=None):
+        """Delete least recently used tables until the directory fits in max_bytes"""
+        files = sorted(self.directory.glob("*.npy"), key=lambda file: file.stat().st_mtime)
+        total = sum(file.stat().st_size for file in files)
+        for file in files:
+            if total <= self.max_bytes:
+                break
+            if file == keep:
+                continue
+            total -= file.stat().st_size
+            file.unlink(missing_ok=True)
+            with self.lock:
+                self.tables.pop(file, None)
+
+    def disk_usage(self):
+        return sum(file.stat().st_size for file in self.directory.glob("*.npy"))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process wide table cache configured by the SOLAR_TRANSPOSITION_* settings"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranspositionCache(
+                settings.SOLAR_TRANSPOSITION_DIR, settings.SOLAR_TRANSPOSITION_MAX_MB * 1024 * 1024
+            )
+        return _cache
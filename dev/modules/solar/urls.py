@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import auth_views, views
+from . import auth_views, sun_views, views
 
 app_name = "modules.solar" 
 
@@ -11,9 +11,11 @@ urlpatterns = [
     # project endpoints
     path("api/projects/", views.ProjectListView.as_view(), name="project-list"),
     path("api/projects/<int:project_id>/", views.ProjectDetailView.as_view(), name="project_detail"),
+    path("api/projects/<int:project_id>/changes/", views.ProjectChangesView.as_view(), name="project-changes"),
 
     # polygon endpoints
     path("api/roof-polygons/", views.PolygonListCreateView.as_view(), name="polygon-list-create"),
+    path("api/roof-polygons/batch/", views.PolygonBatchView.as_view(), name="polygon-batch"),
     path("api/roof-polygons/<str:polygon_id>/", views.PolygonDetailView.as_view(), name="polygon-detail"),
     path(
         "api/roof-polygons/<str:polygon_id>/update-height/",
@@ -38,4 +40,14 @@ urlpatterns = [
         name="panel-detail",
     ),
     path("api/manufacturers/", views.ManufacturerListView.as_view(), name="manufacturer-list"),
+
+    # sun and yield calculations
+    path("api/sun-path/", sun_views.SunPathView.as_view(), name="sun-path"),
+    path("api/roof-scores/", sun_views.RoofScoreView.as_view(), name="roof-scores"),
+    path("api/projects/<int:project_id>/yield/", sun_views.ProjectYieldView.as_view(), name="project-yield"),
+    path(
+        "api/projects/<int:project_id>/roof-efficiency/",
+        sun_views.RoofEfficiencyView.as_view(),
+        name="roof-efficiency",
+    ),
 ]
@@ -0,0 +1,71 @@
+from django.db.models import F
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from . import response_cache
+from .models import SolarProject
+
+
+def project_etag(project_id, version):
+    """Strong ETag shared by every representation of a project at a given version"""
+    return f'"{project_id}-{version}"'
+
+
+def set_etag(response, project_id, version):
+    """Tag a response with the project version and make browsers revalidate it before reuse"""
+    response["ETag"] = project_etag(project_id, version)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(request, project):
+    """Return a 304 response if the client already has the current version, None otherwise"""
+    response = get_conditional_response(request, etag=project_etag(project.id, project.version))
+    if response is not None:
+        set_etag(response, project.id, project.version)
+    return response
+
+
+def if_match_versions(request, project_id):
+    """Versions listed in If-Match, None when the header is missing or '*'"""
+    header = request.META.get("HTTP_IF_MATCH")
+    if not header:
+        return None
+
+    etags = parse_etags(header)
+    if "*" in etags:
+        return None
+
+    # strong comparison: weak (W/) or foreign tags never match
+    prefix = f'"{project_id}-'
+    return [
+        int(etag[len(prefix) : -1])
+        for etag in etags
+        if etag.startswith(prefix) and etag.endswith('"') and etag[len(prefix) : -1].isdigit()
+    ]
+
+
+def bump_version(request, project_id):
+    """Increment the project version if If-Match allows it.
+
+    This is an optimistic compare-and-swap, no row is locked between reading and writing.
+    Call it inside the same transaction as the write. Returns the new version or None on conflict.
+    """
+    projects = SolarProject.objects.filter(id=project_id)
+
+    versions = if_match_versions(request, project_id)
+    if versions is not None:
+        projects = projects.filter(version__in=versions)
+
+    if not projects.update(version=F("version") + 1):
+        return None
+
+    version = SolarProject.objects.filter(id=project_id).values_list("version", flat=True).get()
+    # the new version is cleared too, ids and versions repeat after a database is reset
+    response_cache.invalidate(project_id, version - 1, version)
+    return version
+
+
+def precondition_failed():
+    return Response({"error": "Project was modified by another request"}, status=412)
@@ -1,19 +1,32 @@
 import uuid
 
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.middleware.csrf import get_token
 from django.shortcuts import render
 from rest_framework import generics, viewsets
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .guest_user import get_or_create_guest_user
-from .models import PanelManufacturer, SolarPanel, SolarProject
-from .serializers import PanelManufacturerSerializer, PolygonSerializer, SolarPanelSerializer, SolarProjectSerializer
+from . import catalog_cache, changelog, polygon_store, response_cache, routers, summary, transactions, versioning
+from .access import ProjectAccessMixin, get_project, owned_projects, project_owner
+from .filters import PanelFilter, is_filtered
+from .geometry import valid_coordinates
+from .models import PanelManufacturer, RoofPolygon, SolarPanel, SolarProject
+from .pagination import PanelCursorPagination, ProjectCursorPagination
+from .serializers import (
+    PanelManufacturerSerializer,
+    PolygonSerializer,
+    SolarPanelSerializer,
+    SolarProjectListSerializer,
+    SolarProjectSerializer,
+)
 
 
 def map_view(request):
@@ -39,113 +52,217 @@ def map_view(request):
 
 class ProjectListView(generics.ListCreateAPIView):
     serializer_class = SolarProjectSerializer
+    pagination_class = ProjectCursorPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["created_at", "name", "polygon_count", "roof_area", "installed_kwp", "annual_kwh"]
+    ordering = ["created_at", "id"]
 
-    def get_queryset(self):
-        if self.request.user.is_authenticated:
-            # logged in normally
-            if (
-                hasattr(self.request.user, "profile")
-                and not self.request.user.profile.is_guest
-                or hasattr(self.request.user, "profile")
-                and self.request.user.profile.is_guest
-            ):
-                return SolarProject.objects.filter(user=self.request.user)
-        else:
-            # anonymous user - create a guest user
-            guest_user = get_or_create_guest_user(self.request)
-            return SolarProject.objects.filter(user=guest_user)
+    def get_serializer_class(self):
+        if self.request.method == "GET":
+            return SolarProjectListSerializer
+        return SolarProjectSerializer
 
-        return SolarProject.objects.none()
+    def get_queryset(self):
+        # anonymous sessions have nothing to list until the first write creates a guest user
+        projects = owned_projects(self.request)
+        if self.request.method == "GET":
+            # full data only comes from the detail endpoint
+            projects = projects.only(*SolarProjectListSerializer.Meta.fields)
+        return projects
 
     def perform_create(self, serializer):
         data = {
             'latitude': 0.0,
             'longitude': 0.0,
             'zoom': 15,
-            'polygons': []
         }
         
         if 'data' in self.request.data and isinstance(self.request.data['data'], dict):
             data.update(self.request.data['data'])
-        
-        if self.request.user.is_authenticated:
-            serializer.save(user=self.request.user, data=data)
+
+        # polygons are stored as RoofPolygon rows, not inside the data blob
+        polygons = data.pop('polygons', None) or []
+        error = polygons_error(polygons)
+        if error:
+            raise ValidationError({"error": error})
+
+        owner = project_owner(self.request, create=True)
+        project = serializer.save(user=owner, data=data)
+
+        if polygons:
+            project.replace_polygons(polygons)
+            summary.refresh_polygon_summary(project.id)
         else:
-            guest_user = get_or_create_guest_user(self.request)
-            serializer.save(user=guest_user, data=data)
+            summary.refresh_panel_summary(project.id)
 
 
-class ProjectDetailView(APIView):
+class ProjectDetailView(ProjectAccessMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, project_id):
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
-
-            return Response({
-            "id": project.id, 
-            "name": project.name,
-            "latitude": project.data.get("latitude"), 
-            "longitude": project.data.get("longitude"),
-            "zoom": project.data.get("zoom")
-        })
+            # name and data are only loaded on a cache miss
+            project = self.get_project(project_id, fields=["id", "version"])
+
+            not_modified = versioning.not_modified(request, project)
+            if not_modified:
+                return not_modified
+
+            body = response_cache.get_or_build(
+                response_cache.DETAIL, project.id, project.version, lambda: project_detail(project)
+            )
+            response = Response(body)
+            versioning.set_etag(response, project.id, project.version)
+            return response
         except SolarProject.DoesNotExist as e:
             raise Http404 from e
 
     def delete(self, request, project_id):
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
+            project = self.get_project(project_id, fields=["id", "name", "version"])
 
             project_name = project.name
-            project.delete()
+            with transactions.immediate(project._state.db):
+                if versioning.bump_version(request, project.id) is None:
+                    return versioning.precondition_failed()
+                project.delete()
             return Response({"message": f"Project {project_name} deleted successfully"})
         except SolarProject.DoesNotExist as e:
             raise Http404 from e
         
     def patch(self, request, project_id):
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
+            project = self.get_project(project_id)
             
             if 'name' in request.data:
                 project.name = request.data['name']
                 
+            polygons = None
             if 'data' in request.data:
                 if not project.data:
                     project.data = {}
-                    
-                project.data.update(request.data['data'])
-                
-            project.save()
+
+                data = dict(request.data['data'])
+                polygons = data.pop('polygons', None)
+                error = polygons_error(polygons) if polygons is not None else None
+                if error:
+                    return Response({"error": error}, status=400)
+                project.data.update(data)
+
+            with transactions.immediate(project._state.db):
+                project.version = versioning.bump_version(request, project.id)
+                if project.version is None:
+                    return versioning.precondition_failed()
+
+                project.save(update_fields=["name", "data"])
+
+                if polygons is not None:
+                    old_ids = set(project.polygons.values_list("polygon_id", flat=True))
+                    new_ids = set(project.replace_polygons(polygons))
+                    changelog.record_changes(
+                        project.id,
+                        project.version,
+                        added=new_ids - old_ids,
+                        modified=new_ids & old_ids,
+                        removed=old_ids - new_ids,
+                    )
+                    summary.refresh_polygon_summary(project.id)
+                elif 'data' in request.data:
+                    summary.refresh_panel_summary(project.id)
             
-            return Response({
+            response = Response({
                 "id": project.id, 
                 "name": project.name,
                 "latitude": project.data.get("latitude"), 
                 "longitude": project.data.get("longitude"),
-                "zoom": project.data.get("zoom")
+                "zoom": project.data.get("zoom"),
+                "version": project.version,
             })
+            versioning.set_etag(response, project.id, project.version)
+            return response
         except SolarProject.DoesNotExist as e:
             # return 404 both scenarios so its unclear if it exists or not
             raise Http404 from e
 
 
-class PolygonListCreateView(APIView):
+def project_detail(project):
+    name, data = SolarProject.objects.filter(id=project.id).values_list("name", "data").get()
+    data = data or {}
+    return {
+        "id": project.id,
+        "name": name,
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "zoom": data.get("zoom"),
+        "version": project.version,
+    }
+
+
+class ProjectChangesView(ProjectAccessMixin, APIView):
+    """Polygon changes since a project version, lets clients sync without reloading every polygon"""
+
+    permission_classes = [AllowAny]
+    project_fields = ["id", "version"]
+
+    def get(self, request, project_id):
+        since = request.GET.get("since")
+        if not since or not since.isdigit():
+            return Response({"error": "since is required"}, status=400)
+
+        try:
+            project = self.get_project(project_id)
+
+            if int(since) > project.version:
+                return Response({"error": "since is newer than the project version"}, status=400)
+
+            response = Response(changelog.changes_since(project, int(since)))
+            versioning.set_etag(response, project.id, project.version)
+            return response
+        except SolarProject.DoesNotExist:
+            return Response({"error": "Project not found"}, status=404)
+
+
+def new_polygon_data(data):
+    """Polygon document for a newly drawn roof, the id is always assigned by the server"""
+    return {
+        "id": f"p-{uuid.uuid4()}",
+        "coordinates": data.get("coordinates", []),
+        "tilt_angle": data.get("tilt_angle", 0),
+        "bottom_edge_index": data.get("bottom_edge_index"),
+        "height_data": {"baseHeight": 0, "vertexHeights": {}, "stableVertexHeights": {}},
+        "edges": [],
+    }
+
+
+def coordinates_error(coordinates):
+    if coordinates is None:
+        return "Coordinates cannot be null"
+
+    if not isinstance(coordinates, list) or len(coordinates) < 3:
+        return "Polygon must have at least 3 points"
+
+    if not valid_coordinates(coordinates):
+        return "Every point must be a [lat, lng] pair of numbers"
+
+    return None
+
+
+def polygons_error(polygons):
+    """Error message of the polygons sent inside project data, None when they can be stored"""
+    if not isinstance(polygons, list) or not all(isinstance(polygon, dict) for polygon in polygons):
+        return "polygons must be a list of objects"
+
+    for index, polygon in enumerate(polygons):
+        # unfinished polygons with fewer points are kept like before, only malformed points are refused
+        if not valid_coordinates(polygon.get("coordinates") or []):
+            return f"polygon {index}: every point must be a [lat, lng] pair of numbers"
+
+    return None
+
+
+class PolygonListCreateView(ProjectAccessMixin, APIView):
     permission_classes = [AllowAny]
+    project_fields = ["id", "version"]
 
     def get(self, request):
         project_id = request.GET.get("project_id")
@@ -153,15 +270,21 @@ class PolygonListCreateView(APIView):
             return Response([])
 
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
-
-            polygons = project.data.get("polygons", [])
-            return Response(polygons)
+            project = self.get_project(project_id, fields=["id", "version"])
+
+            not_modified = versioning.not_modified(request, project)
+            if not_modified:
+                return not_modified
+
+            polygons = response_cache.get_or_build(
+                response_cache.POLYGONS,
+                project.id,
+                project.version,
+                lambda: [polygon.to_dict() for polygon in RoofPolygon.objects.filter(project_id=project.id)],
+            )
+            response = Response(polygons)
+            versioning.set_etag(response, project.id, project.version)
+            return response
         except SolarProject.DoesNotExist:
             return Response([])
 
@@ -171,57 +294,97 @@ class PolygonListCreateView(APIView):
             return Response({"error": "project_id is required"}, status=400)
 
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
+            project = self.get_project(project_id)
 
             #serializer
-            polygon_data = {
-                "id": f"p-{uuid.uuid4()}",
-                "coordinates": request.data.get("coordinates", []),
-                "tilt_angle": request.data.get("tilt_angle", 0),
-                "bottom_edge_index": request.data.get("bottom_edge_index"),
-                "height_data": {"baseHeight": 0, "vertexHeights": {}, "stableVertexHeights": {}},
-                "edges": [],
-            }
+            polygon_data = new_polygon_data(request.data)
 
-            # Get coordinates
-            coordinates = request.data.get("coordinates", [])
-    
-            if coordinates is None:
-                return Response({
-                    "error": "Coordinates cannot be null"
-                }, status=400)
-            
-            if len(coordinates) < 3:
-                return Response({
-                    "error": "Polygon must have at least 3 points"
-                }, status=400)
+            error = coordinates_error(polygon_data["coordinates"])
+            if error:
+                return Response({"error": error}, status=400)
 
             serializer = PolygonSerializer(data=polygon_data)
             if not serializer.is_valid():
                 return Response(serializer.errors, status=400)
 
             # add polygon to project
-            if "data" not in project.__dict__ or not project.data:
-                project.data = {"polygons": []}
+            with transactions.immediate(project._state.db):
+                version = versioning.bump_version(request, project.id)
+                if version is None:
+                    return versioning.precondition_failed()
+                RoofPolygon.from_dict(project, polygon_data).save()
+                changelog.record_changes(project.id, version, added=[polygon_data["id"]])
+                summary.refresh_polygon_summary(project.id)
+
+            response = Response(polygon_data, status=201)
+            versioning.set_etag(response, project.id, version)
+            return response
+        except SolarProject.DoesNotExist:
+            return Response({"error": "Project not found"}, status=404)
+
 
-            if "polygons" not in project.data:
-                project.data["polygons"] = []
+class PolygonBatchView(ProjectAccessMixin, APIView):
+    """Create and delete many polygons of one project in a single request and transaction"""
 
-            project.data["polygons"].append(polygon_data)
-            project.save()
+    permission_classes = [AllowAny]
+    project_fields = ["id", "version"]
 
-            return Response(polygon_data, status=201)
+    def post(self, request):
+        project_id = request.data.get("project_id")
+        if not project_id:
+            return Response({"error": "project_id is required"}, status=400)
+
+        create = request.data.get("create") or []
+        delete = request.data.get("delete") or []
+        if not isinstance(create, list) or not isinstance(delete, list):
+            return Response({"error": "create and delete must be lists"}, status=400)
+
+        try:
+            project = self.get_project(project_id)
+
+            polygons_data = [new_polygon_data(item if isinstance(item, dict) else {}) for item in create]
+
+            errors = {
+                index: error
+                for index, error in enumerate(coordinates_error(p["coordinates"]) for p in polygons_data)
+                if error
+            }
+            if errors:
+                return Response({"error": "Invalid polygons", "errors": errors}, status=400)
+
+            serializer = PolygonSerializer(data=polygons_data, many=True)
+            if not serializer.is_valid():
+                return Response({"error": "Invalid polygons", "errors": serializer.errors}, status=400)
+
+            delete_ids = {str(polygon_id) for polygon_id in delete}
+
+            with transactions.immediate(project._state.db):
+                version = versioning.bump_version(request, project.id)
+                if version is None:
+                    return versioning.precondition_failed()
+
+                if delete_ids:
+                    deleted, _ = RoofPolygon.objects.filter(project=project, polygon_id__in=delete_ids).delete()
+                    if deleted != len(delete_ids):
+                        transaction.set_rollback(True, using=project._state.db)
+                        return Response({"error": "Polygon not found"}, status=404)
+
+                RoofPolygon.objects.bulk_create([RoofPolygon.from_dict(project, p) for p in polygons_data])
+
+                created_ids = [p["id"] for p in polygons_data]
+                changelog.record_changes(project.id, version, added=created_ids, removed=delete_ids)
+                summary.refresh_polygon_summary(project.id)
+
+            response = Response({"ids": created_ids, "deleted": sorted(delete_ids)}, status=201)
+            versioning.set_etag(response, project.id, version)
+            return response
         except SolarProject.DoesNotExist:
             return Response({"error": "Project not found"}, status=404)
 
 
-class PolygonDetailView(APIView):
+class PolygonDetailView(ProjectAccessMixin, APIView):
     permission_classes = [AllowAny]
+    project_fields = ["id", "version"]
 
     def get(self, request, polygon_id):
         project_id = request.GET.get("project_id")
@@ -229,19 +392,20 @@ class PolygonDetailView(APIView):
             return Response({"error": "project_id is required"}, status=400)
 
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
+            project = self.get_project(project_id)
+
+            not_modified = versioning.not_modified(request, project)
+            if not_modified:
+                return not_modified
 
-            polygon = next((p for p in project.data.get("polygons", []) if p.get("id") == polygon_id), None)
+            polygon_json = polygon_store.get_polygon_json(project.id, polygon_id)
 
-            if not polygon:
+            if polygon_json is None:
                 return Response({"error": "Polygon not found"}, status=404)
 
-            return Response(polygon)
+            response = HttpResponse(polygon_json, content_type="application/json")
+            versioning.set_etag(response, project.id, project.version)
+            return response
         except SolarProject.DoesNotExist:
             return Response({"error": "Project not found"}, status=404)
 
@@ -252,30 +416,33 @@ class PolygonDetailView(APIView):
 
         try:
             #user has access ?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
-
-            if "polygons" not in project.data:
-                return Response({"error": "No polygons in project"}, status=404)
+            project = self.get_project(project_id)
 
             # find and remove the polygon
-            original_count = len(project.data["polygons"])
-            project.data["polygons"] = [p for p in project.data["polygons"] if p.get("id") != polygon_id]
+            with transactions.immediate(project._state.db):
+                version = versioning.bump_version(request, project.id)
+                if version is None:
+                    return versioning.precondition_failed()
 
-            if len(project.data["polygons"]) == original_count:
-                return Response({"error": "Polygon not found"}, status=404)
+                deleted, _ = RoofPolygon.objects.filter(project=project, polygon_id=polygon_id).delete()
+
+                if not deleted:
+                    transaction.set_rollback(True, using=project._state.db)
+                    return Response({"error": "Polygon not found"}, status=404)
 
-            project.save()
-            return Response(status=204)
+                changelog.record_changes(project.id, version, removed=[polygon_id])
+                summary.refresh_polygon_summary(project.id)
+
+            response = Response(status=204)
+            versioning.set_etag(response, project.id, version)
+            return response
         except SolarProject.DoesNotExist:
             return Response({"error": "Project not found"}, status=404)
 
 
-class PolygonHeightUpdateView(APIView):
+class PolygonHeightUpdateView(ProjectAccessMixin, APIView):
     permission_classes = [AllowAny]
+    project_fields = ["id", "version"]
 
     def patch(self, request, polygon_id):
         project_id = request.GET.get("project_id") or request.data.get("project_id")
@@ -284,92 +451,86 @@ class PolygonHeightUpdateView(APIView):
             return Response({"error": "project_id is required"}, status=400)
 
         try:
-            # user has access?
-            if request.user.is_authenticated:
-                project = SolarProject.objects.get(id=project_id, user=request.user)
-            else:
-                guest_user = get_or_create_guest_user(request)
-                project = SolarProject.objects.get(id=project_id, user=guest_user)
-
-            # Find the polygon
-            polygon_found = False
-            for i, polygon in enumerate(project.data.get("polygons", [])):
-                if polygon.get("id") == polygon_id and "height_data" in request.data:
-                        project.data["polygons"][i]["height_data"] = request.data["height_data"]
-                        polygon_found = True
-                        break
-
-            if not polygon_found:
+            project = self.get_project(project_id)
+
+            if "height_data" not in request.data:
                 return Response({"error": "Polygon not found"}, status=404)
 
-            project.save()
-            return Response({"status": "success"})
+            # Update the polygon row in place
+            with transactions.immediate(project._state.db):
+                version = versioning.bump_version(request, project.id)
+                if version is None:
+                    return versioning.precondition_failed()
+
+                if not polygon_store.set_height_data(project.id, polygon_id, request.data["height_data"]):
+                    transaction.set_rollback(True, using=project._state.db)
+                    return Response({"error": "Polygon not found"}, status=404)
+
+                changelog.record_changes(project.id, version, modified=[polygon_id])
+
+            response = Response({"status": "success"})
+            versioning.set_etag(response, project.id, version)
+            return response
         except SolarProject.DoesNotExist:
             return Response({"error": "Project not found"}, status=404)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
 
+HEIGHT_DATA_KEYS = ("baseHeight", "vertexHeights", "stableVertexHeights")
+
+
+def apply_height_updates(polygons, updates):
+    """Merge {polygon_id: height fields} into the given polygon rows, returns the rows that changed"""
+    # one id -> polygon index per request instead of scanning the polygon list for every update
+    polygons_by_id = {str(polygon.polygon_id): polygon for polygon in polygons}
+
+    updated_polygons = []
+    for polygon_id, data in updates.items():
+        polygon = polygons_by_id.get(str(polygon_id))
+        if polygon is None:
+            continue
+
+        if not polygon.height_data:
+            polygon.height_data = {}
+
+        for key in HEIGHT_DATA_KEYS:
+            if key in data:
+                polygon.height_data[key] = data[key]
+
+        updated_polygons.append(polygon)
+
+    return updated_polygons
+
+
 # view for updating all heights in one request
 @api_view(["PATCH"])
 def update_all_heights(request, pk):
     """Update heights for all polygons in a project"""
     try:
-        # user has access?
-        if request.user.is_authenticated:
-            project = SolarProject.objects.get(id=pk, user=request.user)
-        else:
-            guest_user = get_or_create_guest_user(request)
-            project = SolarProject.objects.get(id=pk, user=guest_user)
+        project = get_project(request, pk, fields=["id"])
 
+        # new format sends {"polygons": {...}}, the old one {"height_data": {...}}
         if "polygons" in request.data:
-            polygons_data = request.data.get("polygons", {})
-
-            for polygon_id, data in polygons_data.items():
-                for i, polygon in enumerate(project.data.get("polygons", [])):
-                    if str(polygon.get("id")) == str(polygon_id):
-                        if "height_data" not in project.data["polygons"][i]:
-                            project.data["polygons"][i]["height_data"] = {}
-
-                        # Update height data
-                        if "baseHeight" in data:
-                            project.data["polygons"][i]["height_data"]["baseHeight"] = data["baseHeight"]
-
-                        if "vertexHeights" in data:
-                            project.data["polygons"][i]["height_data"]["vertexHeights"] = data["vertexHeights"]
-
-                        if "stableVertexHeights" in data:
-                            project.data["polygons"][i]["height_data"]["stableVertexHeights"] = data[
-                                "stableVertexHeights"
-                            ]
-
-                        break
+            updates = request.data.get("polygons") or {}
         else:
-            # Old format for backward compatibility
-            height_data = request.data.get("height_data", {})
-            for polygon_id, data in height_data.items():
-                for i, polygon in enumerate(project.data.get("polygons", [])):
-                    if str(polygon.get("id")) == str(polygon_id):
-                        if "height_data" not in project.data["polygons"][i]:
-                            project.data["polygons"][i]["height_data"] = {}
-
-                        # Update height data
-                        if "baseHeight" in data:
-                            project.data["polygons"][i]["height_data"]["baseHeight"] = data["baseHeight"]
+            updates = request.data.get("height_data") or {}
 
-                        if "vertexHeights" in data:
-                            project.data["polygons"][i]["height_data"]["vertexHeights"] = data["vertexHeights"]
+        with transactions.immediate(project._state.db):
+            version = versioning.bump_version(request, project.id)
+            if version is None:
+                return versioning.precondition_failed()
 
-                        if "stableVertexHeights" in data:
-                            project.data["polygons"][i]["height_data"]["stableVertexHeights"] = data[
-                                "stableVertexHeights"
-                            ]
+            polygons = RoofPolygon.objects.filter(project=project).only("id", "polygon_id", "height_data")
+            updated_polygons = apply_height_updates(polygons, updates)
 
-                        break
+            # Save only the polygons that changed
+            RoofPolygon.objects.bulk_update(updated_polygons, ["height_data"])
+            changelog.record_changes(project.id, version, modified=[p.polygon_id for p in updated_polygons])
 
-        # Save the project with updated height data
-        project.save()
-        return Response({"status": "success", "message": "Heights updated successfully"})
+        response = Response({"status": "success", "message": "Heights updated successfully"})
+        versioning.set_etag(response, project.id, version)
+        return response
 
     except SolarProject.DoesNotExist:
         return Response({"error": "Project not found"}, status=404)
@@ -385,16 +546,41 @@ def csrf_refresh(request):
 
 class SolarPanelViewSet(viewsets.ModelViewSet):
     serializer_class = SolarPanelSerializer
+    filter_backends = [PanelFilter]
+    pagination_class = PanelCursorPagination
 
     def get_queryset(self):
         user = self.request.user
+        # manufacturer_name is serialized for every panel
+        panels = SolarPanel.objects.select_related("manufacturer")
         if user.is_authenticated:
-            return SolarPanel.objects.filter(Q(is_public=True) | Q(user=user)).order_by("-is_default", "name")
+            return panels.filter(Q(is_public=True) | Q(user=user)).order_by("-is_default", "name")
         else:
-            return SolarPanel.objects.filter(is_public=True).order_by("-is_default", "name")
+            return panels.filter(is_public=True).order_by("-is_default", "name")
+
+    def list(self, request, *args, **kwargs):
+        user_id = request.user.id if request.user.is_authenticated else None
+        catalog_stamp = catalog_cache.stamp()
+        response = catalog_cache.not_modified(request, catalog_stamp, user_id)
+        if response is not None:
+            return response
+
+        if user_id or is_filtered(request) or self.paginator.get_page_size(request):
+            # lists with private panels are per user, only the full public catalog is cached
+            response = super().list(request, *args, **kwargs)
+        else:
+            response = Response(
+                catalog_cache.get_or_build(
+                    catalog_cache.PANELS,
+                    catalog_stamp,
+                    lambda: [dict(panel) for panel in self.get_serializer(self.get_queryset(), many=True).data],
+                )
+            )
+        return catalog_cache.set_headers(response, catalog_stamp, user_id)
 
     def perform_create(self, serializer):
-        if self.request.user.is_authenticated:
+        # panels stay in the primary database, guests from the guest store cannot own one
+        if self.request.user.is_authenticated and not routers.in_guest_store(self.request.user):
             serializer.save(user=self.request.user)
         else:
             # For guest users
@@ -404,3 +590,16 @@ class SolarPanelViewSet(viewsets.ModelViewSet):
 class ManufacturerListView(generics.ListAPIView):
     serializer_class = PanelManufacturerSerializer
     queryset = PanelManufacturer.objects.all().order_by("name")
+
+    def list(self, request, *args, **kwargs):
+        catalog_stamp = catalog_cache.stamp()
+        response = catalog_cache.not_modified(request, catalog_stamp)
+        if response is not None:
+            return response
+
+        body = catalog_cache.get_or_build(
+            catalog_cache.MANUFACTURERS,
+            catalog_stamp,
+            lambda: [dict(manufacturer) for manufacturer in self.get_serializer(self.get_queryset(), many=True).data],
+        )
+        return catalog_cache.set_headers(Response(body), catalog_stamp)
@@ -0,0 +1,213 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .geometry import EARTH_RADIUS
+
+# W/m² and °C per hour of a typical meteorological year, index 0 is 00:00-01:00 UTC of January 1st
+COLUMNS = ("ghi", "dni", "dhi", "temp_air")
+HOURS = 8760
+INDEX_FILE = "stations.json"
+
+Station = namedtuple("Station", ["id", "name", "latitude", "longitude", "elevation", "source"])
+Weather = namedtuple("Weather", COLUMNS)
+
+
+class WeatherFileError(ValueError):
+    pass
+
+
+def station_id(latitude, longitude):
+    """Stations are keyed by location, a newer file of the same place replaces the old one"""
+    return f"{latitude:+08.3f}{longitude:+09.3f}".replace(".", "")
+
+
+def hour_of_year(month, day, hour):
+    """Hour index within a non leap year, month and day 1 based, hour 0-23"""
+    days_before = np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+    return (days_before[np.asarray(month) - 1] + np.asarray(day) - 1) * 24 + np.asarray(hour)
+
+
+def to_year(index, values, shift=0):
+    """(len(COLUMNS), HOURS) array of rows placed at their hour index, shift hours are added to reach UTC"""
+    index = np.asarray(index)
+    if index.size != HOURS or np.unique(index).size != HOURS:
+        raise WeatherFileError(f"expected one row for each of the {HOURS} hours of a year, got {index.size}")
+    # a typical year wraps around, hours moved before January 1st by the time zone continue in December
+    year = np.empty((len(COLUMNS), HOURS), dtype=np.float32)
+    year[:, (index + shift) % HOURS] = values
+    return year
+
+
+def read_epw(path):
+    """(Station, year array) of an EnergyPlus weather file, hours are converted from local standard time to UTC"""
+    with open(path, newline="", encoding="latin-1") as file:
+        rows = list(csv.reader(file))
+    if not rows or rows[0][0].upper() != "LOCATION" or len(rows[0]) < 10:
+        raise WeatherFileError("missing EPW LOCATION header")
+
+    _, city, state, country, source, wmo, latitude, longitude, zone, elevation = rows[0][:10]
+    latitude, longitude, zone, elevation = float(latitude), float(longitude), float(zone), float(elevation)
+    # data rows follow the 8 header lines: year, month, day, hour 1-24 ending the interval, ...
+    data = [row for row in rows[8:] if len(row) > 15]
+    data = [row for row in data if not (row[1] == "2" and row[2] == "29")]
+    month, day, hour = (np.array([int(row[column]) for row in data]) for column in (1, 2, 3))
+    # dry bulb temperature, global horizontal, direct normal and diffuse horizontal radiation
+    values = np.array([[float(row[column]) for row in data] for column in (13, 14, 15, 6)])
+
+    name = ", ".join(part for part in (city, state, country) if part and part != "-")
+    station = Station(station_id(latitude, longitude), name, latitude, longitude, elevation, f"EPW {source} {wmo}")
+    return station, to_year(hour_of_year(month, day, hour - 1), values, shift=-round(zone))
+
+
+def read_pvgis_csv(path):
+    """(Station, year array) of a PVGIS typical meteorological year CSV, its timestamps are UTC"""
+    metadata, data = {}, []
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if row and row[0].startswith("time(UTC)"):
+                header = row
+                break
+            if row and ":" in row[0]:
+                key, _, value = row[0].partition(":")
+                metadata[key.strip().lower()] = value.strip()
+        else:
+            raise WeatherFileError("missing PVGIS time(UTC) column header")
+
+        for row in reader:
+            # notes follow the data, they start with a column name instead of a timestamp
+            if len(row) != len(header) or not row[0][:8].isdigit():
+                break
+            data.append(row)
+
+    try:
+        latitude = float(metadata["latitude (decimal degrees)"])
+        longitude = float(metadata["longitude (decimal degrees)"])
+        elevation = float(metadata.get("elevation (m)", 0))
+        columns = [header.index(name) for name in ("G(h)", "Gb(n)", "Gd(h)", "T2m")]
+    except (KeyError, ValueError) as e:
+        raise WeatherFileError(f"not a PVGIS TMY file: {e}") from None
+
+    # 20070101:0000, every month may come from another year
+    data = [row for row in data if row[0][4:8] != "0229"]
+    month, day, hour = (np.array([int(row[0][start:end]) for row in data]) for start, end in ((4, 6), (6, 8), (9, 11)))
+    values = np.array([[float(row[column]) for row in data] for column in columns])
+
+    station = Station(station_id(latitude, longitude), path.stem, latitude, longitude, elevation, "PVGIS TMY")
+    return station, to_year(hour_of_year(month, day, hour), values)
+
+
+READERS = {".epw": read_epw, ".csv": read_pvgis_csv}
+
+
+def tmy_hours(times):
+    """Hour index into a typical year of UTC datetime64 times, February 29th repeats February 28th"""
+    times = np.asarray(times, dtype="datetime64[h]")
+    years = times.astype("datetime64[Y]")
+    hours = (times - years.astype("datetime64[h]")).astype(int)
+    leap = ((years + 1).astype("datetime64[D]") - years.astype("datetime64[D]")).astype(int) == 366
+    # from February 29th (day 59) on a leap year is one day ahead of the typical year
+    return np.where(leap & (hours >= 59 * 24), hours - 24, hours)
+
+
+class WeatherStore:
+    """Typical year weather of many stations, one (columns, 8760) float32 .npy file per station.
+
+    stations.json holds the station locations, the nearest one to a site is found in one vectorized pass and its
+    file is memory mapped, every column is a contiguous row of the array.
+    """
+
+    def __init__(self, directory, max_distance_km=100):
+        self.directory = Path(directory)
+        self.max_distance_km = max_distance_km
+        self.lock = threading.Lock()
+        self.index_mtime = None
+        self.stations = []
+        self.coordinates = np.empty((0, 2))
+        self.mapped = {}
+
+    def path(self, station):
+        return self.directory / f"{station.id}.npy"
+
+    def load_index(self):
+        """(stations, (N, 2) radians of their locations), reread whenever an import rewrote stations.json"""
+        index = self.directory / INDEX_FILE
+        try:
+            mtime = index.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        with self.lock:
+            if mtime != self.index_mtime:
+                entries = json.loads(index.read_text()) if mtime else []
+                self.stations = [Station(**entry) for entry in entries]
+                self.coordinates = np.radians([[station.latitude, station.longitude] for station in self.stations])
+                self.mapped = {}
+                self.index_mtime = mtime
+            return self.stations, self.coordinates
+
+    def add(self, station, year):
+        """Write the year array of a station and register it in the index"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.path(station), lambda file: np.save(file, year.astype(np.float32)))
+
+        stations = {entry.id: entry for entry in self.load_index()[0]}
+        stations[station.id] = station
+        entries = [entry._asdict() for entry in sorted(stations.values(), key=lambda entry: entry.id)]
+        write_atomic(self.directory / INDEX_FILE, lambda file: file.write(json.dumps(entries, indent=1).encode()))
+
+    def nearest(self, latitude, longitude):
+        """(Station, distance in km) closest to a site, (None, None) without a station within max_distance_km"""
+        stations, coordinates = self.load_index()
+        if not stations:
+            return None, None
+
+        lat, lng = np.radians(latitude), np.radians(longitude)
+        # haversine distance to every station at once
+        a = (
+            np.sin((coordinates[:, 0] - lat) / 2) ** 2
+            + np.cos(lat) * np.cos(coordinates[:, 0]) * np.sin((coordinates[:, 1] - lng) / 2) ** 2
+        )
+        distances = 2 * EARTH_RADIUS / 1000 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        closest = int(np.argmin(distances))
+        if distances[closest] > self.max_distance_km:
+            return None, None
+        return stations[closest], float(distances[closest])
+
+    def weather(self, station):
+        """Memory mapped Weather columns of a station"""
+        with self.lock:
+            year = self.mapped.get(station.id)
+        if year is None:
+            year = np.asarray(np.load(self.path(station), mmap_mode="r"))
+            with self.lock:
+                self.mapped[station.id] = year
+        return Weather(*year)
+
+
+def write_atomic(path, write):
+    # written next to the final file and renamed, readers never see a partial file
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as file:
+        write(file)
+    os.replace(file.name, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process wide weather store configured by the SOLAR_WEATHER_* settings"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WeatherStore(settings.SOLAR_WEATHER_DIR, settings.SOLAR_WEATHER_MAX_KM)
+        return _store